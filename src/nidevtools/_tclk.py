@@ -1 +1,58 @@
+"""
+This is nitclk synchronization of scope and fgen sessions for use with STS test codes
+"""
+
+import typing
+
 import nitclk
+
+
+def unique_sessions(ssc_s: typing.Iterable[typing.Any]):
+    """
+    returns each session of the SSCs once, in the order of the SSCs
+
+    Args:
+        ssc_s (typing.Iterable[typing.Any]): SSCs with a session property
+
+    Returns:
+        list: sessions
+    """
+    sessions = {}
+    for ssc in ssc_s:
+        sessions.setdefault(id(ssc.session), ssc.session)
+    return list(sessions.values())
+
+
+def synchronize(sessions: typing.Sequence[typing.Any], min_tclk_period=0.0):
+    """
+    configures the sessions to share the start, reference and script triggers of the first
+    session and aligns their sample clocks with TClk
+
+    Args:
+        sessions (typing.Sequence[typing.Any]): niscope or nifgen sessions, not running
+        min_tclk_period (float, optional): minimum TClk period in seconds. Defaults to 0.0.
+    """
+    nitclk.configure_for_homogeneous_triggers(sessions)
+    nitclk.synchronize(sessions, min_tclk_period)
+
+
+def initiate(sessions: typing.Sequence[typing.Any]):
+    """
+    initiates all the synchronized sessions with one call, the sessions sharing the trigger of the
+    first session start on the same TClk edge
+
+    Args:
+        sessions (typing.Sequence[typing.Any]): synchronized sessions
+    """
+    nitclk.initiate(sessions)
+
+
+def wait_until_done(sessions: typing.Sequence[typing.Any], timeout=5.0):
+    """
+    waits until all the synchronized sessions are done or the timeout expires
+
+    Args:
+        sessions (typing.Sequence[typing.Any]): synchronized sessions
+        timeout (float, optional): timeout in seconds. Defaults to 5.0.
+    """
+    nitclk.wait_until_done(sessions, timeout)
@@ -0,0 +1,624 @@
+"""
+This is waveform analysis functions used by devtool apis
+"""
+
+import math
+import typing
+
+import numpy
+
+
+class Envelope(typing.NamedTuple):
+    """
+    min/max/mean envelope of a waveform. Each point of the envelope summarizes samples_per_bin
+    samples, the last point may summarize fewer samples. For a 2D input the envelope arrays have
+    one row per record. The envelope of an empty waveform has no point and 0 samples per bin.
+    """
+
+    minimum: numpy.ndarray
+    maximum: numpy.ndarray
+    mean: numpy.ndarray
+    x_increment: float
+    samples_per_bin: int
+    sample_count: int
+
+
+class EnvelopeDecimator:
+    """
+    Reduces a waveform to its min/max/mean envelope while its chunks arrive. Only the bins of
+    the current chunk are computed, completed bins are never recomputed.
+    """
+
+    def __init__(self, samples_per_bin: int, x_increment=1.0):
+        """
+        envelope decimator initialisation
+
+        Args:
+            samples_per_bin (int): number of samples summarized by each envelope point
+            x_increment (float, optional): time between two samples of the waveform. Defaults to
+                1.0.
+        """
+        if samples_per_bin < 1:
+            raise ValueError("samples_per_bin must be at least 1")
+        self._samples_per_bin = int(samples_per_bin)
+        self._x_increment = x_increment
+        self._minimums = []
+        self._maximums = []
+        self._means = []
+        self._partial = None  # min, max, sum and count of the bin being filled
+        self._sample_count = 0
+        self._rows = ()  # shape of the chunks without their samples axis
+
+    def update(self, chunk):
+        """
+        adds the next chunk of samples to the envelope
+
+        Args:
+            chunk (array like): samples, 1D or 2D with one row per record and the same number of
+                rows for all the chunks
+        """
+        chunk = numpy.asarray(chunk, dtype=numpy.float64)
+        self._rows = chunk.shape[:-1]
+        self._sample_count += chunk.shape[-1]
+        if self._partial is not None:
+            minimum, maximum, total, count = self._partial
+            head = chunk[..., : self._samples_per_bin - count]
+            if head.shape[-1]:
+                minimum = numpy.minimum(minimum, head.min(axis=-1))
+                maximum = numpy.maximum(maximum, head.max(axis=-1))
+                total = total + head.sum(axis=-1)
+                count += head.shape[-1]
+            chunk = chunk[..., head.shape[-1] :]
+            if count == self._samples_per_bin:
+                self._append(minimum[..., None], maximum[..., None], total[..., None] / count)
+                self._partial = None
+            else:
+                self._partial = (minimum, maximum, total, count)
+        full_length = (chunk.shape[-1] // self._samples_per_bin) * self._samples_per_bin
+        if full_length:
+            blocks = chunk[..., :full_length].reshape(chunk.shape[:-1] + (-1, self._samples_per_bin))
+            self._append(blocks.min(axis=-1), blocks.max(axis=-1), blocks.mean(axis=-1))
+        rest = chunk[..., full_length:]
+        if rest.shape[-1]:
+            self._partial = (
+                rest.min(axis=-1),
+                rest.max(axis=-1),
+                rest.sum(axis=-1),
+                rest.shape[-1],
+            )
+
+    def _append(self, minimums, maximums, means):
+        self._minimums.append(minimums)
+        self._maximums.append(maximums)
+        self._means.append(means)
+
+    def envelope(self):
+        """
+        returns the envelope of the samples received so far, the incomplete last bin included
+
+        Returns:
+            Envelope: min/max/mean envelope
+        """
+        minimums, maximums, means = list(self._minimums), list(self._maximums), list(self._means)
+        if self._partial is not None:
+            minimum, maximum, total, count = self._partial
+            minimums.append(minimum[..., None])
+            maximums.append(maximum[..., None])
+            means.append(total[..., None] / count)
+        if not minimums:
+            empty = numpy.empty(self._rows + (0,))
+            return Envelope(empty, empty, empty, 0.0, 0, 0)
+        return Envelope(
+            numpy.concatenate(minimums, axis=-1),
+            numpy.concatenate(maximums, axis=-1),
+            numpy.concatenate(means, axis=-1),
+            self._x_increment * self._samples_per_bin,
+            self._samples_per_bin,
+            self._sample_count,
+        )
+
+
+def samples_per_envelope_bin(sample_count: int, envelope_points: int):
+    """
+    number of samples to summarize in each envelope point to have at most envelope_points points
+
+    Args:
+        sample_count (int): number of samples of the waveform
+        envelope_points (int): maximum number of points of the envelope
+
+    Returns:
+        int: samples per envelope point, at least 1
+    """
+    return max(1, math.ceil(sample_count / max(1, envelope_points)))
+
+
+def decimate_envelope(samples, envelope_points: int, x_increment=1.0):
+    """
+    reduces a waveform to a min/max/mean envelope of at most envelope_points points
+
+    Args:
+        samples (array like): samples, 1D or 2D with one row per record
+        envelope_points (int): maximum number of points of the envelope
+        x_increment (float, optional): time between two samples. Defaults to 1.0.
+
+    Returns:
+        Envelope: min/max/mean envelope
+    """
+    samples = numpy.asarray(samples, dtype=numpy.float64)
+    decimator = EnvelopeDecimator(samples_per_envelope_bin(samples.shape[-1], envelope_points), x_increment)
+    decimator.update(samples)
+    return decimator.envelope()
+
+
+class ReferenceLevels(typing.NamedTuple):
+    """
+    low, mid and high reference levels of the timing measurements, in percent of the base to top
+    amplitude or in volts. Each level is a number or one value per waveform.
+    """
+
+    low: typing.Any = 10.0
+    mid: typing.Any = 50.0
+    high: typing.Any = 90.0
+    in_percent: bool = True
+
+
+class WaveformMeasurements(typing.NamedTuple):
+    """
+    scalar measurements of waveforms, one value per waveform in each array. Timing measurements
+    are in seconds and are nan when the waveform has no matching edge.
+    """
+
+    vpp: numpy.ndarray
+    rms: numpy.ndarray
+    mean: numpy.ndarray
+    base: numpy.ndarray
+    top: numpy.ndarray
+    overshoot: numpy.ndarray  # percent of the base to top amplitude
+    rise_time: numpy.ndarray
+    fall_time: numpy.ndarray
+    period: numpy.ndarray
+    frequency: numpy.ndarray
+
+
+def _base_and_top(samples, minimum, maximum, bins=256):
+    """
+    base and top of each waveform as the mean of the samples in the most frequent bin of its lower
+    and upper half, from one histogram per waveform computed with a single bincount. The bins are
+    centred on multiples of the bin width, the minimum and maximum are the centres of the first
+    and last bins.
+    """
+    rows = samples.shape[0]
+    span = numpy.where(maximum > minimum, maximum - minimum, 1.0)
+    bin_index = numpy.rint((samples - minimum[:, None]) / span[:, None] * (bins - 1)).astype(numpy.int64)
+    bin_index += numpy.arange(rows)[:, None] * bins
+    counts = numpy.bincount(bin_index.ravel(), minlength=rows * bins).reshape(rows, bins)
+    sums = numpy.bincount(bin_index.ravel(), samples.ravel(), rows * bins).reshape(rows, bins)
+    half = bins // 2
+    base_bin = numpy.argmax(counts[:, :half], axis=1)
+    top_bin = half + numpy.argmax(counts[:, half:], axis=1)
+    row_index = numpy.arange(rows)
+    with numpy.errstate(invalid="ignore"):  # the upper half of a constant waveform is empty
+        base = sums[row_index, base_bin] / counts[row_index, base_bin]
+        top = sums[row_index, top_bin] / counts[row_index, top_bin]
+    base = numpy.where(maximum > minimum, base, minimum)
+    top = numpy.where(maximum > minimum, top, maximum)
+    return base, top
+
+
+def _crossings(samples, levels, rising):
+    """
+    crossing mask and the interpolated position of each sample interval crossing the levels
+    """
+    above = samples > levels[:, None]
+    if rising:
+        mask = ~above[:, :-1] & above[:, 1:]
+    else:
+        mask = above[:, :-1] & ~above[:, 1:]
+    step = samples[:, 1:] - samples[:, :-1]
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        fraction = numpy.where(step != 0, (levels[:, None] - samples[:, :-1]) / step, 0.0)
+    positions = numpy.arange(samples.shape[1] - 1) + fraction
+    return mask, positions
+
+
+def _first_index(mask):
+    """index of the first True of each row, -1 when the row has none"""
+    return numpy.where(mask.any(axis=1), numpy.argmax(mask, axis=1), -1)
+
+
+def _last_index(mask):
+    """index of the last True of each row, -1 when the row has none"""
+    return numpy.where(mask.any(axis=1), mask.shape[1] - 1 - numpy.argmax(mask[:, ::-1], axis=1), -1)
+
+
+def _transition_time(samples, start_levels, end_levels, rising):
+    """
+    time in samples of the first complete edge going from the start level to the end level, nan
+    if the waveform has no such edge
+    """
+    end_mask, end_positions = _crossings(samples, end_levels, rising)
+    start_mask, start_positions = _crossings(samples, start_levels, rising)
+    interval = numpy.arange(start_mask.shape[1])
+    first_start = _first_index(start_mask)
+    after_first_start = (interval >= first_start[:, None]) & (first_start >= 0)[:, None]
+    end_index = _first_index(end_mask & after_first_start)
+    before_end = interval <= end_index[:, None]
+    start_index = _last_index(start_mask & before_end)
+    rows = numpy.arange(samples.shape[0])
+    valid = (end_index >= 0) & (start_index >= 0)
+    transition = end_positions[rows, end_index] - start_positions[rows, start_index]
+    return numpy.where(valid, transition, numpy.nan)
+
+
+def _period(samples, mid_levels):
+    """
+    mean time in samples between the rising crossings of the mid levels, nan if the waveform has
+    less than two of them
+    """
+    mid_mask, mid_positions = _crossings(samples, mid_levels, True)
+    first = _first_index(mid_mask)
+    last = _last_index(mid_mask)
+    edges = mid_mask.sum(axis=1)
+    rows = numpy.arange(samples.shape[0])
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        return numpy.where(edges > 1, (mid_positions[rows, last] - mid_positions[rows, first]) / (edges - 1), numpy.nan)
+
+
+def measure_waveforms(samples, x_increment=1.0, reference_levels=ReferenceLevels()):
+    """
+    computes the scalar measurements of many waveforms at once
+
+    Args:
+        samples (array like): waveforms, one per row, or a single 1D waveform
+        x_increment (float or array like, optional): time between two samples, one for all or one
+            per waveform. Defaults to 1.0.
+        reference_levels (ReferenceLevels, optional): levels of the rise time, fall time, period
+            and frequency measurements. Defaults to 10, 50 and 90 percent.
+
+    Returns:
+        WaveformMeasurements: one value per waveform in each measurement
+    """
+    samples = numpy.atleast_2d(numpy.asarray(samples, dtype=numpy.float64))
+    rows = samples.shape[0]
+    x_increment = numpy.broadcast_to(numpy.asarray(x_increment, dtype=numpy.float64), (rows,))
+    minimum = samples.min(axis=1)
+    maximum = samples.max(axis=1)
+    mean = samples.mean(axis=1)
+    rms = numpy.sqrt(numpy.mean(numpy.square(samples), axis=1))
+    base, top = _base_and_top(samples, minimum, maximum)
+    amplitude = top - base
+    levels = []
+    for level in reference_levels[:3]:
+        level = numpy.broadcast_to(numpy.asarray(level, dtype=numpy.float64), (rows,))
+        if reference_levels.in_percent:
+            level = base + amplitude * level / 100.0
+        levels.append(level)
+    low, mid, high = levels
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        overshoot = numpy.where(amplitude > 0, (maximum - top) / amplitude * 100.0, 0.0)
+    if samples.shape[1] < 2:  # no sample interval to cross a level
+        rise_time, fall_time, period = (numpy.full(rows, numpy.nan) for _ in range(3))
+    else:
+        rise_time = _transition_time(samples, low, high, True) * x_increment
+        fall_time = _transition_time(samples, high, low, False) * x_increment
+        period = _period(samples, mid) * x_increment
+    with numpy.errstate(divide="ignore"):
+        frequency = 1.0 / period
+    return WaveformMeasurements(
+        maximum - minimum,
+        rms,
+        mean,
+        base,
+        top,
+        overshoot,
+        rise_time,
+        fall_time,
+        period,
+        frequency,
+    )
+
+
+class MeasurementStatistics(typing.NamedTuple):
+    """
+    statistics of one measurement of one pin on one site
+    """
+
+    mean: float
+    stdev: float
+    min_val: float
+    max_val: float
+    num_in_stats: int
+
+
+class StatisticsAccumulator:
+    """
+    Streaming statistics of measurements keyed by (pin, site, measurement). All the keys of a
+    batch are updated with one set of NumPy operations, with the numerically stable Welford update
+    merging the statistics of the batch into the running statistics.
+
+    By default the statistics cover all the values. With a window they cover the last window
+    values of each key, with a decay the older values have exponentially decreasing weights and
+    min and max still cover all the values.
+    """
+
+    def __init__(self, window=0, decay=0.0):
+        """
+        statistics accumulator initialisation
+
+        Args:
+            window (int, optional): number of last values in the statistics of each key. Defaults
+                to 0, all the values.
+            decay (float, optional): weight lost by the older values for each new value, between
+                0 and 1. Defaults to 0.0, no decay.
+        """
+        if window and decay:
+            raise ValueError("Statistics can be windowed or decaying, not both")
+        if not 0.0 <= decay < 1.0:
+            raise ValueError("decay must be between 0 and 1")
+        self._window = int(window)
+        self._decay = decay
+        self.reset()
+
+    def reset(self):
+        """clears the statistics of all the keys"""
+        self._rows: typing.Dict[typing.Tuple[str, int, str], int] = {}
+        self._count = numpy.zeros(0, numpy.int64)
+        self._weight = numpy.zeros(0)
+        self._mean = numpy.zeros(0)
+        self._m2 = numpy.zeros(0)
+        self._min = numpy.zeros(0)
+        self._max = numpy.zeros(0)
+        self._ring = numpy.zeros((0, self._window))
+
+    def _row_indices(self, keys):
+        """row of each key in the state arrays, the arrays are extended for new keys"""
+        new_keys = [key for key in dict.fromkeys(keys) if key not in self._rows]
+        if new_keys:
+            for key in new_keys:
+                self._rows[key] = len(self._rows)
+            grow = len(new_keys)
+            self._count = numpy.concatenate([self._count, numpy.zeros(grow, numpy.int64)])
+            self._weight = numpy.concatenate([self._weight, numpy.zeros(grow)])
+            self._mean = numpy.concatenate([self._mean, numpy.zeros(grow)])
+            self._m2 = numpy.concatenate([self._m2, numpy.zeros(grow)])
+            self._min = numpy.concatenate([self._min, numpy.full(grow, numpy.inf)])
+            self._max = numpy.concatenate([self._max, numpy.full(grow, -numpy.inf)])
+            self._ring = numpy.concatenate([self._ring, numpy.zeros((grow, self._window))])
+        return numpy.array([self._rows[key] for key in keys], numpy.int64)
+
+    def update(self, keys: typing.Sequence[typing.Tuple[str, int, str]], values):
+        """
+        adds a batch of values to the statistics
+
+        Args:
+            keys (typing.Sequence[tuple]): unique (pin, site, measurement) keys
+            values (array like): one value per key, or one row of values per key
+        """
+        rows = self._row_indices(list(keys))
+        values = numpy.asarray(values, dtype=numpy.float64).reshape(len(rows), -1)
+        count = values.shape[1]
+        if not count:
+            return
+        self._min[rows] = numpy.minimum(self._min[rows], values.min(axis=1))
+        self._max[rows] = numpy.maximum(self._max[rows], values.max(axis=1))
+        if self._window:
+            self._update_window(rows, values)
+            return
+        if self._decay:
+            weights = (1.0 - self._decay) ** numpy.arange(count - 1, -1, -1)
+            old_weight = self._weight[rows] * (1.0 - self._decay) ** count
+            old_m2 = self._m2[rows] * (1.0 - self._decay) ** count
+        else:
+            weights = numpy.ones(count)
+            old_weight = self._weight[rows]
+            old_m2 = self._m2[rows]
+        batch_weight = weights.sum()
+        batch_mean = values @ weights / batch_weight
+        batch_m2 = numpy.square(values - batch_mean[:, None]) @ weights
+        total_weight = old_weight + batch_weight
+        delta = batch_mean - self._mean[rows]
+        self._mean[rows] += delta * batch_weight / total_weight
+        self._m2[rows] = old_m2 + batch_m2 + delta**2 * old_weight * batch_weight / total_weight
+        self._weight[rows] = total_weight
+        self._count[rows] += count
+
+    def _update_window(self, rows, values):
+        """writes the last values of each key into its ring buffer"""
+        values = values[:, -self._window :]
+        positions = (self._count[rows][:, None] + numpy.arange(values.shape[1])) % self._window
+        self._ring[rows[:, None], positions] = values
+        self._count[rows] += values.shape[1]
+
+    def _window_statistics(self, row):
+        """statistics of the values in the window of one key"""
+        count = int(min(self._count[row], self._window))
+        values = self._ring[row, :count]
+        stdev = float(values.std(ddof=1)) if count > 1 else 0.0
+        return MeasurementStatistics(float(values.mean()), stdev, float(values.min()), float(values.max()), count)
+
+    def statistics(self, key: typing.Tuple[str, int, str]):
+        """
+        statistics of one key
+
+        Args:
+            key (tuple): (pin, site, measurement)
+
+        Returns:
+            MeasurementStatistics: mean, standard deviation, min, max and count
+        """
+        row = self._rows[key]
+        if self._window:
+            return self._window_statistics(row)
+        weight = self._weight[row]
+        if self._decay:
+            variance = self._m2[row] / weight if weight > 0 else 0.0
+        else:
+            variance = self._m2[row] / (weight - 1) if weight > 1 else 0.0
+        return MeasurementStatistics(
+            float(self._mean[row]),
+            float(numpy.sqrt(variance)),
+            float(self._min[row]),
+            float(self._max[row]),
+            int(self._count[row]),
+        )
+
+    def export(self):
+        """
+        statistics of all the keys
+
+        Returns:
+            dict: (pin, site, measurement) -> MeasurementStatistics
+        """
+        return {key: self.statistics(key) for key in self._rows}
+
+
+class RingBuffer:
+    """
+    Ring buffer of the last capacity samples of each channel of a continuous acquisition, with a
+    single producer thread writing while consumers read. No lock is taken: the producer announces
+    the samples it is about to overwrite before writing them and publishes the new total after,
+    a consumer retries or fails when the samples it copied were overwritten during the copy.
+    Samples are addressed by their absolute index since the start of the acquisition.
+    """
+
+    def __init__(self, channels: int, capacity: int, dtype=numpy.float64):
+        """
+        ring buffer initialisation
+
+        Args:
+            channels (int): number of channels
+            capacity (int): number of samples kept per channel
+            dtype (numpy.dtype, optional): data type of the samples. Defaults to numpy.float64.
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self._data = numpy.zeros((channels, capacity), dtype)
+        self._capacity = int(capacity)
+        self._total = 0  # samples written, published after the samples
+        self._writing = 0  # total once the write in progress is done, announced before it
+
+    @property
+    def channels(self):
+        """number of channels"""
+        return self._data.shape[0]
+
+    @property
+    def capacity(self):
+        """number of samples kept per channel"""
+        return self._capacity
+
+    @property
+    def total(self):
+        """number of samples per channel written since the start"""
+        return self._total
+
+    def write(self, samples):
+        """
+        appends samples to the buffer, called by the producer thread only
+
+        Args:
+            samples (array like): channels x samples, or samples of a single channel
+        """
+        samples = numpy.asarray(samples).reshape(self._data.shape[0], -1)
+        count = samples.shape[1]
+        total = self._total
+        self._writing = total + count
+        samples = samples[:, -self._capacity :]
+        start = (total + count - samples.shape[1]) % self._capacity
+        first = min(samples.shape[1], self._capacity - start)
+        self._data[:, start : start + first] = samples[:, :first]
+        self._data[:, : samples.shape[1] - first] = samples[:, first:]
+        self._total = total + count
+
+    def read(self, start: int, count: int):
+        """
+        copies samples out of the buffer
+
+        Args:
+            start (int): absolute index of the first sample
+            count (int): number of samples per channel
+
+        Raises:
+            ValueError: when the samples are not acquired yet or were overwritten
+
+        Returns:
+            numpy.ndarray: channels x count copy of the samples
+        """
+        if start < 0 or start + count > self._total:
+            raise ValueError("The samples are not acquired yet")
+        if start < self._writing - self._capacity or count > self._capacity:
+            raise ValueError("The samples were overwritten, read them sooner")
+        begin = start % self._capacity
+        first = min(count, self._capacity - begin)
+        samples = numpy.concatenate([self._data[:, begin : begin + first], self._data[:, : count - first]], axis=1)
+        if start < self._writing - self._capacity:
+            raise ValueError("The samples were overwritten, read them sooner")
+        return samples
+
+    def latest(self, count: int, retries=3):
+        """
+        copies the last samples of the buffer
+
+        Args:
+            count (int): number of samples per channel, at most the capacity
+            retries (int, optional): number of attempts when the producer overwrites the samples
+                during the copy. Defaults to 3.
+
+        Returns:
+            numpy.ndarray: channels x count copy of the last samples
+        """
+        for attempt in range(retries):
+            try:
+                return self.read(self._total - count, count)
+            except ValueError:
+                if attempt == retries - 1 or self._total < count:
+                    raise
+
+    def find_trigger(self, channel: int, level: float, rising=True, start=0):
+        """
+        finds the first crossing of the level by a channel in the buffered samples
+
+        Args:
+            channel (int): row of the channel
+            level (float): trigger level
+            rising (bool, optional): rising or falling crossing. Defaults to True.
+            start (int, optional): absolute index to search from. Defaults to 0, the oldest
+                buffered sample.
+
+        Returns:
+            int: absolute index of the first sample past the level, -1 when there is none
+        """
+        total = self._total
+        start = max(start, self._writing - self._capacity, 0)
+        if total - start < 2:
+            return -1
+        samples = self.read(start, total - start)[channel]
+        if rising:
+            crossings = (samples[:-1] < level) & (samples[1:] >= level)
+        else:
+            crossings = (samples[:-1] > level) & (samples[1:] <= level)
+        indices = numpy.flatnonzero(crossings)
+        return start + int(indices[0]) + 1 if indices.size else -1
+
+    def trigger_window(self, channel: int, level: float, pre_samples: int, post_samples: int, rising=True, start=0):
+        """
+        extracts the samples of all channels around the first crossing of the level by a channel
+
+        Args:
+            channel (int): row of the trigger channel
+            level (float): trigger level
+            pre_samples (int): samples before the trigger sample
+            post_samples (int): samples from the trigger sample
+            rising (bool, optional): rising or falling crossing. Defaults to True.
+            start (int, optional): absolute index to search from. Defaults to 0.
+
+        Returns:
+            tuple: absolute index of the trigger sample and the channels x (pre_samples +
+            post_samples) window, None when no trigger with all its post trigger samples is
+            buffered yet
+        """
+        oldest = max(self._writing - self._capacity, 0)
+        index = self.find_trigger(channel, level, rising, max(start, oldest + pre_samples))
+        if index < 0 or index + post_samples > self._total:
+            return None
+        return index, self.read(index - pre_samples, pre_samples + post_samples)
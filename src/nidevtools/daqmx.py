@@ -1,16 +1,24 @@
 """
 This is nidaqmx wrapper for use with STS test codes
 """
+import concurrent.futures
 import enum
+import threading
 import typing
+import weakref
 
 import nidaqmx
 import nidaqmx.constants
+import nidaqmx.stream_readers
+import nidaqmx.system
 import nitsm.codemoduleapi
 import nitsm.enums
 import nitsm.pinquerycontexts
+import numpy
 from nitsm.codemoduleapi import SemiconductorModuleContext as SMContext
 
+import nidevtools.analysis as ni_dt_analysis
+
 # Types Definition
 PinsArg = typing.Union[str, typing.Sequence[str]]
 Any = typing.Any
@@ -89,6 +97,20 @@ class _Session(typing.NamedTuple):
         data = self.Task.read(samples_per_channel, timeout)
         return data
 
+    def st_read_wave_into(self, buffer: numpy.ndarray, timeout=10):
+        """
+        Reads waveforms from the task specified in the session directly into a NumPy buffer with
+        the analog multi channel stream reader, without converting the samples to Python lists.
+        Args:
+            buffer: C contiguous float64 array of number of channels x samples per channel, it is
+                filled with the samples
+            timeout: time in seconds to wait for the samples
+        Return:
+            Number of samples per channel read
+        """
+        reader = nidaqmx.stream_readers.AnalogMultiChannelReader(self.Task.in_stream)
+        return reader.read_many_sample(buffer, buffer.shape[1], timeout)
+
     # Write Analog
     def st_write_analog(self, data):
         """
@@ -206,7 +228,13 @@ class _Session(typing.NamedTuple):
         return property_list
 
     # Timing Configuration
-    def st_timing(self, samples_per_channel: int, sampling_rate_hz: float, clock_source: str = ""):
+    def st_timing(
+        self,
+        samples_per_channel: int,
+        sampling_rate_hz: float,
+        clock_source: str = "",
+        continuous=False,
+    ):
         """
         Sets the source of the Sample Clock, its rate and number of samples to acquire or generate
         for the task referenced in this session.
@@ -220,15 +248,34 @@ class _Session(typing.NamedTuple):
                 expected rate of that clock.
             clock_source: specifies the source terminal of the Sample Clock. Leave this input
                 undefined to use the default onboard clock of the device.
+            continuous: acquires or generates samples until the task is stopped, samples per
+                channel then sets the buffer size.
         """
+        if continuous:
+            sample_mode = nidaqmx.constants.AcquisitionType.CONTINUOUS
+        else:
+            sample_mode = nidaqmx.constants.AcquisitionType.FINITE
         self.Task.timing.cfg_samp_clk_timing(
             sampling_rate_hz,
             clock_source,
             nidaqmx.constants.Edge.RISING,
-            nidaqmx.constants.AcquisitionType.FINITE,
+            sample_mode,
             samples_per_channel,
         )
 
+    def st_reference_clock(self, clock_source: str, clock_rate_hz: float = 10e6):
+        """
+        Locks the timebase of the task referenced in this session to a reference clock, so the
+        sample clocks of tasks locked to the same reference clock do not drift.
+
+        Args:
+            clock_source: terminal of the reference clock, like PXI_Clk10 for the PXI backplane
+                clock or /Dev1/RefClockOut to share the clock of another device.
+            clock_rate_hz: frequency of the reference clock. Default to 10 MHz
+        """
+        self.Task.timing.ref_clk_src = clock_source
+        self.Task.timing.ref_clk_rate = clock_rate_hz
+
     # Trigger
     def st_ref_analog_edge(
         self,
@@ -292,6 +339,153 @@ class _Session(typing.NamedTuple):
             trigger_source, pre_trigger_samples_per_channel, edge
         )
 
+    def st_start_digital_edge(self, trigger_source: str, edge: enum.Enum = nidaqmx.constants.Edge.RISING):
+        """
+        Configures the task in this session to start the acquisition or generation on a rising or
+        falling edge of a digital signal.
+
+        Args:
+            trigger_source: specifies the name of a terminal where there is a digital signal to use
+                as the source of the trigger, like the start trigger terminal of another task.
+            edge: specifies on which edge of the digital signal the Start Trigger occurs.
+        """
+        self.Task.triggers.start_trigger.cfg_dig_edge_start_trig(trigger_source, edge)
+
+
+class ContinuousAcquisition:
+    """
+    Continuous acquisition of DAQmx tasks drained into one ring buffer per task by every N
+    samples acquired into buffer events. The rows of the tasks follow each other like in
+    read_waveform_into. Samples are addressed by their index since the start of the tasks, which
+    is the same sample time on every task only when they share their sample clock and start
+    trigger.
+    """
+
+    def __init__(
+        self,
+        tasks: typing.List[nidaqmx.Task],
+        samples_per_event: int,
+        buffer_samples: int,
+        accumulator: typing.Optional[ni_dt_analysis.StatisticsAccumulator] = None,
+    ):
+        """
+        Registers the callbacks of the tasks, the tasks must be configured and not running.
+        Args:
+            tasks: analog input tasks with continuous timing
+            samples_per_event: number of samples per channel drained by each callback
+            buffer_samples: number of last samples per channel kept for each task
+            accumulator: streaming statistics updated with every drained sample
+        """
+        self.tasks = tasks
+        self.channel_names = [name for task in tasks for name in task.channel_names]
+        self.ring_buffers = [ni_dt_analysis.RingBuffer(task.number_of_channels, buffer_samples) for task in tasks]
+        self.error: typing.Optional[Exception] = None  # first error raised by a callback
+        self._samples_per_event = samples_per_event
+        self._accumulator = accumulator
+        self._lock = threading.Lock()  # accumulator lock, the ring buffers do not need one
+        for task, ring_buffer in zip(tasks, self.ring_buffers):
+            task.register_every_n_samples_acquired_into_buffer_event(
+                samples_per_event, self._drain_callback(task, ring_buffer)
+            )
+            _every_n_callback_tasks.add(task)
+
+    def _drain_callback(self, task: nidaqmx.Task, ring_buffer: ni_dt_analysis.RingBuffer):
+        """callback reading the samples of the event into the ring buffer of the task"""
+        reader = nidaqmx.stream_readers.AnalogMultiChannelReader(task.in_stream)
+        samples = numpy.empty((task.number_of_channels, self._samples_per_event), numpy.float64)
+        keys = [(name, -1, "voltage") for name in task.channel_names]
+
+        def callback(task_handle, every_n_samples_event_type, number_of_samples, callback_data):
+            try:
+                reader.read_many_sample(samples, self._samples_per_event, 0.0)
+                ring_buffer.write(samples)
+                if self._accumulator is not None:
+                    with self._lock:
+                        self._accumulator.update(keys, samples)
+            except Exception as error:
+                if self.error is None:
+                    self.error = error
+            return 0
+
+        return callback
+
+    def _check(self):
+        """raises the error of a callback"""
+        if self.error is not None:
+            raise self.error
+
+    def latest_window(self, samples_per_channel: int):
+        """
+        Copies the last samples of every task.
+        Args:
+            samples_per_channel: number of samples per channel, at most the buffer samples
+        Return:
+            Array of data, channels x samples
+        """
+        self._check()
+        return numpy.concatenate([ring_buffer.latest(samples_per_channel) for ring_buffer in self.ring_buffers])
+
+    def trigger_window(
+        self,
+        channel: int,
+        level: float,
+        pre_samples: int,
+        post_samples: int,
+        rising=True,
+        start=0,
+    ):
+        """
+        Extracts the samples of every task around the first crossing of a level by a channel.
+        Args:
+            channel: row of the trigger channel in channel_names
+            level: trigger level
+            pre_samples: samples before the trigger sample
+            post_samples: samples from the trigger sample
+            rising: rising or falling crossing
+            start: index to search the trigger from, pass the previous trigger index plus one to
+                find the next trigger
+        Return:
+            Tuple of the trigger sample index and the channels x (pre + post samples) window, None
+            when no trigger with all its post trigger samples is buffered yet
+        """
+        self._check()
+        for ring_buffer in self.ring_buffers:
+            if channel < ring_buffer.channels:
+                trigger = ring_buffer.trigger_window(channel, level, pre_samples, post_samples, rising, start)
+                break
+            channel -= ring_buffer.channels
+        else:
+            raise IndexError("channel out of range")
+        if trigger is None:
+            return None
+        index, _ = trigger
+        if any(index + post_samples > ring_buffer.total for ring_buffer in self.ring_buffers):
+            return None
+        window = [
+            ring_buffer.read(index - pre_samples, pre_samples + post_samples) for ring_buffer in self.ring_buffers
+        ]
+        return index, numpy.concatenate(window)
+
+    def statistics(self):
+        """
+        Returns the streaming statistics of the accumulator.
+        Return:
+            Dictionary of (channel name, -1, "voltage") -> MeasurementStatistics
+        """
+        self._check()
+        with self._lock:
+            return self._accumulator.export() if self._accumulator is not None else {}
+
+    def stop(self):
+        """
+        Stops the tasks and unregisters the callbacks, then raises the error of a callback.
+        """
+        for task in self.tasks:
+            task.stop()
+            task.register_every_n_samples_acquired_into_buffer_event(self._samples_per_event, None)
+            _every_n_callback_tasks.discard(task)
+        self._check()
+
 
 class _Sessions:
     """
@@ -374,6 +568,68 @@ class _Sessions:
             waveform += data
         return waveform
 
+    def read_waveform_into(
+        self,
+        samples_per_channel: int,
+        buffer: typing.Optional[numpy.ndarray] = None,
+        timeout=10,
+    ):
+        """
+        Reads waveforms from each task specified in the list of session into one NumPy array, the
+        rows of each task follow the rows of the previous one. A task shared by several sessions,
+        like the site sessions of pins_to_session_sessions_info, is read once. The samples are read
+        with the stream readers directly into the rows of the array, no Python list is created.
+        Args:
+            samples_per_channel: Specifies the number of samples to read per channel.
+            buffer: C contiguous float64 array of total number of channels x samples per channel
+                to read into. If not set a new array is allocated, pass the same buffer on every
+                call to avoid the allocation.
+            timeout: Specifies the amount of time in seconds to wait for the samples of each task.
+        Return:
+            Array of data, channels x samples
+        """
+        sessions = self._task_sessions()
+        rows = [session.Task.number_of_channels for session in sessions]
+        buffer = _waveform_buffer(buffer, (sum(rows), samples_per_channel))
+        start = 0
+        for session, count in zip(sessions, rows):
+            session.st_read_wave_into(buffer[start : start + count], timeout)
+            start += count
+        return buffer
+
+    def read_synchronized(
+        self,
+        samples_per_channel: int,
+        buffer: typing.Optional[numpy.ndarray] = None,
+        timeout=10,
+    ):
+        """
+        Reads the tasks started with start_synchronized concurrently, one thread per task, into
+        one NumPy array. The rows of each task follow the rows of the previous task, a task shared
+        by several sessions is read once. As the tasks share their clock and start trigger, the
+        columns of the array are the same sample instants for all the channels. Raises ValueError
+        when the session list has no task.
+        Args:
+            samples_per_channel: Specifies the number of samples to read per channel.
+            buffer: C contiguous float64 array of total number of channels x samples per channel
+                to read into. If not set a new array is allocated.
+            timeout: Specifies the amount of time in seconds to wait for the samples of each task.
+        Return:
+            Array of data, channels x samples
+        """
+        sessions = self._synchronized_sessions()
+        rows = [session.Task.number_of_channels for session in sessions]
+        buffer = _waveform_buffer(buffer, (sum(rows), samples_per_channel))
+        starts = numpy.cumsum([0] + rows)
+        with concurrent.futures.ThreadPoolExecutor(len(sessions)) as executor:
+            futures = [
+                executor.submit(session.st_read_wave_into, buffer[start:stop], timeout)
+                for session, start, stop in zip(sessions, starts[:-1], starts[1:])
+            ]
+            for future in futures:
+                future.result()
+        return buffer
+
     def write_data(self, data: typing.List[float]):
         """
         Writes samples to the task or virtual channels you specify.
@@ -453,6 +709,66 @@ class _Sessions:
         for session in self.sessions:
             session.st_ctrl_stop()
 
+    def start_synchronized(self):
+        """
+        Starts the tasks configured with configure_synchronization with a single arm: the tasks
+        sharing the start trigger are started first and wait for it, then the first task is
+        started and its start trigger starts all of them on the same sample clock edge. Raises
+        ValueError when the session list has no task.
+        """
+        sessions = self._synchronized_sessions()
+        started = []
+        try:
+            for session in sessions[1:] + sessions[:1]:
+                session.st_ctrl_start()
+                started.append(session)
+        except Exception:
+            for session in started:
+                session.st_ctrl_stop()
+            raise
+
+    def start_continuous(
+        self,
+        samples_per_event: int = 1000,
+        buffer_samples: int = 100000,
+        accumulator: typing.Optional[ni_dt_analysis.StatisticsAccumulator] = None,
+    ):
+        """
+        Starts a continuous acquisition of each task in the session list, configured with
+        timing(continuous=True). Every samples_per_event samples a callback drains the samples of
+        each task into a ring buffer, so no sample is lost between the reads of the test.
+        Args:
+            samples_per_event: number of samples per channel drained by each callback.
+            buffer_samples: number of last samples per channel kept for each task.
+            accumulator: streaming statistics updated with every drained sample, keyed by
+                (channel name, -1, "voltage").
+        Return:
+            ContinuousAcquisition: ring buffers of the tasks, call its stop method to stop
+        """
+        tasks = [session.Task for session in self._task_sessions()]
+        acquisition = ContinuousAcquisition(tasks, samples_per_event, buffer_samples, accumulator)
+        try:
+            for task in tasks:
+                task.start()
+        except Exception:
+            acquisition.stop()
+            raise
+        return acquisition
+
+    def _task_sessions(self):
+        """First session of each task in the session list, in order"""
+        sessions = {}
+        for session in self.sessions:
+            sessions.setdefault(id(session.Task), session)
+        return list(sessions.values())
+
+    def _synchronized_sessions(self):
+        """First session of each task to synchronize, raises ValueError without any task"""
+        sessions = self._task_sessions()
+        if not sessions:
+            raise ValueError("The session list has no task to synchronize")
+        return sessions
+
     # Task Properties
     def get_task_properties(self):
         """
@@ -474,6 +790,7 @@ class _Sessions:
         samples_per_channel: int = 1000,
         sampling_rate_hz: float = 1000.0,
         clock_source: str = "",
+        continuous=False,
     ):
         """
         Sets the source of the Sample Clock, its rate and number of samples to acquire or generate
@@ -488,9 +805,45 @@ class _Sessions:
                 expected rate of that clock. Default to 1000
             clock_source: specifies the source terminal of the Sample Clock. Leave this input
                 undefined to use the default onboard clock of the device.
+            continuous: acquires or generates samples until the tasks are stopped, samples per
+                channel then sets the buffer size. Use start_continuous to drain the samples.
         """
         for session in self.sessions:
-            session.st_timing(samples_per_channel, sampling_rate_hz, clock_source)
+            session.st_timing(samples_per_channel, sampling_rate_hz, clock_source, continuous)
+
+    def configure_synchronization(
+        self,
+        reference_clock_source: str = "PXI_Clk10",
+        reference_clock_rate_hz: float = 10e6,
+        share_sample_clock=False,
+    ):
+        """
+        Synchronizes the tasks in the session list, configured with timing, to the first task.
+        All the tasks are locked to the same reference clock and the other tasks start on the
+        start trigger of the first task, NI-DAQmx routes both through the PXI trigger lines or
+        the RTSI cable. Start them with start_synchronized and read them with read_synchronized.
+        The start trigger previously configured on the first task is disabled, so that the first
+        task starts when start_synchronized starts it, and the start triggers of the other tasks
+        are replaced. Raises ValueError when the session list has no task.
+
+        Args:
+            reference_clock_source: terminal of the reference clock shared by all the tasks, like
+                PXI_Clk10 for a PXI chassis or /Dev1/RefClockOut for devices connected with RTSI.
+                Leave empty to keep the reference clock of each task. Default to PXI_Clk10
+            reference_clock_rate_hz: frequency of the reference clock. Default to 10 MHz
+            share_sample_clock: the other tasks also use the sample clock of the first task instead
+                of their own, for devices that cannot lock to the reference clock.
+        """
+        sessions = self._synchronized_sessions()
+        if reference_clock_source:
+            for session in sessions:
+                session.st_reference_clock(reference_clock_source, reference_clock_rate_hz)
+        master = sessions[0].Task
+        master.triggers.start_trigger.disable_start_trig()  # starts with start_synchronized
+        for session in sessions[1:]:
+            if share_sample_clock:
+                session.Task.timing.samp_clk_src = master.timing.samp_clk_term
+            session.st_start_digital_edge(master.triggers.start_trigger.term)
 
     # Trigger
     def reference_analog_edge(
@@ -556,6 +909,15 @@ class _Sessions:
             session.st_ref_digital_edge(trigger_source, edge, pre_trigger_samples_per_channel)
 
 
+def _waveform_buffer(buffer: typing.Optional[numpy.ndarray], shape: typing.Tuple[int, int]):
+    """Checks the buffer to read into, or allocates it if not set"""
+    if buffer is None:
+        return numpy.empty(shape, numpy.float64)
+    if buffer.shape != shape or buffer.dtype != numpy.float64 or not buffer.flags.c_contiguous:
+        raise ValueError("buffer must be a C contiguous float64 array of shape {}".format(shape))
+    return buffer
+
+
 class MultipleSessions(_Sessions):
     """
     Class that contains a list of DAQmx sessions with methods to control all sessions inside the
@@ -593,6 +955,166 @@ def reset_devices(task: nidaqmx.Task):
     return nidaqmx.Task(task_name)
 
 
+_INPUT_VOLTAGE_RANGE = 10.0
+
+
+def _add_ao_channels(task: nidaqmx.Task, physical_channel: str):
+    task.ao_channels.add_ao_voltage_chan(physical_channel)
+
+
+def _add_ai_channels(task: nidaqmx.Task, physical_channel: str):
+    task.ai_channels.add_ai_voltage_chan(
+        physical_channel,
+        "",
+        nidaqmx.constants.TerminalConfiguration.DIFFERENTIAL,
+        -_INPUT_VOLTAGE_RANGE,
+        _INPUT_VOLTAGE_RANGE,
+    )
+
+
+def _add_ai_dsa_channels(task: nidaqmx.Task, physical_channel: str):
+    task.ai_channels.add_ai_voltage_chan(physical_channel)
+
+
+def _add_ao_dsa_channels(task: nidaqmx.Task, physical_channel: str):
+    channels = task.ao_channels.add_ao_voltage_chan(physical_channel)
+    # TODO Config doesn't write properly for DSA channel
+    channels.ao_term_cfg = nidaqmx.constants.TerminalConfiguration.DIFFERENTIAL
+
+
+def _add_do_channels(task: nidaqmx.Task, physical_channel: str):
+    task.do_channels.add_do_chan(physical_channel, "", nidaqmx.constants.LineGrouping.CHAN_PER_LINE)
+
+
+class _TaskConfiguration(typing.NamedTuple):
+    add_channels: typing.Callable[[nidaqmx.Task, str], None]
+    add_channels_after_reset: typing.Callable[[nidaqmx.Task, str], None]
+    sample_timing_type: nidaqmx.constants.SampleTimingType
+
+
+# task type in the pin map -> configuration of its tasks, in creation order
+_TASK_CONFIGURATIONS = {
+    "AnalogOutput": _TaskConfiguration(
+        _add_ao_channels, _add_ao_channels, nidaqmx.constants.SampleTimingType.SAMPLE_CLOCK
+    ),
+    "AnalogInput": _TaskConfiguration(
+        _add_ai_channels, _add_ai_dsa_channels, nidaqmx.constants.SampleTimingType.SAMPLE_CLOCK
+    ),
+    "AnalogInputDSA": _TaskConfiguration(
+        _add_ai_dsa_channels,
+        _add_ai_dsa_channels,
+        nidaqmx.constants.SampleTimingType.SAMPLE_CLOCK,
+    ),
+    "AnalogOutputDSA": _TaskConfiguration(
+        _add_ao_dsa_channels, _add_ao_channels, nidaqmx.constants.SampleTimingType.SAMPLE_CLOCK
+    ),
+    "DigitalOutput": _TaskConfiguration(
+        _add_do_channels, _add_do_channels, nidaqmx.constants.SampleTimingType.ON_DEMAND
+    ),
+}
+_task_cache = {}  # (pin map file, task type, task name, channel list) -> task created by set_task
+# tasks with an every N samples callback registered by ContinuousAcquisition and not unregistered yet
+_every_n_callback_tasks: "weakref.WeakSet[nidaqmx.Task]" = weakref.WeakSet()
+# (pin map file, pins, sites) -> (DAQmx pins, site sessions) cache of pins_to_session_sessions_info
+_pins_to_task_cache: typing.Dict[typing.Tuple, typing.Tuple[typing.List[str], list]] = {}
+
+
+def _channel_devices(physical_channel: str):
+    """Names of the devices of a physical channel list like "DAQ1/ai0:3,DAQ2/ai0"."""
+    return {channel.strip().split("/")[0] for channel in physical_channel.split(",")} - {""}
+
+
+def _create_task(task_type: str, task_name: str, physical_channel: str):
+    """
+    Creates and configures one task of the task type. When the configuration fails only the
+    devices of the task are reset and the task is created again.
+    """
+    configuration = _TASK_CONFIGURATIONS[task_type]
+    task = nidaqmx.Task(task_name)
+    try:
+        configuration.add_channels(task, physical_channel)
+        task.timing.samp_timing_type = configuration.sample_timing_type
+    except Exception:
+        task.close()
+        for device in _channel_devices(physical_channel):
+            nidaqmx.system.Device(device).reset_device()
+        task = nidaqmx.Task(task_name)
+        try:
+            configuration.add_channels_after_reset(task, physical_channel)
+            task.timing.samp_timing_type = configuration.sample_timing_type
+        except Exception:
+            task.close()
+            raise
+    return task
+
+
+def _reset_task(task_type: str, task: nidaqmx.Task):
+    """
+    Stops a task reused by set_task and resets what the sessions and ContinuousAcquisition
+    configure on the task type back to a new task: an on demand task only gets its timing type
+    back, a sample clock task also its triggers and sample and reference clocks, and an input task
+    its reference trigger and the every N samples callback left registered.
+    """
+    task.stop()
+    sample_timing_type = _TASK_CONFIGURATIONS[task_type].sample_timing_type
+    if sample_timing_type == nidaqmx.constants.SampleTimingType.SAMPLE_CLOCK:
+        task.triggers.start_trigger.disable_start_trig()
+        if "Input" in task_type:
+            task.triggers.reference_trigger.disable_ref_trig()
+        if task in _every_n_callback_tasks:
+            task.register_every_n_samples_acquired_into_buffer_event(1, None)
+            _every_n_callback_tasks.discard(task)
+        for attribute in (
+            "samp_quant_samp_mode",
+            "samp_quant_samp_per_chan",
+            "samp_clk_rate",
+            "samp_clk_src",
+            "ref_clk_src",
+            "ref_clk_rate",
+        ):
+            delattr(task.timing, attribute)
+    task.timing.samp_timing_type = sample_timing_type
+
+
+def _create_tasks(keys: typing.List[typing.Tuple[str, str, str, str]]):
+    """
+    Creates the tasks of the keys one after the other and returns the created tasks with the
+    error that stopped the creation, if any.
+    """
+    tasks = {}
+    try:
+        for key in keys:
+            tasks[key] = _create_task(*key[1:])
+    except Exception as error:
+        return tasks, error
+    return tasks, None
+
+
+def _group_by_devices(keys: typing.List[typing.Tuple[str, str, str, str]]):
+    """
+    Splits the task keys into groups that do not share any device, keeping the order of the keys
+    in each group.
+    """
+    groups: typing.List[typing.Tuple[set, list]] = []
+    for key in keys:
+        devices = _channel_devices(key[3])
+        group_keys = [key]
+        for group in [group for group in groups if group[0] & devices]:
+            groups.remove(group)
+            devices |= group[0]
+            group_keys = group[1] + group_keys
+        groups.append((devices, group_keys))
+    return [sorted(group_keys, key=keys.index) for _, group_keys in groups]
+
+
+def clear_pins_to_task_cache():
+    """
+    Clears the tasks and channel lists cached by pins_to_session_sessions_info. It is called by
+    set_task and clear_task, call it if the tasks are set in the SMContext by other means.
+    """
+    _pins_to_task_cache.clear()
+
+
 @nitsm.codemoduleapi.code_module
 def clear_task(tsm: SMContext):
     """
@@ -600,126 +1122,55 @@ def clear_task(tsm: SMContext):
     necessary, and will release any resources the tasks reserved. You cannot use a task after you
     clear it unless you set it again.
     """
-    task_ao = tsm.get_all_nidaqmx_tasks("AnalogOutput")
-    tasks_ai = tsm.get_all_nidaqmx_tasks("AnalogInput")
-    tasks_ai_dsa = tsm.get_all_nidaqmx_tasks("AnalogInputDSA")
-    tasks_ao_dsa = tsm.get_all_nidaqmx_tasks("AnalogOutputDSA")
-    tasks_do = tsm.get_all_nidaqmx_tasks("DigitalOutput")
-
-    for task in task_ao:
-        task.stop()
-        task.close()
-    for task in tasks_ai:
-        task.stop()
-        task.close()
-    for task in tasks_ai_dsa:
-        task.stop()
-        task.close()
-    for task in tasks_ao_dsa:
-        task.stop()
-        task.close()
-    for task in tasks_do:
-        task.stop()
-        task.close()
+    for task_type in _TASK_CONFIGURATIONS:
+        for task in tsm.get_all_nidaqmx_tasks(task_type):
+            task.stop()
+            task.close()
+    _task_cache.clear()
+    clear_pins_to_task_cache()
 
 
 @nitsm.codemoduleapi.code_module
 def set_task(tsm: SMContext):
     """
     Associates each NI-DAQmx tasks with the NI-DAQmx task name defined in the pin map and
-    set all the sessions accordingly
+    set all the sessions accordingly. The tasks of different devices are created concurrently and
+    the tasks created by the previous call are reused when the pin map did not change, stopped and
+    with their timing, triggers and every N samples callback reset. A task that fails to reset is
+    closed and created again.
     """
-    input_voltage_range = 10.0
-    task_names, channel_lists = tsm.get_all_nidaqmx_task_names(
-        "AnalogOutput"
-    )  # Replace String if PinMap change
-    for task_name, physical_channel in zip(task_names, channel_lists):
-        task = nidaqmx.Task(task_name)
-        try:
-            task.ao_channels.add_ao_voltage_chan(
-                physical_channel=physical_channel,
-            )
-            task.timing.samp_timing_type = nidaqmx.constants.SampleTimingType.SAMPLE_CLOCK
-        except Exception:
-            task = reset_devices(task)
-            task.ao_channels.add_ao_voltage_chan(physical_channel)
-            task.timing.samp_timing_type = nidaqmx.constants.SampleTimingType.SAMPLE_CLOCK
-        finally:
-            tsm.set_nidaqmx_task(task_name, task)
-    # input_voltage_range = 10.0
-    task_names, channel_lists = tsm.get_all_nidaqmx_task_names(
-        "AnalogInput"
-    )  # Replace String if PinMap change
-    for task_name, physical_channel in zip(task_names, channel_lists):
-        task = nidaqmx.Task(task_name)
-        try:
-            task.ai_channels.add_ai_voltage_chan(
-                physical_channel,
-                "",
-                nidaqmx.constants.TerminalConfiguration.DIFFERENTIAL,
-                -input_voltage_range,
-                input_voltage_range,
-            )
-            task.timing.samp_timing_type = nidaqmx.constants.SampleTimingType.SAMPLE_CLOCK
-        except Exception:
-            task = reset_devices(task)
-            task.ai_channels.add_ai_voltage_chan(physical_channel)
-            task.timing.samp_timing_type = nidaqmx.constants.SampleTimingType.SAMPLE_CLOCK
-        finally:
-            tsm.set_nidaqmx_task(task_name, task)
-
-    task_names, channel_lists = tsm.get_all_nidaqmx_task_names(
-        "AnalogInputDSA"
-    )  # Replace String if PM change
-    for task_name, physical_channel in zip(task_names, channel_lists):
-        task = nidaqmx.Task(task_name)
-        try:
-            ch = task.ai_channels.add_ai_voltage_chan(physical_channel)
-            print(ch.ai_coupling, ch.ai_term_cfg, ch.channel_names)
-            task.timing.samp_timing_type = nidaqmx.constants.SampleTimingType.SAMPLE_CLOCK
-        except Exception:
-            task = reset_devices(task)
-            task.ai_channels.add_ai_voltage_chan(physical_channel)
-            task.timing.samp_timing_type = nidaqmx.constants.SampleTimingType.SAMPLE_CLOCK
-        finally:
-            tsm.set_nidaqmx_task(task_name, task)
-
-    task_names, channel_lists = tsm.get_all_nidaqmx_task_names(
-        "AnalogOutputDSA"
-    )  # Replace String if PM change
-    for task_name, physical_channel in zip(task_names, channel_lists):
-        task = nidaqmx.Task(task_name)
-        try:
-            ch = task.ao_channels.add_ao_voltage_chan(physical_channel)
-            # TODO Config doesn't write properly for DSA channel
-            ch.ao_term_cfg = nidaqmx.constants.TerminalConfiguration.DIFFERENTIAL
-            print(ch.ao_term_cfg, ch.ao_min, ch.channel_names)
-            task.timing.samp_timing_type = nidaqmx.constants.SampleTimingType.SAMPLE_CLOCK
-        except Exception:
-            task = reset_devices(task)
-            task.ao_channels.add_ao_voltage_chan(physical_channel)
-            task.timing.samp_timing_type = nidaqmx.constants.SampleTimingType.SAMPLE_CLOCK
-        finally:
-            tsm.set_nidaqmx_task(task_name, task)
-
-    task_names, channel_lists = tsm.get_all_nidaqmx_task_names(
-        "DigitalOutput"
-    )  # Replace String if PM change
-    for task_name, physical_channel in zip(task_names, channel_lists):
-        task = nidaqmx.Task(task_name)
-        try:
-            task.do_channels.add_do_chan(
-                physical_channel, "", nidaqmx.constants.LineGrouping.CHAN_PER_LINE
-            )
-            task.timing.samp_timing_type = nidaqmx.constants.SampleTimingType.ON_DEMAND
-        except Exception:
-            task = reset_devices(task)
-            task.do_channels.add_do_chan(
-                physical_channel, "", nidaqmx.constants.LineGrouping.CHAN_PER_LINE
-            )
-            task.timing.samp_timing_type = nidaqmx.constants.SampleTimingType.ON_DEMAND
-        finally:
-            tsm.set_nidaqmx_task(task_name, task)
+    clear_pins_to_task_cache()
+    pin_map_file_path = tsm.pin_map_file_path
+    keys = []
+    for task_type in _TASK_CONFIGURATIONS:
+        task_names, channel_lists = tsm.get_all_nidaqmx_task_names(task_type)
+        for task_name, physical_channel in zip(task_names, channel_lists):
+            keys.append((pin_map_file_path, task_type, task_name, physical_channel))
+    for key in [key for key in _task_cache if key not in keys]:
+        _task_cache.pop(key).close()
+    for key in keys:
+        if key in _task_cache:
+            try:
+                _reset_task(key[1], _task_cache[key])
+            except Exception:  # created again with the new tasks
+                task = _task_cache.pop(key)
+                try:
+                    task.close()
+                except Exception:
+                    pass
+    new_keys = [key for key in keys if key not in _task_cache]
+    groups = _group_by_devices(new_keys)
+    first_error = None
+    if groups:
+        with concurrent.futures.ThreadPoolExecutor(len(groups)) as executor:
+            for tasks, error in executor.map(_create_tasks, groups):
+                _task_cache.update(tasks)
+                first_error = first_error or error
+    for key in keys:
+        if key in _task_cache:
+            tsm.set_nidaqmx_task(key[2], _task_cache[key])
+    if first_error is not None:
+        raise first_error
 
 
 # Pin Map
@@ -763,7 +1214,8 @@ def get_all_sessions(tsm: SMContext, task_type: str = ""):
 def pins_to_session_sessions_info(tsm: SMContext, pins: PinsArg):
     """
     Returns a properly filled object of the type MultipleSessions with a session per each
-    site defined in the pin map
+    site defined in the pin map. The task and channel list of the pins are cached until the next
+    set_task or clear_task.
     Args:
         tsm: Pin context defined by pin map
         pins: The name of the pin(s) or pin group(s) to translate to a task.
@@ -773,18 +1225,24 @@ def pins_to_session_sessions_info(tsm: SMContext, pins: PinsArg):
     """
     if type(pins) == str:
         pins = [pins]
-    pin_list = tsm.filter_pins_by_instrument_type(
-        pins, nitsm.enums.InstrumentTypeIdConstants.NI_DAQMX, nitsm.enums.Capability.ALL
-    )
-    print(pin_list)
-    (pin_query_contex, task, channel_list) = tsm.pins_to_nidaqmx_task(pin_list)
-    sites = tsm.site_numbers
-    multiple_session_info = MultipleSessions(pin_query_contex, [])
-    for site in sites:
+    sites = tuple(tsm.site_numbers)
+    key = (tsm.pin_map_file_path, tuple(pins), sites)
+    cached = _pins_to_task_cache.get(key)
+    if cached is None:
+        pin_list = tsm.filter_pins_by_instrument_type(
+            pins, nitsm.enums.InstrumentTypeIdConstants.NI_DAQMX, nitsm.enums.Capability.ALL
+        )
+        pin_query_contex, task, channel_list = tsm.pins_to_nidaqmx_task(pin_list)
         pin_data = ",".join(pin_list)
-        session = _Session(task, channel_list, pin_data, site)
-        multiple_session_info.sessions.append(session)
-    return multiple_session_info
+        cached = (list(pin_list), [_Session(task, channel_list, pin_data, site) for site in sites])
+        _pins_to_task_cache[key] = cached
+    else:
+        # pins_to_nidaqmx_task builds its pin query context from the COM context of the
+        # SMContext and the pins only, without any driver or pin map call. It is built again for
+        # the context of this call, the context of a previous step is not valid for publishing.
+        pin_query_contex = nitsm.pinquerycontexts.PinQueryContext(tsm._context, cached[0])
+    sessions = list(cached[1])
+    return MultipleSessions(pin_query_contex, sessions)
 
 
 @nitsm.codemoduleapi.code_module
@@ -1,18 +1,24 @@
 """
 This is nidcpower wrapper for use with STS test codes
 """
+import concurrent.futures
 import math
 import re
+import time
+import types
 import typing
+import weakref
 from cmath import nan
 from datetime import datetime
 import nidcpower
 import nidcpower.enums as enums
 import nidcpower.errors
 import nitsm.codemoduleapi
+import numpy
 from nitsm.codemoduleapi import SemiconductorModuleContext as SMContext
+from . import analysis
 from . import common
-
+from . import waveform_store
 
 class _ModelSupport:
     """
@@ -46,6 +52,236 @@ class _ModelSupport:
     POWER_LINE_FREQUENCY = ALL_MODELS - {"NI PXI-4110", "NI PXI-4130", "NI PXIe-4154"}
 
 
+class ModelCapabilities(typing.NamedTuple):
+    """
+    static capabilities of one model, or one channel of a model, of ni dc power instruments
+    """
+
+    model_number: int
+    voltage_ranges: typing.Tuple[float, ...]
+    current_ranges: typing.Tuple[float, ...]
+    resistor_v_ranges: typing.Tuple[float, ...]
+    resistor_i_ranges: typing.Tuple[float, ...]
+    aperture_time_supported: bool
+    samples_to_average_rate: float
+    sense_supported: bool
+    transient_response_supported: bool
+    output_connected_supported: bool
+    power_line_frequency_supported: bool
+    measure_trigger_supported: bool
+    default_output_state_0v: bool
+
+
+# model number -> voltage, current, resistor voltage and resistor current ranges
+_MODEL_RANGES = {
+    4110: ((), (1,), (), ()),
+    4112: ((60,), (1,), (), ()),
+    4113: ((10,), (6,), (), ()),
+    4132: ((10, 100), (10e-6, 100e-6, 1e-3, 10e-3, 0.1), (), ()),
+    4135: (
+        (0.6, 6, 20, 200),
+        (10e-9, 1e-6, 100e-6, 1e-3, 10e-3, 0.1, 1),
+        (500000000, 5000000, 50000, 5000, 500, 50, 5),
+        (500000000, 5000000, 50000, 5000, 500, 50, 5),
+    ),
+    4136: ((0.6, 6, 20, 200), (1e-6, 10e-6, 100e-6, 1e-3, 10e-3, 0.1, 1), (), ()),
+    4137: (
+        (0.6, 6, 20, 200),
+        (1e-6, 10e-6, 100e-6, 1e-3, 10e-3, 0.1, 1),
+        (5000000, 500000, 50000, 5000, 500, 50, 5),
+        (5000000, 500000, 50000, 5000, 500, 50, 5),
+    ),
+    4138: ((0.6, 6, 60), (1e-6, 10e-6, 100e-6, 1e-3, 10e-3, 0.1, 1, 3), (), ()),
+    4139: (
+        (0.6, 6, 60),
+        (1e-6, 10e-6, 100e-6, 1e-3, 10e-3, 0.1, 1, 3),
+        (5000000, 500000, 50000, 5000, 500, 50, 5, 0.5),
+        (5000000, 500000, 50000, 5000, 500, 50, 5, 0.5),
+    ),
+    4140: ((10,), (10e-6, 100e-6, 1e-3, 10e-3, 0.1), (), ()),
+    4141: ((10,), (10e-6, 100e-6, 1e-3, 10e-3, 0.1), (100000, 10000, 1000, 100, 10), ()),
+    4142: ((24,), (10e-6, 100e-6, 1e-3, 10e-3, 0.15), (), ()),
+    4143: ((24,), (10e-6, 100e-6, 1e-3, 10e-3, 0.15), (100000, 10000, 1000, 100, 6.66), ()),
+    4144: ((6,), (10e-6, 100e-6, 1e-3, 10e-3, 0.1, 0.5), (), ()),
+    4145: ((6,), (10e-6, 100e-6, 1e-3, 10e-3, 0.1, 0.5), (50000, 5000, 500, 50, 5, 1), ()),
+    4147: (
+        (1, 8),
+        (1e-6, 10e-6, 100e-6, 1e-3, 10e-3, 0.1, 3),
+        (4000000, 400000, 40000, 4000, 400, 40, 1.25),
+        (2500000, 250000, 25000, 2500, 250, 25, 750),
+    ),
+    4162: ((24,), (10e-6, 100e-6, 1e-3, 10e-3, 0.1), (), ()),
+    4163: ((24,), (10e-6, 100e-6, 1e-3, 10e-3, 0.05), (), ()),
+}
+
+_MODEL_NUMBERS = {model: int(model[-4:]) for model in _ModelSupport.ALL_MODELS}
+
+# models which are not listed are expected to support all the properties, like the model number
+# checks they replace, but as they are not in _ModelSupport the power line frequency is not
+# configured and they are initiated by initialize_sessions
+_UNKNOWN_MODEL_CAPABILITIES = ModelCapabilities(0, (), (), (), (), True, 0.0, True, True, True, False, True, False)
+
+
+def _build_capability_index():
+    """
+    builds the capability index of all the supported models. The entries with channel None apply
+    to all the channels of the model, the other entries override one channel of the model.
+
+    Returns:
+        mapping: (model number, channel number or None) -> ModelCapabilities, read only
+    """
+    index = {}
+    for model, model_number in _MODEL_NUMBERS.items():
+        ranges = _MODEL_RANGES.get(model_number, ((), (), (), ()))
+        index[(model_number, None)] = ModelCapabilities(
+            model_number,
+            *ranges,
+            aperture_time_supported=model_number not in (4110, 4130, 4154),
+            samples_to_average_rate={4110: 3000.0, 4130: 3000.0, 4154: 300000.0}.get(model_number, 0.0),
+            sense_supported=model_number not in (4110, 4112, 4113, 4130),
+            transient_response_supported=model_number not in (4110, 4112, 4113, 4130, 4132),
+            output_connected_supported=model_number not in (4110, 4130, 4140, 4141, 4142, 4143, 4144, 4145),
+            power_line_frequency_supported=model in _ModelSupport.POWER_LINE_FREQUENCY,
+            measure_trigger_supported=model_number not in (4110, 4130),
+            default_output_state_0v=model in _ModelSupport.DEFAULT_OUTPUT_STATE_0V,
+        )
+    for channel, voltage_range in enumerate((6, 20, -20)):
+        index[(4110, channel)] = index[(4110, None)]._replace(voltage_ranges=(voltage_range,))
+    index[(4130, 1)] = index[(4130, None)]._replace(sense_supported=True)
+    index[(4154, 1)] = index[(4154, None)]._replace(transient_response_supported=False)
+    return types.MappingProxyType(index)
+
+
+_CAPABILITY_INDEX = _build_capability_index()
+
+
+def get_model_capabilities(model_number: int, channel: typing.Optional[int] = None):
+    """
+    looks up the capabilities of a model, or of one channel of a model, in the capability index
+
+    Args:
+        model_number (int): model number like 4163
+        channel (int, optional): channel number. Defaults to None, capabilities of the model.
+
+    Returns:
+        ModelCapabilities: capabilities. Unknown models have no ranges and support all the
+            properties except the power line frequency, and their output state is not 0 V.
+    """
+    capabilities = _CAPABILITY_INDEX.get((model_number, channel))
+    if capabilities is None:
+        capabilities = _CAPABILITY_INDEX.get((model_number, None))
+    if capabilities is None:
+        capabilities = _UNKNOWN_MODEL_CAPABILITIES._replace(model_number=model_number)
+    return capabilities
+
+
+def _instrument_capabilities(model: str, model_number: int, channel: typing.Optional[int] = None):
+    """
+    capabilities of an instrument from its model string. Models which are not in _ModelSupport get
+    the ranges of their model number, but the power line frequency is not configured and they are
+    initiated by initialize_sessions, as for unknown models.
+    """
+    capabilities = get_model_capabilities(model_number, channel)
+    if model not in _MODEL_NUMBERS:
+        capabilities = capabilities._replace(power_line_frequency_supported=False, default_output_state_0v=False)
+    return capabilities
+
+
+_instrument_info_cache = {}  # instrument name -> InstrumentInfo cache
+_session_instrument_names = weakref.WeakKeyDictionary()  # session -> instrument name of its channels
+
+
+class InstrumentInfo(typing.NamedTuple):
+    """
+    static information of one instrument, it does not change while the session is open
+    """
+
+    instrument_name: str
+    model: str
+    manufacturer: str
+    model_number: int
+    capabilities: ModelCapabilities
+
+
+def _get_instrument_info(session: nidcpower.Session, instrument_name: str):
+    """
+    returns the static information of the instrument from the cache. The model and manufacturer are
+    read from the driver only the first time the instrument is requested.
+
+    Args:
+        session (nidcpower.Session): session in which the instrument is opened
+        instrument_name (str): resource name of the instrument, "" for the instrument of a session
+            opened on one instrument, resolved from the name of its first channel
+
+    Returns:
+        InstrumentInfo: cached static information of the instrument
+    """
+    if not instrument_name:
+        instrument_name = _session_instrument_name(session)
+    info = _instrument_info_cache.get(instrument_name) if instrument_name else None
+    if info is None:
+        instrument = session.instruments[instrument_name] if instrument_name else session
+        model = instrument.instrument_model
+        model_number = _MODEL_NUMBERS.get(model)
+        if model_number is None:
+            model_number = int(re.search(r"\d\d\d\d", model, re.RegexFlag.ASCII)[0])
+        info = InstrumentInfo(
+            instrument_name,
+            model,
+            instrument.instrument_manufacturer,
+            model_number,
+            _instrument_capabilities(model, model_number),
+        )
+        if instrument_name:
+            _instrument_info_cache[instrument_name] = info
+    return info
+
+
+def _session_instrument_name(session: nidcpower.Session):
+    """
+    resolves the instrument name of a session from its first fully qualified channel name, read
+    once per session
+
+    Args:
+        session (nidcpower.Session): session opened on one instrument
+
+    Returns:
+        str: instrument name, "" when the driver does not qualify the channel names
+    """
+    instrument_name = _session_instrument_names.get(session)
+    if instrument_name is None:
+        instrument_name = session.get_channel_name(1).strip().rpartition("/")[0]
+        _session_instrument_names[session] = instrument_name
+    return instrument_name
+
+
+def _get_channel_capabilities(session: nidcpower.Session, channel: str):
+    """
+    looks up the capabilities of one channel in the capability index
+
+    Args:
+        session (nidcpower.Session): session in which the channel is opened
+        channel (str): channel name, fully qualified like "SMU1/0" or only the channel number
+
+    Returns:
+        ModelCapabilities: capabilities of the channel
+    """
+    instrument_name, _, channel_number = channel.strip().rpartition("/")
+    info = _get_instrument_info(session, instrument_name)
+    if channel_number.isdigit():
+        return _instrument_capabilities(info.model, info.model_number, int(channel_number))
+    return info.capabilities
+
+
+def clear_instrument_info_cache():
+    """
+    clears the cached static instrument information. Needs to be called whenever the sessions are
+    re-initialized.
+    """
+    _instrument_info_cache.clear()
+    _session_instrument_names.clear()
+
+
 class ResourceMap:
     """Maps resources to channels."""
 
@@ -164,83 +400,125 @@ class ChannelProperties(typing.NamedTuple):
     output_connected: str
 
 
+class SettleCriteria(typing.NamedTuple):
+    """
+    criteria to declare a channel settled. The channel is settled at the end of the first window of
+    samples whose least squares slope and standard deviation are both within the limits.
+    """
+
+    window: int = 10
+    max_slope: float = 10.0
+    max_std: float = 1e-3
+    measure_current: bool = False
+
+
+class SettleResult(typing.NamedTuple):
+    """
+    result of the settle detection of one channel, times are in seconds from the initiate that
+    forces the channel
+    """
+
+    channel: str
+    settled: bool
+    reading: float
+    settle_time: float
+    recommended_source_delay: float
+
+
+def _find_settled_window(samples, record_dt: float, criteria: SettleCriteria, start=0):
+    """
+    finds the first window of samples which meets the settle criteria
+
+    Args:
+        samples (numpy.ndarray): measured samples of one channel
+        record_dt (float): time between samples in seconds
+        criteria (SettleCriteria): slope and standard deviation limits
+        start (int, optional): first window to test, the windows before it were already tested.
+            Defaults to 0.
+
+    Returns:
+        int: index of the first sample of the settled window, -1 if no window is settled
+    """
+    window = max(int(criteria.window), 2)
+    start = max(int(start), 0)
+    if samples.size - start < window:
+        return -1
+    samples = samples[start:]
+    windows = numpy.lib.stride_tricks.as_strided(
+        samples,
+        shape=(samples.size - window + 1, window),
+        strides=(samples.strides[0], samples.strides[0]),
+        writeable=False,
+    )
+    x = (numpy.arange(window) - (window - 1) / 2.0) * record_dt
+    deviations = windows - windows.mean(axis=1, keepdims=True)
+    slopes = deviations @ x / numpy.dot(x, x)
+    stds = numpy.sqrt((deviations * deviations).mean(axis=1))
+    in_limits = (numpy.abs(slopes) <= criteria.max_slope) & (stds <= criteria.max_std)
+    settled = numpy.flatnonzero(in_limits)
+    return start + int(settled[0]) if settled.size else -1
+
+
+class EventWaitResult(typing.NamedTuple):
+    """
+    result of waiting on an event across several sessions, one entry per session
+    """
+
+    channels: typing.List[str]
+    completion_times: typing.List[float]
+    errors: typing.List[typing.Optional[Exception]]
+
+
+class ChannelPropertiesTable(typing.NamedTuple):
+    """
+    columnar form of the channel properties, one list per property with one entry per channel
+    """
+
+    instrument_name: typing.List[str]
+    model: typing.List[str]
+    channel: typing.List[str]
+    pin: typing.List[str]
+    output_function: typing.List[str]
+    level: typing.List[float]
+    limit: typing.List[float]
+    voltage_range: typing.List[float]
+    current_range: typing.List[float]
+    sense: typing.List[str]
+    aperture_time: typing.List[float]
+    transient_response: typing.List[str]
+    output_enabled: typing.List[str]
+    output_connected: typing.List[str]
+
+
 def model_to_ranges(model: int, channel: int):
     """Returns current, voltage and resistance (for voltage and current) ranges"""
-    current_ranges = []
-    voltage_ranges = []
-    resistor_v_ranges = []
-    resistor_i_ranges = []
-    if model == 4110:
-        current_ranges = [1]
-        if channel == 0:
-            voltage_ranges = [6]
-        elif channel == 1:
-            voltage_ranges = [20]
-        elif channel == 2:
-            voltage_ranges = [-20]
-    elif model == 4112:
-        current_ranges = [1]
-        voltage_ranges = [60]
-    elif model == 4113:
-        current_ranges = [6]
-        voltage_ranges = [10]
-    elif model == 4132:
-        current_ranges = [10e-6, 100e-6, 1e-3, 10e-3, 0.1]
-        voltage_ranges = [10, 100]
-    elif model == 4135:
-        resistor_v_ranges = [500000000, 5000000, 50000, 5000, 500, 50, 5]
-        resistor_i_ranges = resistor_v_ranges
-        current_ranges = [10e-9, 1e-6, 100e-6, 1e-3, 10e-3, 0.1, 1]
-        voltage_ranges = [0.6, 6, 20, 200]
-    elif model == 4136:
-        current_ranges = [1e-6, 10e-6, 100e-6, 1e-3, 10e-3, 0.1, 1]
-        voltage_ranges = [0.6, 6, 20, 200]
-    elif model == 4137:
-        resistor_v_ranges = [5000000, 500000, 50000, 5000, 500, 50, 5]
-        resistor_i_ranges = resistor_v_ranges
-        current_ranges = [1e-6, 10e-6, 100e-6, 1e-3, 10e-3, 0.1, 1]
-        voltage_ranges = [0.6, 6, 20, 200]
-    elif model == 4138:
-        current_ranges = [1e-6, 10e-6, 100e-6, 1e-3, 10e-3, 0.1, 1, 3]
-        voltage_ranges = [0.6, 6, 60]
-    elif model == 4139:
-        resistor_v_ranges = [5000000, 500000, 50000, 5000, 500, 50, 5, 0.5]
-        resistor_i_ranges = resistor_v_ranges
-        current_ranges = [1e-6, 10e-6, 100e-6, 1e-3, 10e-3, 0.1, 1, 3]
-        voltage_ranges = [0.6, 6, 60]
-    elif model == 4140:
-        current_ranges = [10e-6, 100e-6, 1e-3, 10e-3, 0.1]
-        voltage_ranges = [10]
-    elif model == 4141:
-        resistor_v_ranges = [100000, 10000, 1000, 100, 10]
-        current_ranges = [10e-6, 100e-6, 1e-3, 10e-3, 0.1]
-        voltage_ranges = [10]
-    elif model == 4142:
-        current_ranges = [10e-6, 100e-6, 1e-3, 10e-3, 0.15]
-        voltage_ranges = [24]
-    elif model == 4143:
-        resistor_v_ranges = [100000, 10000, 1000, 100, 6.66]
-        current_ranges = [10e-6, 100e-6, 1e-3, 10e-3, 0.15]
-        voltage_ranges = [24]
-    elif model == 4144:
-        current_ranges = [10e-6, 100e-6, 1e-3, 10e-3, 0.1, 0.5]
-        voltage_ranges = [6]
-    elif model == 4145:
-        resistor_v_ranges = [50000, 5000, 500, 50, 5, 1]
-        current_ranges = [10e-6, 100e-6, 1e-3, 10e-3, 0.1, 0.5]
-        voltage_ranges = [6]
-    elif model == 4147:
-        resistor_v_ranges = [4000000, 400000, 40000, 4000, 400, 40, 1.25]
-        resistor_i_ranges = [2500000, 250000, 25000, 2500, 250, 25, 750]
-        voltage_ranges = [1, 8]
-        current_ranges = [1e-6, 10e-6, 100e-6, 1e-3, 10e-3, 0.1, 3]
-    elif model == 4162:
-        current_ranges = [10e-6, 100e-6, 1e-3, 10e-3, 0.1]
-        voltage_ranges = [24]
-    elif model == 4163:
-        current_ranges = [10e-6, 100e-6, 1e-3, 10e-3, 0.05]
-        voltage_ranges = [24]
-    return [voltage_ranges, current_ranges, resistor_v_ranges, resistor_i_ranges]
+    capabilities = get_model_capabilities(model, channel)
+    return [
+        list(capabilities.voltage_ranges),
+        list(capabilities.current_ranges),
+        list(capabilities.resistor_v_ranges),
+        list(capabilities.resistor_i_ranges),
+    ]
+
+
+_ENVELOPE_FETCH_CHUNK = 100000  # samples fetched at once when only the envelope is kept
+
+_CURRENT_RANGE_TABLES = {
+    model_number: numpy.array(sorted(capabilities.current_ranges), dtype=numpy.float64)
+    for (model_number, channel), capabilities in _CAPABILITY_INDEX.items()
+    if channel is None
+}  # model number -> ascending current ranges, precomputed for range selection
+
+
+class AutoRangeMeasurement(typing.NamedTuple):
+    """
+    voltages, currents and the selected current limit range for each channel
+    """
+
+    voltages: typing.List[float]
+    currents: typing.List[float]
+    current_ranges: typing.List[float]
+    re_ranged: typing.List[bool]
 
 
 class _NIDCPowerSSC:
@@ -272,6 +550,7 @@ class _NIDCPowerSSC:
         self._ch_list = channels.split(",")  # channels in a list for internal operations
         self.power_line_frequency = 60.0
         self.measure_multiple_only = False
+        self._capabilities = None  # capabilities of each channel, looked up on first use
 
     @property
     def session(self):
@@ -444,41 +723,37 @@ class _NIDCPowerSSC:
                 Defaults to enums.TransientResponse.NORMAL.
         """
         self._ch_session.abort()
-        match = re.search("\d\d\d\d", self._session.instrument_model, re.RegexFlag.ASCII)[0]
-        temp = aperture_time
-        if aperture_time_unit == enums.ApertureTimeUnits.POWER_LINE_CYCLES:
-            temp = temp / self.power_line_frequency
-
-        if match == "4110":
-            self._ch_session.source_delay = source_delay
-            self._ch_session.samples_to_average = 3000 * temp
-        elif match == "4130":
-            self._ch_session.source_delay = source_delay
-            self._ch_session.samples_to_average = 3000 * temp
-            if self._ch_session.channels == "1":
-                self._ch_session.sense = sense
-        elif match == "4154":
-            self._ch_session.source_delay = source_delay
-            self._ch_session.samples_to_average = 300000 * temp
-            self._ch_session.sense = sense
-            if self._ch_session.channels == "0":
-                self._ch_session.transient_response = transient_response
-        elif match == "4132":
-            self._ch_session.aperture_time_units = aperture_time_unit
-            self._ch_session.aperture_time = aperture_time
-            self._ch_session.source_delay = source_delay
-            self._ch_session.sense = sense
-            self._ch_session.sense = sense
-        elif (match == "4112") or (match == "4112"):
-            self._ch_session.aperture_time_units = aperture_time_unit
-            self._ch_session.aperture_time = aperture_time
-            self._ch_session.source_delay = source_delay
-        else:  # All properties supported
-            self._ch_session.transient_response = transient_response
+        capabilities = self.cs_get_capabilities()
+        self._ch_session.source_delay = source_delay
+        if capabilities[0].aperture_time_supported:
             self._ch_session.aperture_time_units = aperture_time_unit
             self._ch_session.aperture_time = aperture_time
-            self._ch_session.source_delay = source_delay
-            self._ch_session.sense = sense
+        else:
+            aperture_time_s = aperture_time
+            if aperture_time_unit == enums.ApertureTimeUnits.POWER_LINE_CYCLES:
+                aperture_time_s = aperture_time_s / self.power_line_frequency
+            samples_to_average = capabilities[0].samples_to_average_rate * aperture_time_s
+            self._ch_session.samples_to_average = samples_to_average
+        self._cs_configure_supported_property("sense", sense, capabilities)
+        self._cs_configure_supported_property("transient_response", transient_response, capabilities)
+
+    def _cs_configure_supported_property(self, name, value, capabilities):
+        """
+        writes the property on the channels whose capabilities support it, with one write for all
+        the channels if they all support it.
+
+        Args:
+            name (str): property name, the capability flag is name + "_supported"
+            value: value of the property
+            capabilities (list of ModelCapabilities): capabilities of each channel
+        """
+        supported = [getattr(c, name + "_supported") for c in capabilities]
+        if all(supported):
+            setattr(self._ch_session, name, value)
+        else:
+            for channel, channel_supported in zip(self._ch_list, supported):
+                if channel_supported:
+                    setattr(self.session.channels[channel], name, value)
 
     def cs_get_aperture_time_in_seconds(self):
         """
@@ -488,49 +763,27 @@ class _NIDCPowerSSC:
         Returns:
             float: aperture time in seconds
         """
-        match = re.search("\d\d\d\d", self._session.instrument_model, re.RegexFlag.ASCII)[0]
-        all_supported_models = [
-            "4135",
-            "4136",
-            "4137",
-            "4138",
-            "4139",
-            "4140",
-            "4141",
-            "4142",
-            "4143",
-            "4144",
-            "4162",
-            "4163",
-        ]
-        actual_aperture_time = self._ch_session.aperture_time_units
-        if match in all_supported_models + ["4112", "4113", "4132"]:
-            if self._ch_session.aperture_time_units == enums.ApertureTimeUnits.POWER_LINE_CYCLES:
-                actual_aperture_time = (
-                    self._ch_session.aperture_time_units / self._ch_session.power_line_frequency
-                )
-
-        if match in ["4110", "4130"]:
-            actual_aperture_time = self._ch_session.samples_to_average / 3000
-        elif match == "4154":
-            actual_aperture_time = self._ch_session.samples_to_average / 300000
+        capabilities = self.cs_get_capabilities()[0]
+        if not capabilities.aperture_time_supported:
+            return self._ch_session.samples_to_average / capabilities.samples_to_average_rate
+        actual_aperture_time = self._ch_session.aperture_time
+        if self._ch_session.aperture_time_units == enums.ApertureTimeUnits.POWER_LINE_CYCLES:
+            actual_aperture_time = actual_aperture_time / self.cs_get_power_line_frequency()
         return actual_aperture_time
 
     def cs_get_power_line_frequency(self):
         """
-        get the power line frequency stored in the object or from the instrument based on the
-        supported model
+        get the power line frequency stored in the object for the models in the capability index
+        without the power line frequency property, or from the instrument for the other models,
+        including the unknown models
 
         Returns:
             float: power line frequency in hertz
         """
-        match = re.search("\d\d\d\d", self._session.instrument_model, re.RegexFlag.ASCII)[0]
-        configured_power_line_frequency = self._ch_session.power_line_frequency
-        if match in ["4110", "4130"]:
-            configured_power_line_frequency = self.power_line_frequency
-        elif match == "4154":
-            configured_power_line_frequency = self.power_line_frequency
-        return configured_power_line_frequency
+        capabilities = _CAPABILITY_INDEX.get((self.cs_get_capabilities()[0].model_number, None))
+        if capabilities is not None and not capabilities.power_line_frequency_supported:
+            return self.power_line_frequency
+        return self._ch_session.power_line_frequency
 
     def cs_query_in_compliance(self):
         """
@@ -1036,12 +1289,9 @@ class _NIDCPowerSSC:
         get the smu model of the pin
 
         Returns:
-            model_number (str): pxi model number of the instrument to which the pin is connected.
+            model_number (int): pxi model number of the instrument to which the pin is connected.
         """
-        smu_model_str = re.search("\d\d\d\d", self.session.instrument_model, re.RegexFlag.ASCII)[0]
-        # This will throw error if different types / models of instruments are under same session.
-        smu_model_number = int(smu_model_str)
-        return smu_model_number
+        return self.cs_get_capabilities()[0].model_number
 
     def cs_get_max_current(self):
         """
@@ -1050,14 +1300,77 @@ class _NIDCPowerSSC:
         Returns:
             current_in_amps (float): maximum current that can be drawn in amps
         """
-        smu_model_number = self.cs_get_smu_model()
-        # channel_number = int(self.channels)
-        channel_number = 0
-        all_ranges = model_to_ranges(smu_model_number, channel_number)
-        current_ranges = all_ranges[1]  # V_ranges, current_ranges, R_v, R_i
+        current_ranges = self.cs_get_capabilities()[0].current_ranges
         max_current = current_ranges[-1]  # this throws exception if ranges is empty list
         return max_current
 
+    def cs_get_current_range_table(self):
+        """
+        gets the precomputed current ranges of the instrument of the first channel
+
+        Returns:
+            numpy.ndarray: ascending current ranges in amps, empty if the model is not known
+        """
+        model_number = self.cs_get_capabilities()[0].model_number
+        return _CURRENT_RANGE_TABLES.get(model_number, numpy.empty(0))
+
+    def cs_get_capabilities(self):
+        """
+        gets the capabilities of each channel from the precomputed capability index
+
+        Returns:
+            list of ModelCapabilities: capabilities in the order of the channels
+        """
+        if self._capabilities is None:
+            self._capabilities = [_get_channel_capabilities(self.session, channel) for channel in self._ch_list]
+        return self._capabilities
+
+    def cs_subset(self, positions: typing.Sequence[int]):
+        """
+        creates an SSC for a subset of the channels of this SSC without querying the driver
+
+        Args:
+            positions (typing.Sequence[int]): positions of the channels in the channel list
+
+        Returns:
+            _NIDCPowerSSC: SSC of the selected channels, with the settings of this SSC
+        """
+        pins = self._pins.split(",")
+        subset = _NIDCPowerSSC(
+            self._session,
+            ",".join(self._ch_list[position].strip() for position in positions),
+            ",".join(pins[position].strip() for position in positions),
+        )
+        subset.power_line_frequency = self.power_line_frequency
+        subset.measure_multiple_only = self.measure_multiple_only
+        if self._capabilities is not None:
+            subset._capabilities = [self._capabilities[position] for position in positions]
+        return subset
+
+    def cs_configure_current_limit_range_and_clamp_limit(self, current_limit_range, current_limit=None):
+        """
+        configures the current limit range and lowers the current limit to the range if it does
+        not fit into the new range.
+
+        Args:
+            current_limit_range (float): current limit range in amps.
+            current_limit (float, optional): limit requested by the caller, the channel is set to
+                the lower of it and the range. Defaults to None, the configured limit.
+        """
+        if current_limit is None:
+            current_limit = self._ch_session.current_limit
+        self._ch_session.current_limit = min(current_limit, current_limit_range)
+        self._ch_session.current_limit_range = current_limit_range
+
+    def cs_get_current_limit_and_range(self):
+        """
+        gets the current limit and current limit range of the first channel
+
+        Returns:
+            tuple of float: current limit and current limit range in amps
+        """
+        return self._ch_session.current_limit, self._ch_session.current_limit_range
+
     def cs_configure_measurements(self, mode=MeasurementMode.AUTO):
         """
         configure the measurement mode to be auto by default, otherwise the value specified by the
@@ -1071,8 +1384,7 @@ class _NIDCPowerSSC:
         if self.measure_multiple_only:
             mode = MeasurementMode.MEASURE_MULTIPLE
         if mode == MeasurementMode.AUTO:
-            model = self.cs_get_smu_model()
-            if model == 4110 or model == 4130:
+            if not self.cs_get_capabilities()[0].measure_trigger_supported:
                 mode = MeasurementMode.MEASURE_MULTIPLE
             else:
                 mode = MeasurementMode.SOFTWARE_TRIGGER
@@ -1115,6 +1427,97 @@ class _NIDCPowerSSC:
             terminal_name = terminal
         return terminal_name
 
+    def cs_configure_export_event(self, event: nidcpower.Event, terminal):
+        """
+        configures the event to be exported on the specified output terminal. when the output
+        terminal is assigned and read back we will get fully qualified name.
+
+        Args:
+            event (nidcpower.Event): event to be exported
+            terminal (str): output terminal on which the event is exported.
+
+        Returns:
+            terminal_name (str) : fully qualified output terminal name
+        """
+        if event == nidcpower.Event.SOURCE_COMPLETE:
+            self._ch_session.source_complete_event_output_terminal = terminal
+            terminal_name = self._ch_session.source_complete_event_output_terminal
+        elif event == nidcpower.Event.MEASURE_COMPLETE:
+            self._ch_session.measure_complete_event_output_terminal = terminal
+            terminal_name = self._ch_session.measure_complete_event_output_terminal
+        elif event == nidcpower.Event.SEQUENCE_ITERATION_COMPLETE:
+            self._ch_session.sequence_iteration_complete_event_output_terminal = terminal
+            terminal_name = self._ch_session.sequence_iteration_complete_event_output_terminal
+        elif event == nidcpower.Event.SEQUENCE_ENGINE_DONE:
+            self._ch_session.sequence_engine_done_event_output_terminal = terminal
+            terminal_name = self._ch_session.sequence_engine_done_event_output_terminal
+        elif event == nidcpower.Event.PULSE_COMPLETE:
+            self._ch_session.pulse_complete_event_output_terminal = terminal
+            terminal_name = self._ch_session.pulse_complete_event_output_terminal
+        elif event == nidcpower.Event.READY_FOR_PULSE_TRIGGER:
+            self._ch_session.ready_for_pulse_trigger_event_output_terminal = terminal
+            terminal_name = self._ch_session.ready_for_pulse_trigger_event_output_terminal
+        else:
+            terminal_name = terminal
+        return terminal_name
+
+    def cs_configure_start_trigger(self, trigger_type=nidcpower.TriggerType.NONE, input_terminal=""):
+        """
+        configures the start trigger of the channels. With a digital edge trigger the channels wait
+        in the Running state for an edge on the input terminal before sourcing.
+
+        Args:
+            trigger_type (nidcpower.TriggerType, optional): none, software edge or digital edge.
+                Defaults to nidcpower.TriggerType.NONE.
+            input_terminal (str, optional): input terminal for the digital edge trigger. Defaults
+                to "".
+        """
+        self._ch_session.start_trigger_type = trigger_type
+        if trigger_type == nidcpower.TriggerType.DIGITAL_EDGE:
+            self._ch_session.digital_edge_start_trigger_input_terminal = input_terminal
+
+    def cs_configure_voltage_ramp(
+        self,
+        voltage_level=0.0,
+        current_limit=0.0,
+        ramp_time=0.0,
+        ramp_steps=10,
+        start_level=0.0,
+        current_limit_range=0.0,
+    ):
+        """
+        configures and commits a voltage sequence that ramps from the start level to the voltage
+        level in equal steps with symmetric current limits. The Sequence Engine Done event is
+        generated when the last step is sourced.
+
+        Args:
+            voltage_level (float, optional): final voltage level in volts. Defaults to 0.0.
+            current_limit (float, optional): current limit in amps. Defaults to 0.0.
+            ramp_time (float, optional): duration of the ramp in seconds, 0.0 sources the voltage
+                level directly. Defaults to 0.0.
+            ramp_steps (int, optional): number of steps of the ramp. Defaults to 10.
+            start_level (float, optional): voltage level in volts the ramp starts from. Defaults to
+                0.0.
+            current_limit_range (float, optional): current limit range in amps. Defaults to 0.0.
+        """
+        steps = max(int(ramp_steps), 1) if ramp_time > 0.0 else 1
+        values = [start_level + (voltage_level - start_level) * (step + 1) / steps for step in range(steps)]
+        source_delays = [ramp_time / steps] * steps
+        self._ch_session.abort()
+        self._ch_session.source_mode = nidcpower.SourceMode.SEQUENCE
+        self._ch_session.output_function = nidcpower.OutputFunction.DC_VOLTAGE
+        voltage_level_range = max(abs(voltage_level), abs(start_level))
+        if voltage_level_range > 0.0:  # a 0 V ramp keeps the configured range
+            self._ch_session.voltage_level_range = voltage_level_range
+        self._ch_session.current_limit = current_limit
+        c_value = current_limit_range
+        if c_value == 0.0:
+            c_value = abs(current_limit)
+        self._ch_session.current_limit_range = c_value
+        self._ch_session.compliance_limit_symmetry = nidcpower.ComplianceLimitSymmetry.SYMMETRIC
+        self._ch_session.set_sequence(values, source_delays)
+        self._ch_session.commit()
+
     def cs_send_software_edge_trigger(
         self, trigger_to_send=enums.SendSoftwareEdgeTriggerType.MEASURE
     ):
@@ -1331,27 +1734,22 @@ class _NIDCPowerSSC:
                 v_range = nan
                 i_range = nan
                 output_function = "un defined"
-            max_instr_name = channel.split("/")[0]
-            print(max_instr_name, max_instr_name)
-            model = self.session.instruments[max_instr_name].instrument_model
-            match = re.search("\d\d\d\d", model, re.RegexFlag.ASCII)[0]
-            if match in [4110, 4112, 4113, 4130, 4132]:
-                tr_response = "N/A"
-            elif match == 4154 and channel == "1":
-                tr_response = "N/A"
-            else:
+            info = _get_instrument_info(self.session, channel.strip().rpartition("/")[0])
+            capabilities = _get_channel_capabilities(self.session, channel)
+            if capabilities.transient_response_supported:
                 tr_response = str(ss.transient_response)
-            if match in [4110, 4130, 4140, 4141, 4142, 4143, 4144, 4145]:
-                output_connected = "N/A"
             else:
+                tr_response = "N/A"
+            if capabilities.output_connected_supported:
                 output_connected = str(ss.output_connected)
+            else:
+                output_connected = "N/A"
             sense = str(ss.sense)
             ap_time = ss.aperture_time
             output_en = ss.output_enabled
-            instr_name = self.session.instruments[max_instr_name].instrument_manufacturer
             ch_prop = ChannelProperties(
-                instr_name,
-                model,
+                info.manufacturer,
+                info.model,
                 channel,
                 pin,
                 output_function,
@@ -1369,6 +1767,74 @@ class _NIDCPowerSSC:
         return channel_properties
 
 
+class ChannelLocation(typing.NamedTuple):
+    """
+    location of the channel of one pin on one site, system pins are on site -1
+    """
+
+    ssc_index: int
+    session: nidcpower.Session
+    channel: str
+    position: int  # position of the channel in the channel list of the SSC
+
+
+class _SessionChannelMap:
+    """
+    Maps sessions to the merged channels of their SSCs, like ResourceMap maps resources to
+    channels, and keeps the index map to split the merged results back into the SSC order.
+    """
+
+    def __init__(self, sscs: typing.Sequence[_NIDCPowerSSC]):
+        groups = {}  # id of session -> positions of its SSCs
+        for position, ssc in enumerate(sscs):
+            groups.setdefault(id(ssc.session), []).append(position)
+        self.sscs = []  # one SSC per session
+        merged_order = []  # SSC positions in the order of the merged results
+        for positions in groups.values():
+            if len(positions) == 1:
+                self.sscs.append(sscs[positions[0]])
+            else:
+                merged = _NIDCPowerSSC(
+                    sscs[positions[0]].session,
+                    ",".join(sscs[position].cs_channels for position in positions),
+                    ",".join(sscs[position]._pins for position in positions),
+                )
+                merged.power_line_frequency = sscs[positions[0]].power_line_frequency
+                merged.measure_multiple_only = any(sscs[position].measure_multiple_only for position in positions)
+                if all(sscs[position]._capabilities is not None for position in positions):
+                    merged._capabilities = [
+                        capabilities for position in positions for capabilities in sscs[position]._capabilities
+                    ]
+                self.sscs.append(merged)
+            merged_order += positions
+        if len(self.sscs) == len(sscs):
+            self.index_map = None  # results are already in the SSC order
+        else:
+            counts = [len(ssc._ch_list) for ssc in sscs]
+            offsets = {}
+            offset = 0
+            for position in merged_order:
+                offsets[position] = offset
+                offset += counts[position]
+            self.index_map = numpy.concatenate(
+                [numpy.arange(offsets[position], offsets[position] + count) for position, count in enumerate(counts)]
+            )
+
+    def split(self, merged_results: typing.List[typing.Any]):
+        """
+        reorders the results of the merged SSCs into the order of the channels of the SSCs
+
+        Args:
+            merged_results (list): one result per channel in the order of the merged SSCs
+
+        Returns:
+            list: one result per channel in the order of the SSCs
+        """
+        if self.index_map is None:
+            return merged_results
+        return [merged_results[index] for index in self.index_map]
+
+
 class _NIDCPowerTSM:
     """
     Class to store the sessions for each context of pins.
@@ -1383,6 +1849,45 @@ class _NIDCPowerTSM:
             context pins
         """
         self._sscs = sessions_sites_channels
+        self._ch_sscs = None  # one SSC per channel, built on first use
+        self._session_map = None  # SSCs merged per session, built on first use
+        self._pin_site_index = None  # (pin, site) -> ChannelLocation, built on first use
+        self._index_pins = []
+        self._index_sites = []
+
+    @property
+    def pin_site_index(self):
+        """
+        gets the index of the channel of each pin on each site, the pin lists of the SSCs are
+        parsed only the first time.
+
+        Returns:
+            mapping: (pin, site) -> ChannelLocation, read only. System pins are on site -1.
+        """
+        if self._pin_site_index is None:
+            index = {}
+            for ssc_index, ssc in enumerate(self._sscs):
+                entries = zip(ssc._pins.split(","), ssc._ch_list)
+                for position, (entry, channel) in enumerate(entries):
+                    site_part, _, pin = entry.strip().rpartition("/")
+                    location = ChannelLocation(ssc_index, ssc.session, channel.strip(), position)
+                    if not site_part:
+                        index[(pin, -1)] = location
+                    for site in site_part[4:].split("+") if site_part else []:
+                        index[(pin, int(site))] = location  # shared channels are on many sites
+            self._set_pin_site_index(index)
+        return self._pin_site_index
+
+    def _set_pin_site_index(self, index):
+        """
+        stores the pin site index and the pins and sites found in it
+
+        Args:
+            index (dict): (pin, site) -> ChannelLocation
+        """
+        self._pin_site_index = types.MappingProxyType(index)
+        self._index_pins = list(dict.fromkeys(pin for pin, _ in index))
+        self._index_sites = sorted({site for _, site in index if site >= 0})
 
     @staticmethod
     def _parse_instrument_names(resource_string: str) -> typing.Set[str]:
@@ -1402,37 +1907,80 @@ class _NIDCPowerTSM:
             instrument_names += instrument_name.strip()
         return instrument_names
 
-    @staticmethod
-    def _expand_to_requested_array_size(generic_in, size: int):
+    def _channel_sscs(self):
+        """
+        private function to split the sessions into one SSC per channel. The list is built once
+        and reused for the channel level operations.
+
+        Returns:
+            list of _NIDCPowerSSC: one SSC per channel, in the order of the measurements
+        """
+        if self._ch_sscs is None:
+            self._ch_sscs = [
+                _NIDCPowerSSC(ssc.session, channel.strip(), pin.strip())
+                for ssc in self._sscs
+                for channel, pin in zip(ssc.cs_channels.split(","), ssc._pins.split(","))
+            ]
+        return self._ch_sscs
+
+    def _broadcast_to_channels(self, *generic_inputs):
         """
-        private function to compute the size and expand the given list to the size specified
+        private function to broadcast each input to one value per channel, in the order of the
+        channels of the SSCs like the measurements. Scalars and single element inputs are repeated
+        for all the channels without copying the data, inputs with one value per session are
+        repeated for the channels of each session.
 
         Args:
-            generic_in (any): any python datatype for expanding
-            size (int):  desired number of elements
+            generic_inputs (any): scalars or array like inputs with one value per pin and site
+                channel, or one value per session
+
+        Raises:
+            ValueError: when one of the inputs can not be broadcast to the channels
 
         Returns:
-            _type_: _description_
+            list of numpy.ndarray: one value per channel for each input
+        """
+        counts = [len(ssc._ch_list) for ssc in self._sscs]
+        size = sum(counts)
+        generic_arrays = []
+        for generic_in in generic_inputs:
+            generic_array = numpy.asarray(generic_in)
+            if generic_array.ndim > 1 or generic_array.size not in (1, size, len(counts)):
+                raise ValueError(
+                    "Input of shape %s can not be broadcast to %d channels or %d sessions"
+                    % (generic_array.shape, size, len(counts))
+                )
+            generic_array = generic_array.reshape(-1)
+            if generic_array.size == size:
+                generic_arrays.append(generic_array)
+            elif generic_array.size == 1:
+                generic_arrays.append(numpy.broadcast_to(generic_array, (size,)))
+            else:
+                generic_arrays.append(numpy.repeat(generic_array, counts))
+        return generic_arrays
+
+    def _split_to_sscs(self, *channel_arrays):
+        """
+        private function to split inputs with one value per channel into the values of each SSC.
+        An SSC whose channels share the same values is configured with one call, otherwise each
+        of its channels is configured on its own through a subset SSC with the same settings.
+
+        Args:
+            channel_arrays (numpy.ndarray): inputs from _broadcast_to_channels
+
+        Yields:
+            tuple: SSC or single channel SSC and its list of one value per input
         """
-        if hasattr(generic_in, "__iter__"):
-            generic_array = []
-            length = len(generic_in)
-            reminder = size % length
-            if (size == 0 or length == 0) and reminder != 0:
-                pass
-                # need to raise exception
+        start = 0
+        for ssc in self._sscs:
+            stop = start + len(ssc._ch_list)
+            slices = [channel_array[start:stop] for channel_array in channel_arrays]
+            if all(numpy.all(values == values[0]) for values in slices):
+                yield ssc, [values[0] for values in slices]
             else:
-                i = 0
-                for j in range(length):
-                    generic_array.append(generic_in[i])
-                    i += 1
-                    if i == length:
-                        i = 0
-        else:
-            generic_array = []
-            for index in range(size):
-                generic_array.append(generic_in)
-        return generic_array
+                for offset in range(stop - start):
+                    yield ssc.cs_subset([offset]), [values[offset] for values in slices]
+            start = stop
 
     @property
     def sessions_sites_channels(self):
@@ -1461,15 +2009,13 @@ class _NIDCPowerTSM:
             transient_responses (list of enum): Controls how to control the response based on load.
                 Defaults to enums.TransientResponse.NORMAL.
         """
-        for (
-            ssc,
+        for ssc, (
             aperture_time,
             source_delay,
             sense,
             aperture_time_unit,
             transient_response,
-        ) in zip(
-            self._sscs,
+        ) in self._split_to_sscs(
             aperture_times,
             source_delays,
             senses,
@@ -1498,16 +2044,14 @@ class _NIDCPowerTSM:
             voltage_limit_lows (list of float): voltage lower limits in volts.
             voltage_limit_ranges (list of float): voltage limit range in volts.
         """
-        i = 0
-        for ssc in self._sscs:
-            ssc.cs_force_current_asymmetric_limits(
-                current_levels[i],
-                current_level_ranges[i],
-                voltage_limit_highs[i],
-                voltage_limit_lows[i],
-                voltage_limit_ranges[i],
-            )
-            i += 1
+        for ssc, values in self._split_to_sscs(
+            current_levels,
+            current_level_ranges,
+            voltage_limit_highs,
+            voltage_limit_lows,
+            voltage_limit_ranges,
+        ):
+            ssc.cs_force_current_asymmetric_limits(*values)
         self.initiate()
 
     def _force_current_symmetric_limits_array(
@@ -1522,15 +2066,13 @@ class _NIDCPowerTSM:
             voltage_limits (list of float): voltage limits in volts.
             voltage_limit_ranges (list of float): voltage limit range in volts.
         """
-        i = 0
-        for ssc in self._sscs:
-            ssc.cs_force_current_symmetric_limits(
-                current_levels[i],
-                current_level_ranges[i],
-                voltage_limits[i],
-                voltage_limit_ranges[i],
-            )
-            i += 1
+        for ssc, values in self._split_to_sscs(
+            current_levels,
+            current_level_ranges,
+            voltage_limits,
+            voltage_limit_ranges,
+        ):
+            ssc.cs_force_current_symmetric_limits(*values)
         self.initiate()
 
     def _force_voltage_asymmetric_limits_array(
@@ -1551,16 +2093,14 @@ class _NIDCPowerTSM:
             current_limit_lows (list of float): current lower limits in amps.
             current_limit_ranges (list of float): current limit range in amps.
         """
-        i = 0
-        for ssc in self._sscs:
-            ssc.cs_force_voltage_asymmetric_limits(
-                voltage_levels[i],
-                voltage_level_ranges[i],
-                current_limit_highs[i],
-                current_limit_lows[i],
-                current_limit_ranges[i],
-            )
-            i += 1
+        for ssc, values in self._split_to_sscs(
+            voltage_levels,
+            voltage_level_ranges,
+            current_limit_highs,
+            current_limit_lows,
+            current_limit_ranges,
+        ):
+            ssc.cs_force_voltage_asymmetric_limits(*values)
         self.initiate()
 
     def _force_voltage_symmetric_limits_array(
@@ -1575,36 +2115,15 @@ class _NIDCPowerTSM:
             current_limits (list of float): current limits in amps.
             current_limit_ranges (list of float): current limit range in amps.
         """
-        i = 0
-        for ssc in self._sscs:
-            ssc.cs_force_voltage_symmetric_limits(
-                voltage_levels[i],
-                voltage_level_ranges[i],
-                current_limits[i],
-                current_limit_ranges[i],
-            )
-            i += 1
+        for ssc, values in self._split_to_sscs(
+            voltage_levels,
+            voltage_level_ranges,
+            current_limits,
+            current_limit_ranges,
+        ):
+            ssc.cs_force_voltage_symmetric_limits(*values)
         self.initiate()
 
-    def _expand_array_to_sessions(self, generic_in):
-        """
-        private function for expanding the given array to the requested array size
-
-        Args:
-            generic_in (any): if the data is a list already it will be passed as such
-
-        Returns:
-            list of any type: creates the list of given generic input argument
-        """
-        if hasattr(generic_in, "__iter__"):
-            generic_array = generic_in
-            # Need to revisit this code for all cases as per reference LabVIEW code
-        else:
-            generic_array = []
-            for _ in self._sscs:
-                generic_array.append(generic_in)
-        return generic_array
-
     def _force_current_asymmetric_limits(
         self,
         current_level,
@@ -1623,14 +2142,19 @@ class _NIDCPowerTSM:
             voltage_limit_low (float list): in volts
             voltage_limit_range (float list): in volts
         """
-        size = 0
-        for _ in self._sscs:
-            size += 1
-        current_levels = self._expand_to_requested_array_size(current_level, size)
-        current_level_ranges = self._expand_to_requested_array_size(current_level_range, size)
-        voltage_limit_highs = self._expand_to_requested_array_size(voltage_limit_high, size)
-        voltage_limit_lows = self._expand_to_requested_array_size(voltage_limit_low, size)
-        voltage_limit_ranges = self._expand_to_requested_array_size(voltage_limit_range, size)
+        (
+            current_levels,
+            current_level_ranges,
+            voltage_limit_highs,
+            voltage_limit_lows,
+            voltage_limit_ranges,
+        ) = self._broadcast_to_channels(
+            current_level,
+            current_level_range,
+            voltage_limit_high,
+            voltage_limit_low,
+            voltage_limit_range,
+        )
         self._force_current_asymmetric_limits_array(
             current_levels,
             current_level_ranges,
@@ -1651,13 +2175,17 @@ class _NIDCPowerTSM:
             voltage_limit (float list): in volts
             voltage_limit_range (float list): in volts
         """
-        size = 0
-        for _ in self._sscs:
-            size += 1
-        current_levels = self._expand_to_requested_array_size(current_level, size)
-        current_level_ranges = self._expand_to_requested_array_size(current_level_range, size)
-        voltage_limits = self._expand_to_requested_array_size(voltage_limit, size)
-        voltage_limit_ranges = self._expand_to_requested_array_size(voltage_limit_range, size)
+        (
+            current_levels,
+            current_level_ranges,
+            voltage_limits,
+            voltage_limit_ranges,
+        ) = self._broadcast_to_channels(
+            current_level,
+            current_level_range,
+            voltage_limit,
+            voltage_limit_range,
+        )
         self._force_current_symmetric_limits_array(
             current_levels, current_level_ranges, voltage_limits, voltage_limit_ranges
         )
@@ -1680,15 +2208,20 @@ class _NIDCPowerTSM:
             current_limit_low (float list): in amps
             current_limit_range (float list): in amps
         """
-        size = 0
-        for _ in self._sscs:
-            size += 1
-        voltage_levels = self._expand_to_requested_array_size(voltage_level, size)
-        voltage_level_ranges = self._expand_to_requested_array_size(voltage_level_range, size)
-        current_limit_highs = self._expand_to_requested_array_size(current_limit_high, size)
-        current_limit_lows = self._expand_to_requested_array_size(current_limit_low, size)
-        current_limit_ranges = self._expand_to_requested_array_size(current_limit_range, size)
-        self._force_current_asymmetric_limits_array(
+        (
+            voltage_levels,
+            voltage_level_ranges,
+            current_limit_highs,
+            current_limit_lows,
+            current_limit_ranges,
+        ) = self._broadcast_to_channels(
+            voltage_level,
+            voltage_level_range,
+            current_limit_high,
+            current_limit_low,
+            current_limit_range,
+        )
+        self._force_voltage_asymmetric_limits_array(
             voltage_levels,
             voltage_level_ranges,
             current_limit_highs,
@@ -1708,13 +2241,17 @@ class _NIDCPowerTSM:
             current_limit (float list): in amps
             current_limit_range (float list): in amps
         """
-        size = 0
-        for _ in self._sscs:
-            size += 1
-        voltage_levels = self._expand_to_requested_array_size(voltage_level, size)
-        voltage_level_ranges = self._expand_to_requested_array_size(voltage_level_range, size)
-        current_limits = self._expand_to_requested_array_size(current_limit, size)
-        current_limit_ranges = self._expand_to_requested_array_size(current_limit_range, size)
+        (
+            voltage_levels,
+            voltage_level_ranges,
+            current_limits,
+            current_limit_ranges,
+        ) = self._broadcast_to_channels(
+            voltage_level,
+            voltage_level_range,
+            current_limit,
+            current_limit_range,
+        )
         self._force_voltage_symmetric_limits_array(
             voltage_levels, voltage_level_ranges, current_limits, current_limit_ranges
         )
@@ -1957,11 +2494,9 @@ class _NIDCPowerTSM:
         Args:
             output_resistance (List of float): resistance values in ohms.
         """
-        output_resistances = self._expand_array_to_sessions(output_resistance)
-        i = 0
-        for ssc in self._sscs:
-            ssc.cs_configure_output_resistance(output_resistances[i])
-            i += 1
+        (output_resistances,) = self._broadcast_to_channels(output_resistance)
+        for ssc, (output_resistance,) in self._split_to_sscs(output_resistances):
+            ssc.cs_configure_output_resistance(output_resistance)
 
     def configure_source_delay(self, source_delay=0.01667):
         """
@@ -2033,12 +2568,52 @@ class _NIDCPowerTSM:
 
         Note:
         When setting the timeout interval, ensure you take into account any triggers so that the
-        timeout interval is long enough for your application.
+        timeout interval is long enough for your application. The sessions are waited on
+        concurrently, so the timeout is the overall deadline for all the pins.
         """
-        for ssc in self._sscs:
-            ssc.cs_wait_for_event(event, timeout)
+        self.wait_for_event_with_deadline(event, timeout)
         return
 
+    def wait_for_event_with_deadline(self, event=nidcpower.Event.SOURCE_COMPLETE, timeout=10.0, raise_on_error=True):
+        """
+        Waits on all sessions concurrently until each of them has generated the specified event or
+        the overall deadline expires. Returns as soon as all sessions have generated the event.
+
+        Args:
+            event (enums.Event): Specifies which event to wait for. Defaults to
+                nidcpower.Event.SOURCE_COMPLETE.
+            timeout (float): overall deadline in seconds for all sessions. Defaults to 10.0.
+            raise_on_error (bool, optional): if True the first driver error, like a timeout, is
+                raised after all the waits are done, otherwise it is only reported in the result.
+                Other errors are always raised once all the waits are done. Defaults to True.
+
+        Returns:
+            EventWaitResult: per session channels, completion times in seconds from the start of
+            the wait (nan if the event was not generated) and errors
+        """
+        sscs = list(self._sscs)
+        start = time.perf_counter()
+        deadline = start + timeout
+
+        def wait(ssc):
+            ssc.cs_wait_for_event(event, max(deadline - time.perf_counter(), 0.0))
+            return time.perf_counter() - start
+
+        completion_times = [nan] * len(sscs)
+        errors = [None] * len(sscs)
+        if sscs:
+            with concurrent.futures.ThreadPoolExecutor(len(sscs)) as executor:
+                futures = [executor.submit(wait, ssc) for ssc in sscs]
+            for index, future in enumerate(futures):  # all the waits are done
+                try:
+                    completion_times[index] = future.result()
+                except Exception as error:
+                    errors[index] = error
+        for error in errors:
+            if error is not None and (raise_on_error or not isinstance(error, nidcpower.errors.Error)):
+                raise error
+        return EventWaitResult([ssc.cs_channels for ssc in sscs], completion_times, errors)
+
     def configure_and_start_waveform_acquisition(self, sample_rate=0.0, buffer_length=0.0):
         """
         configures and records previous settings and start the waveform acquisition
@@ -2080,6 +2655,85 @@ class _NIDCPowerTSM:
             break
         return terminal_name
 
+    def configure_export_event(self, event: nidcpower.Event, output_terminal):
+        """
+        configures the event of each SSC to be exported on the specified output terminal.
+
+        Args:
+            event (nidcpower.Event): event to be exported
+            output_terminal (str or list of str): output terminal on which the event is exported,
+                one for all the SSCs or one per SSC. Use "" to stop exporting the event.
+
+        Returns:
+            list of str: fully qualified output terminal name of each SSC
+        """
+        sscs = list(self._sscs)
+        if isinstance(output_terminal, str):
+            output_terminals = [output_terminal] * len(sscs)
+        else:
+            output_terminals = list(output_terminal)
+        if len(output_terminals) != len(sscs):
+            raise ValueError("%d output terminals for %d sessions" % (len(output_terminals), len(sscs)))
+        return [ssc.cs_configure_export_event(event, terminal) for ssc, terminal in zip(sscs, output_terminals)]
+
+    def configure_start_trigger(self, trigger_type=nidcpower.TriggerType.NONE, input_terminal=""):
+        """
+        configures the start trigger for all the sessions.
+
+        Args:
+            trigger_type (nidcpower.TriggerType, optional): none, software edge or digital edge.
+                Defaults to nidcpower.TriggerType.NONE.
+            input_terminal (str or list of str, optional): input terminal for the digital edge
+                trigger, one for all or one per channel. Defaults to "".
+        """
+        for ssc, (terminal,) in self._split_to_sscs(*self._broadcast_to_channels(input_terminal)):
+            ssc.cs_configure_start_trigger(trigger_type, str(terminal))
+
+    def get_channel_sites(self):
+        """
+        gets the sites of the channels of each SSC
+
+        Returns:
+            list of list of set: for each SSC, the sites of each of its channels. System pins are
+            on site -1
+        """
+        sites = [[set() for _ in ssc._ch_list] for ssc in self._sscs]
+        for (_, site), location in self.pin_site_index.items():
+            sites[location.ssc_index][location.position].add(site)
+        return sites
+
+    def configure_voltage_ramp(
+        self,
+        voltage_level=0.0,
+        current_limit=0.0,
+        ramp_time=0.0,
+        ramp_steps=10,
+        start_level=0.0,
+        current_limit_range=0.0,
+    ):
+        """
+        configures and commits a voltage ramp sequence from the start level to the voltage level on
+        all the sessions. The ramp starts when the sessions are initiated and the start trigger,
+        if any, is received.
+
+        Args:
+            voltage_level (float, optional): final voltage level in volts. Defaults to 0.0.
+            current_limit (float, optional): current limit in amps. Defaults to 0.0.
+            ramp_time (float, optional): duration of the ramp in seconds. Defaults to 0.0.
+            ramp_steps (int, optional): number of steps of the ramp. Defaults to 10.
+            start_level (float, optional): voltage level the ramp starts from. Defaults to 0.0.
+            current_limit_range (float, optional): current limit range in amps. Defaults to 0.0.
+        """
+        for ssc in self._sscs:
+            ssc.cs_configure_voltage_ramp(
+                voltage_level,
+                current_limit,
+                ramp_time,
+                ramp_steps,
+                start_level,
+                current_limit_range,
+            )
+
     def send_software_edge_trigger(
         self, trigger_to_send=nidcpower.SendSoftwareEdgeTriggerType.MEASURE
     ):
@@ -2128,7 +2782,13 @@ class _NIDCPowerTSM:
         self.initiate()
         return voltage_waveforms, current_waveforms
 
-    def fetch_waveform(self, waveform_t0, waveform_length_s=0.0):
+    def fetch_waveform(
+        self,
+        waveform_t0,
+        waveform_length_s=0.0,
+        envelope_points=0,
+        store: typing.Optional[waveform_store.WaveformStore] = None,
+    ):
         """
         Returns a voltage and current waveform tuples (Measurement) that were
         previously taken and are stored in the NI-DCPower buffer. This method
@@ -2139,6 +2799,14 @@ class _NIDCPowerTSM:
         Args:
             waveform_t0 (time stamp): waveform time stamp
             waveform_length_s (float, optional): duration of waveform to measure. Defaults to 0.0.
+            envelope_points (int, optional): when not 0 the samples are fetched in chunks and
+                each channel is reduced to a min/max/mean envelope of at most this many points,
+                stored under the "envelope" key with one row per channel and its means one
+                channel after the other as "samples". Defaults to 0, full waveform.
+            store (waveform_store.WaveformStore, optional): when given the samples of each
+                channel are appended to the store with their pin and site, "records" is the index
+                in the store of each channel and "samples" the memory-mapped arrays read back from
+                it, one per channel. Defaults to None.
 
         Returns:
             voltage and current waveforms: tuple of voltage and current waveforms
@@ -2152,30 +2820,259 @@ class _NIDCPowerTSM:
                 fetch_samples = fetch_backlog
             else:
                 fetch_samples = int(waveform_length_s / record_dt)
-            samples = ssc._ch_session.fetch_multiple(fetch_samples, timeout=waveform_length_s + 1)
-            voltages = []
-            currents = []
-            in_compliance = []
-            for s in samples:
-                voltages.append(s[0])
-                currents.append(s[1])
-                in_compliance.append(s[2])
-            voltage_waveform = {
-                "channel": ssc.cs_channels + "(V)",
-                "samples": voltages,
-                "x_increment": record_dt,
-                "absolute_initial_x": waveform_t0,
-            }
-            current_waveform = {
-                "channel": ssc.cs_channels + "(A)",
-                "samples": currents,
-                "x_increment": record_dt,
-                "absolute_initial_x": waveform_t0,
-            }
+            if envelope_points:
+                voltage_waveform, current_waveform = self._fetch_envelopes(
+                    ssc, fetch_samples, envelope_points, record_dt, waveform_length_s + 1
+                )
+            else:
+                samples = ssc._ch_session.fetch_multiple(fetch_samples, timeout=waveform_length_s + 1)
+                voltages = []
+                currents = []
+                in_compliance = []
+                for s in samples:
+                    voltages.append(s[0])
+                    currents.append(s[1])
+                    in_compliance.append(s[2])
+                voltage_waveform = {"samples": voltages, "x_increment": record_dt}
+                current_waveform = {"samples": currents, "x_increment": record_dt}
+            voltage_waveform["channel"] = ssc.cs_channels + "(V)"
+            voltage_waveform["absolute_initial_x"] = waveform_t0
+            current_waveform["channel"] = ssc.cs_channels + "(A)"
+            current_waveform["absolute_initial_x"] = waveform_t0
             voltage_waveforms.append(voltage_waveform)
             current_waveforms.append(current_waveform)
+        if store is not None:
+            self._store_waveforms(store, voltage_waveforms, current_waveforms)
         return voltage_waveforms, current_waveforms
 
+    def _store_waveforms(self, store: waveform_store.WaveformStore, voltage_waveforms, current_waveforms):
+        """
+        private function to append the samples of each channel of the waveforms of the SSCs to the
+        store, one waveform per pin and site, and to replace them by the memory-mapped arrays read
+        back from it. All the waveforms are appended before the first read, so that the segment is
+        mapped once.
+
+        Args:
+            store (waveform_store.WaveformStore): store to append to
+            voltage_waveforms (list of dict): voltage waveform of each SSC
+            current_waveforms (list of dict): current waveform of each SSC
+        """
+        channel_waveforms = []
+        pins = []
+        sites = []
+        owners = []
+        for ssc, waveforms in zip(self._sscs, zip(voltage_waveforms, current_waveforms)):
+            channel_pins = [re.fullmatch(r"(?:Site(\d+)[/\\])?(.+)", pin.strip()) for pin in ssc._pins.split(",")]
+            for waveform, unit in zip(waveforms, ("(V)", "(A)")):
+                channel_samples = numpy.split(numpy.asarray(waveform["samples"]), len(ssc._ch_list))
+                for channel, match, samples in zip(ssc._ch_list, channel_pins, channel_samples):
+                    channel_waveforms.append(dict(waveform, samples=samples, channel=channel + unit))
+                    pins.append(match[2])
+                    sites.append(-1 if match[1] is None else int(match[1]))
+                    owners.append(waveform)
+                waveform["records"] = []
+        for waveform, record in zip(owners, store.append_waveform_dicts(channel_waveforms, pins, sites)):
+            waveform["records"].append(record)
+        for waveforms in zip(voltage_waveforms, current_waveforms):
+            for waveform in waveforms:
+                waveform["samples"] = [store.read(record) for record in waveform["records"]]
+
+    @staticmethod
+    def _fetch_envelopes(ssc: _NIDCPowerSSC, fetch_samples, envelope_points, record_dt, timeout):
+        """
+        fetches the samples in chunks and reduces each chunk into the voltage and current
+        envelopes of each channel, so that the full waveform is never held in memory
+
+        Args:
+            ssc (_NIDCPowerSSC): channels to fetch
+            fetch_samples (int): number of samples to fetch
+            envelope_points (int): maximum number of points of the envelopes
+            record_dt (float): time between two samples
+            timeout (float): fetch timeout of each chunk in seconds
+
+        Returns:
+            tuple: voltage and current waveform dictionaries with the envelopes
+        """
+        samples_per_bin = analysis.samples_per_envelope_bin(fetch_samples, envelope_points)
+        chunk_bins = max(1, _ENVELOPE_FETCH_CHUNK // samples_per_bin)
+        chunk_size = chunk_bins * samples_per_bin
+        voltage_decimator = analysis.EnvelopeDecimator(samples_per_bin, record_dt)
+        current_decimator = analysis.EnvelopeDecimator(samples_per_bin, record_dt)
+        channel_count = len(ssc._ch_list)
+        remaining = fetch_samples
+        while remaining > 0:
+            count = min(chunk_size, remaining)
+            samples = ssc._ch_session.fetch_multiple(count, timeout=timeout)
+            # the samples of each channel follow each other, one row per channel
+            voltages = numpy.array([sample.voltage for sample in samples], numpy.float64)
+            currents = numpy.array([sample.current for sample in samples], numpy.float64)
+            voltage_decimator.update(voltages.reshape(channel_count, -1))
+            current_decimator.update(currents.reshape(channel_count, -1))
+            remaining -= count
+        waveforms = []
+        for decimator in (voltage_decimator, current_decimator):
+            envelope = decimator.envelope()
+            waveforms.append(
+                {
+                    "samples": envelope.mean.reshape(-1),
+                    "x_increment": envelope.x_increment,
+                    "envelope": envelope,
+                }
+            )
+        return tuple(waveforms)
+
+    def initiate_and_detect_settling(self, criteria=SettleCriteria(), sample_rate=10e3, timeout=1.0, delay_margin=1.2):
+        """
+        Initiates the configured channels with no source delay and samples their output on a short
+        aperture until each channel meets the settle criteria or its timeout expires. The previous
+        measurement settings and source delays are restored afterwards. The channels need to be
+        configured and committed, but not initiated, before calling this method. New samples are
+        fetched into a preallocated buffer and only the windows ending in them are tested, the
+        channels are polled every half window when no sample is available.
+
+        Args:
+            criteria (SettleCriteria, optional): window, slope and standard deviation limits.
+                Defaults to SettleCriteria().
+            sample_rate (float, optional): samples per second while detecting. Defaults to 10e3.
+            timeout (float or list of float, optional): timeout in seconds, one for all, one per
+                channel or one per session. Defaults to 1.0.
+            delay_margin (float, optional): factor applied on the settle time for the
+                recommended source delay. Defaults to 1.2.
+
+        Returns:
+            list of SettleResult: settled flag, reading, settle time and recommended source delay
+            for each channel
+        """
+        sscs = list(self._sscs)
+        (timeouts,) = self._broadcast_to_channels(timeout)
+        ssc_timeouts = []
+        start = 0
+        for ssc in sscs:
+            ssc_timeouts.append(timeouts[start : start + len(ssc._ch_list)])
+            start += len(ssc._ch_list)
+        previous_settings = []
+        for ssc, ch_timeouts in zip(sscs, ssc_timeouts):
+            source_delay = ssc.cs_session.source_delay
+            ssc.cs_configure_source_delay(0.0)
+            settings = ssc.cs_configure_and_commit_waveform_acquisition(sample_rate, float(ch_timeouts.max()))
+            previous_settings.append((settings, source_delay))
+        window = max(int(criteria.window), 2)
+        channels = []
+        for ssc, ch_timeouts in zip(sscs, ssc_timeouts):
+            record_dt = ssc.cs_session.measure_record_delta_time.total_seconds()
+            for channel, ch_timeout in zip(ssc.cs_channels.split(","), ch_timeouts):
+                samples = numpy.empty(int(math.ceil(ch_timeout / record_dt)) + window)
+                channels.append((ssc.session.channels[channel], channel, ch_timeout, record_dt, samples))
+        poll_interval = max(min(record_dt for *_, record_dt, _ in channels) * window / 2, 1e-3)
+        start = time.perf_counter()  # the channels are forced by the initiate
+        self.initiate()
+        self.send_software_edge_trigger(nidcpower.SendSoftwareEdgeTriggerType.MEASURE)
+        trigger_delay = time.perf_counter() - start  # upper bound of the first sample time
+        counts = [0] * len(channels)
+        scanned = [0] * len(channels)  # first window not tested yet
+        results = [None] * len(channels)
+        try:
+            while None in results:
+                elapsed = time.perf_counter() - start
+                fetched = False
+                for index, (ch_session, channel, ch_timeout, record_dt, samples) in enumerate(channels):
+                    if results[index] is not None:
+                        continue
+                    count = counts[index]
+                    backlog = min(ch_session.fetch_backlog, samples.size - count)
+                    if backlog:
+                        samples[count : count + backlog] = [
+                            sample[1] if criteria.measure_current else sample[0]
+                            for sample in ch_session.fetch_multiple(backlog, timeout=1.0)
+                        ]
+                        count += backlog
+                        counts[index] = count
+                        fetched = True
+                    first = _find_settled_window(samples[:count], record_dt, criteria, scanned[index])
+                    scanned[index] = max(scanned[index], count - window + 1)
+                    if first >= 0:
+                        settled = samples[first : first + window]
+                        settle_time = trigger_delay + (first + window) * record_dt
+                        results[index] = SettleResult(
+                            channel, True, settled.mean(), settle_time, settle_time * delay_margin
+                        )
+                    elif elapsed > ch_timeout or count == samples.size:
+                        reading = samples[max(count - window, 0) : count].mean() if count else nan
+                        results[index] = SettleResult(channel, False, reading, nan, nan)
+                if not fetched and None in results:
+                    time.sleep(poll_interval)
+        finally:
+            self.abort()
+            for ssc, (settings, source_delay) in zip(sscs, previous_settings):
+                ssc.cs_set_measurement_settings(settings)
+                ssc.cs_configure_source_delay(source_delay)
+            self.initiate()
+        return results
+
+    def force_voltage_and_detect_settling(
+        self,
+        voltage_level,
+        current_limit,
+        voltage_level_range=0.0,
+        current_limit_range=0.0,
+        criteria=SettleCriteria(),
+        sample_rate=10e3,
+        timeout=1.0,
+    ):
+        """
+        Forces voltage with symmetric current limits and waits until the channels are settled
+        instead of waiting for a fixed source delay. Refer to initiate_and_detect_settling.
+
+        Args:
+            voltage_level (float or list of float): voltage level in volts.
+            current_limit (float or list of float): current limit in amps.
+            voltage_level_range (float, optional): voltage level range in volts. Defaults to 0.0.
+            current_limit_range (float, optional): current limit range in amps. Defaults to 0.0.
+            criteria (SettleCriteria, optional): settle criteria. Defaults to SettleCriteria().
+            sample_rate (float, optional): samples per second while detecting. Defaults to 10e3.
+            timeout (float or list of float, optional): timeout in seconds. Defaults to 1.0.
+
+        Returns:
+            list of SettleResult: settle result for each channel
+        """
+        for ssc, values in self._split_to_sscs(
+            *self._broadcast_to_channels(voltage_level, voltage_level_range, current_limit, current_limit_range)
+        ):
+            ssc.cs_force_voltage_symmetric_limits(*values)
+        return self.initiate_and_detect_settling(criteria, sample_rate, timeout)
+
+    def force_current_and_detect_settling(
+        self,
+        current_level,
+        voltage_limit,
+        current_level_range=0.0,
+        voltage_limit_range=0.0,
+        criteria=SettleCriteria(),
+        sample_rate=10e3,
+        timeout=1.0,
+    ):
+        """
+        Forces current with symmetric voltage limits and waits until the channels are settled
+        instead of waiting for a fixed source delay. Refer to initiate_and_detect_settling.
+
+        Args:
+            current_level (float or list of float): current level in amps.
+            voltage_limit (float or list of float): voltage limit in volts.
+            current_level_range (float, optional): current level range in amps. Defaults to 0.0.
+            voltage_limit_range (float, optional): voltage limit range in volts. Defaults to 0.0.
+            criteria (SettleCriteria, optional): settle criteria. Defaults to SettleCriteria().
+            sample_rate (float, optional): samples per second while detecting. Defaults to 10e3.
+            timeout (float or list of float, optional): timeout in seconds. Defaults to 1.0.
+
+        Returns:
+            list of SettleResult: settle result for each channel
+        """
+        for ssc, values in self._split_to_sscs(
+            *self._broadcast_to_channels(current_level, current_level_range, voltage_limit, voltage_limit_range)
+        ):
+            ssc.cs_force_current_symmetric_limits(*values)
+        return self.initiate_and_detect_settling(criteria, sample_rate, timeout)
+
     def get_measurement_settings(self):
         """
         reads the measurement settings like aperture time, measure trigger and record length
@@ -2203,6 +3100,37 @@ class _NIDCPowerTSM:
             all_ch_prop.append(prop)
         return all_ch_prop
 
+    def get_properties_snapshot(self):
+        """
+        reads the properties of all channels concurrently, one worker per instrument session, and
+        returns them as one table. Static instrument data like model and manufacturer is cached so
+        only the channel properties are read from the driver on each call.
+
+        Returns:
+            ChannelPropertiesTable: one list per property, channels in the order of the sessions
+        """
+        sscs = list(self._sscs)
+        session_groups = {}
+        for index, ssc in enumerate(sscs):
+            session_groups.setdefault(id(ssc.session), []).append(index)
+
+        def read_group(indices):
+            return [sscs[index].cs_get_properties() for index in indices]
+
+        per_ssc_properties = [[]] * len(sscs)
+        if len(session_groups) > 1:
+            with concurrent.futures.ThreadPoolExecutor(len(session_groups)) as executor:
+                futures = {executor.submit(read_group, indices): indices for indices in session_groups.values()}
+                for future in concurrent.futures.as_completed(futures):
+                    for index, properties in zip(futures[future], future.result()):
+                        per_ssc_properties[index] = properties
+        else:
+            per_ssc_properties = read_group(range(len(sscs)))
+        rows = [row for properties in per_ssc_properties for row in properties]
+        if not rows:
+            return ChannelPropertiesTable(*[[] for _ in ChannelPropertiesTable._fields])
+        return ChannelPropertiesTable(*[list(column) for column in zip(*rows)])
+
     def set_measurement_settings(self, meas_settings):
         """
         sets several measurement related settings from the list of dictionary input
@@ -2251,11 +3179,19 @@ class _NIDCPowerTSM:
             transient_response (enum, optional): Controls how to control the response based on load.
                 Defaults to enums.TransientResponse.NORMAL.
         """
-        transient_responses = self._expand_array_to_sessions(transient_response)
-        aperture_time_units = self._expand_array_to_sessions(aperture_time_unit)
-        aperture_times = self._expand_array_to_sessions(aperture_time)
-        source_delays = self._expand_array_to_sessions(source_delay)
-        senses = self._expand_array_to_sessions(sense)
+        (
+            transient_responses,
+            aperture_time_units,
+            aperture_times,
+            source_delays,
+            senses,
+        ) = self._broadcast_to_channels(
+            transient_response,
+            aperture_time_unit,
+            aperture_time,
+            source_delay,
+            sense,
+        )
         self._configure_settings_array(
             aperture_times, source_delays, senses, aperture_time_units, transient_responses
         )
@@ -2288,8 +3224,8 @@ class _NIDCPowerTSM:
         Args:
             current_levels_array (list of floats): updates the current level property.
         """
-        current_levels = self._expand_array_to_sessions(current_levels_array)
-        for ssc, current_level in zip(self._sscs, current_levels):
+        (current_levels,) = self._broadcast_to_channels(current_levels_array)
+        for ssc, (current_level,) in self._split_to_sscs(current_levels):
             ssc.cs_configure_current_level(current_level)
 
     def configure_voltage_limit_range(self, voltage_limit_range=0.0):
@@ -2319,11 +3255,9 @@ class _NIDCPowerTSM:
         Args:
             voltage_limits_array (List of float): one voltage limit for each channel
         """
-        voltage_limits = self._expand_array_to_sessions(voltage_limits_array)
-        i = 0
-        for ssc in self._sscs:
-            ssc.cs_configure_voltage_limit(voltage_limits[i])
-            i += 1
+        (voltage_limits,) = self._broadcast_to_channels(voltage_limits_array)
+        for ssc, (voltage_limit,) in self._split_to_sscs(voltage_limits):
+            ssc.cs_configure_voltage_limit(voltage_limit)
 
     def configure_voltage_level_range(self, voltage_level_range=0.0):
         """
@@ -2352,11 +3286,9 @@ class _NIDCPowerTSM:
         Args:
             voltage_levels_array (float): for each channel
         """
-        voltage_levels = self._expand_array_to_sessions(voltage_levels_array)
-        i = 0
-        for ssc in self._sscs:
-            ssc.cs_configure_voltage_level(voltage_levels[i])
-            i += 1
+        (voltage_levels,) = self._broadcast_to_channels(voltage_levels_array)
+        for ssc, (voltage_level,) in self._split_to_sscs(voltage_levels):
+            ssc.cs_configure_voltage_level(voltage_level)
 
     def configure_current_limit_range(self, current_limit_range=0.0):
         """
@@ -2385,11 +3317,9 @@ class _NIDCPowerTSM:
         Args:
             current_limits_array (float): one for each channel in the session
         """
-        current_limits = self._expand_array_to_sessions(current_limits_array)
-        i = 0
-        for ssc in self._sscs:
-            ssc.cs_configure_current_limit(current_limits[i])
-            i += 1
+        (current_limits,) = self._broadcast_to_channels(current_limits_array)
+        for ssc, (current_limit,) in self._split_to_sscs(current_limits):
+            ssc.cs_configure_current_limit(current_limit)
 
     def force_current_asymmetric_limits(
         self,
@@ -2409,11 +3339,19 @@ class _NIDCPowerTSM:
             voltage_limit_low (float): maximum allowed negative side voltage.
             voltage_limit_range (float): range selection for voltage limit.
         """
-        current_levels = self._expand_array_to_sessions(current_level)
-        current_level_ranges = self._expand_array_to_sessions(current_level_range)
-        voltage_limit_highs = self._expand_array_to_sessions(voltage_limit_high)
-        voltage_limit_lows = self._expand_array_to_sessions(voltage_limit_low)
-        voltage_limit_ranges = self._expand_array_to_sessions(voltage_limit_range)
+        (
+            current_levels,
+            current_level_ranges,
+            voltage_limit_highs,
+            voltage_limit_lows,
+            voltage_limit_ranges,
+        ) = self._broadcast_to_channels(
+            current_level,
+            current_level_range,
+            voltage_limit_high,
+            voltage_limit_low,
+            voltage_limit_range,
+        )
         self._force_current_asymmetric_limits_array(
             current_levels,
             current_level_ranges,
@@ -2434,10 +3372,17 @@ class _NIDCPowerTSM:
             voltage_limit (float): maximum allowed voltage
             voltage_limit_range (float): range selection for voltage limit
         """
-        current_levels = self._expand_array_to_sessions(current_level)
-        current_level_ranges = self._expand_array_to_sessions(current_level_range)
-        voltage_limits = self._expand_array_to_sessions(voltage_limit)
-        voltage_limit_ranges = self._expand_array_to_sessions(voltage_limit_range)
+        (
+            current_levels,
+            current_level_ranges,
+            voltage_limits,
+            voltage_limit_ranges,
+        ) = self._broadcast_to_channels(
+            current_level,
+            current_level_range,
+            voltage_limit,
+            voltage_limit_range,
+        )
         self._force_current_symmetric_limits_array(
             current_levels, current_level_ranges, voltage_limits, voltage_limit_ranges
         )
@@ -2460,12 +3405,20 @@ class _NIDCPowerTSM:
             current_limit_low (float): maximum allowed negative side current.
             current_limit_range (float): range selection for current limit.
         """
-        voltage_levels = self._expand_array_to_sessions(voltage_level)
-        voltage_level_ranges = self._expand_array_to_sessions(voltage_level_range)
-        current_limit_highs = self._expand_array_to_sessions(current_limit_high)
-        current_limit_lows = self._expand_array_to_sessions(current_limit_low)
-        current_limit_ranges = self._expand_array_to_sessions(current_limit_range)
-        self._force_current_asymmetric_limits_array(
+        (
+            voltage_levels,
+            voltage_level_ranges,
+            current_limit_highs,
+            current_limit_lows,
+            current_limit_ranges,
+        ) = self._broadcast_to_channels(
+            voltage_level,
+            voltage_level_range,
+            current_limit_high,
+            current_limit_low,
+            current_limit_range,
+        )
+        self._force_voltage_asymmetric_limits_array(
             voltage_levels,
             voltage_level_ranges,
             current_limit_highs,
@@ -2486,10 +3439,17 @@ class _NIDCPowerTSM:
             current_limit_range (float, optional): range selection for current limit. Defaults to
             0.0.
         """
-        voltage_levels = self._expand_array_to_sessions(voltage_level)
-        voltage_level_ranges = self._expand_array_to_sessions(voltage_level_range)
-        current_limits = self._expand_array_to_sessions(current_limit)
-        current_limit_ranges = self._expand_array_to_sessions(current_limit_range)
+        (
+            voltage_levels,
+            voltage_level_ranges,
+            current_limits,
+            current_limit_ranges,
+        ) = self._broadcast_to_channels(
+            voltage_level,
+            voltage_level_range,
+            current_limit,
+            current_limit_range,
+        )
         self._force_voltage_symmetric_limits_array(
             voltage_levels, voltage_level_ranges, current_limits, current_limit_ranges
         )
@@ -2497,7 +3457,8 @@ class _NIDCPowerTSM:
     def measure(self, measurement_mode=MeasurementMode.AUTO):
         """
         measure the data by setting uo the measurement mode
-        reads all data from all the sessions.
+        reads all data from all the sessions, with one call per session for the channels of all
+        the SSCs that share the session.
 
         Args:
             measurement_mode (enum, optional): specifies the desired measurement mode. Defaults to
@@ -2506,18 +3467,127 @@ class _NIDCPowerTSM:
         Returns:
             voltages, current: tuple of list of voltages and currents
         """
+        if self._session_map is None:
+            self._session_map = _SessionChannelMap(self._sscs)
+        merged_sscs = self._session_map.sscs
         fetch_or_measure_array = []
         voltages = []
         currents = []
-        for ssc in self._sscs:
+        for ssc in merged_sscs:
             fetch_or_measure_array.append(ssc.cs_measure_setup(measurement_mode))
         i = 0
-        for ssc in self._sscs:
+        for ssc in merged_sscs:
             voltages_new, currents_new = ssc.cs_measure_execute(fetch_or_measure_array[i])
             voltages += voltages_new
             currents += currents_new
             i += 1
-        return voltages, currents
+        return self._session_map.split(voltages), self._session_map.split(currents)
+
+    def measure_current_auto_ranged(
+        self,
+        expected_currents=None,
+        headroom=1.2,
+        overflow_ratio=0.98,
+        max_retries=3,
+        measurement_mode=MeasurementMode.AUTO,
+    ):
+        """
+        Selects the tightest current limit range for each channel from the expected currents,
+        measures, and then re-ranges and re-measures only the channels that overflow their range.
+        The expected currents are typically the readings of the previous device, if they are not
+        given a coarse measurement on the largest range is used. Only for channels forcing voltage.
+        While a range is below the current limit the limit is lowered to the range, the current
+        limit and current limit range of each channel are restored before returning.
+
+        Args:
+            expected_currents (float or list of float, optional): one for all or one per channel in
+                amps. Defaults to None, measure on the largest range first.
+            headroom (float, optional): factor applied on the expected current before selecting
+                the range. Defaults to 1.2.
+            overflow_ratio (float, optional): fraction of the range above which a reading is
+                treated as an overflow. Defaults to 0.98.
+            max_retries (int, optional): maximum number of re-range steps. Defaults to 3.
+            measurement_mode (MeasurementMode, optional): Defaults to MeasurementMode.AUTO.
+
+        Returns:
+            AutoRangeMeasurement: voltages, currents, current ranges and re-ranged flag per channel
+        """
+        ch_sscs = self._channel_sscs()
+        tables = [ch_ssc.cs_get_current_range_table() for ch_ssc in ch_sscs]
+        originals = [ch_ssc.cs_get_current_limit_and_range() for ch_ssc in ch_sscs]
+        try:
+            voltages, currents, range_indices, re_ranged = self._measure_auto_ranged(
+                ch_sscs,
+                tables,
+                [limit for limit, _ in originals],
+                expected_currents,
+                headroom,
+                overflow_ratio,
+                max_retries,
+                measurement_mode,
+            )
+        finally:
+            for ch_ssc, (limit, limit_range) in zip(ch_sscs, originals):
+                ch_ssc.cs_configure_current_limit_range(limit_range)
+                ch_ssc.cs_configure_current_limit(limit)
+        current_ranges = [float(table[index]) if index >= 0 else nan for table, index in zip(tables, range_indices)]
+        return AutoRangeMeasurement(voltages, currents, current_ranges, re_ranged)
+
+    def _measure_auto_ranged(
+        self,
+        ch_sscs,
+        tables,
+        limits,
+        expected_currents,
+        headroom,
+        overflow_ratio,
+        max_retries,
+        measurement_mode,
+    ):
+        """
+        ranging and measurements of measure_current_auto_ranged, every range is configured with
+        the lower of the original current limit and the range. Only a channel whose range is below
+        its original limit is re-ranged, a reading at the original limit is a compliance reading.
+        """
+        if expected_currents is None:
+            for ch_ssc, table, limit in zip(ch_sscs, tables, limits):
+                if table.size:
+                    ch_ssc.cs_configure_current_limit_range_and_clamp_limit(table[-1], limit)
+            _, expected_currents = self.measure(measurement_mode)
+        expected = numpy.asarray(expected_currents, dtype=numpy.float64).reshape(-1)
+        if expected.size not in (1, len(ch_sscs)):
+            raise ValueError("%d expected currents can not be broadcast to %d channels" % (expected.size, len(ch_sscs)))
+        expected = numpy.abs(numpy.broadcast_to(expected, (len(ch_sscs),))) * headroom
+        range_indices = []
+        for ch_ssc, table, limit, current in zip(ch_sscs, tables, limits, expected):
+            if table.size:
+                index = min(int(numpy.searchsorted(table, current)), table.size - 1)
+                ch_ssc.cs_configure_current_limit_range_and_clamp_limit(table[index], limit)
+            else:
+                index = -1
+            range_indices.append(index)
+        voltages, currents = self.measure(measurement_mode)
+        re_ranged = [False] * len(ch_sscs)
+        for _ in range(max_retries):
+            overflows = [
+                i
+                for i, (table, index) in enumerate(zip(tables, range_indices))
+                if 0 <= index < table.size - 1
+                and table[index] < limits[i]
+                and abs(currents[i]) >= table[index] * overflow_ratio
+            ]
+            if not overflows:
+                break
+            for i in overflows:
+                range_indices[i] += 1
+                re_ranged[i] = True
+                ch_sscs[i].cs_configure_current_limit_range_and_clamp_limit(tables[i][range_indices[i]], limits[i])
+            fetch_or_measure = [ch_sscs[i].cs_measure_setup(measurement_mode) for i in overflows]
+            for i, fetch in zip(overflows, fetch_or_measure):
+                channel_voltages, channel_currents = ch_sscs[i].cs_measure_execute(fetch)
+                voltages[i] = channel_voltages[0]
+                currents[i] = channel_currents[0]
+        return voltages, currents, range_indices, re_ranged
 
     def configure_source_adapt(
         self, voltage_ctr: CustomTransientResponse, current_ctr: CustomTransientResponse
@@ -2540,51 +3610,68 @@ class _NIDCPowerTSM:
         return [ssc.cs_get_source_adapt_settings() for ssc in self._sscs]
 
     def filter_sites(self, requested_sites):
-        """filter  the sites specified in the current TSMObject
+        """filter  the sites specified in the current TSMObject, the object itself is not changed
 
         Args:
-            requested_sites (list of int): sites
+            requested_sites (list of int): sites, -1 selects the system pins
 
         Returns:
-            SSC: list of sessions sites and channels
+            _NIDCPowerTSM: sessions and channels of the requested sites
         """
-        filtered_ssc = []
-        for ssc in self._sscs:
-            found = False
-            sites = common.channel_list_to_pins(ssc.cs_channels)[2]
-            for s in sites:
-                found = (s in requested_sites) or found
-            if found:
-                filtered_ssc.append(ssc)
-        return filtered_ssc
+        index = self.pin_site_index
+        keys = [(pin, site) for site in requested_sites for pin in self._index_pins if (pin, site) in index]
+        return self._select(keys)
 
     def filter_pins(self, requested_pins):
-        """filter the pins specified in the current TSMObject
+        """filter the pins specified in the current TSMObject, the object itself is not changed
 
         Args:
-            requested_pins (str): pin names
+            requested_pins (list of str): pin names
 
         Returns:
-            SSC: list of sessions sites and channels
+            _NIDCPowerTSM: sessions and channels of the requested pins, dut pins ordered by site
+            and then system pins
         """
-        temp1 = []
-        temp2 = []
-        for ssc in self._sscs:
-            sites_pins, pins, sites = common.channel_list_to_pins(ssc.cs_channels)
-            try:
-                search_pos = int(requested_pins.index(pins[0]))
-            except ValueError:
-                search_pos = -1
-            if sites[0] >= 0 and search_pos >= 0:
-                temp1.append((sites[0], search_pos, ssc))
-            elif (sites[0] < 0) and (search_pos >= 0):
-                temp2.append((sites[0], search_pos, ssc))
-        temp1 = sorted(temp1)
-        temp2 = sorted(temp2)
-        dut_pins_ssc = [i[2] for i in temp1]
-        sys_pins_ssc = [i[2] for i in temp2]
-        filtered_ssc = dut_pins_ssc + sys_pins_ssc
-        return filtered_ssc
+        index = self.pin_site_index
+        keys = [(pin, site) for site in self._index_sites for pin in requested_pins if (pin, site) in index]
+        keys += [(pin, -1) for pin in requested_pins if (pin, -1) in index]
+        return self._select(keys)
+
+    def _select(self, keys):
+        """
+        creates a view on the channels of the keys. SSCs with all their channels selected are
+        shared with this object, the others are replaced by a subset of their channels.
+
+        Args:
+            keys (list of tuple): (pin, site) keys of the pin site index, in the requested order
+
+        Returns:
+            _NIDCPowerTSM: sessions and channels of the keys, with its own pin site index
+        """
+        index = self.pin_site_index
+        selected = {}  # ssc index -> positions of the selected channels
+        for key in keys:
+            location = index[key]
+            selected.setdefault(location.ssc_index, {})[location.position] = None
+        sscs = []
+        new_locations = {}  # (ssc index, position) -> (ssc index, position) in the view
+        for ssc_index, positions in selected.items():
+            ssc = self._sscs[ssc_index]
+            positions = list(positions)
+            if positions == list(range(len(ssc._ch_list))):
+                sscs.append(ssc)
+            else:
+                sscs.append(ssc.cs_subset(positions))
+            for new_position, position in enumerate(positions):
+                new_locations[(ssc_index, position)] = (len(sscs) - 1, new_position)
+        view = _NIDCPowerTSM(sscs)
+        view_index = {}
+        for key in keys:
+            location = index[key]
+            ssc_index, position = new_locations[(location.ssc_index, location.position)]
+            view_index[key] = location._replace(ssc_index=ssc_index, position=position)
+        view._set_pin_site_index(view_index)
+        return view
 
 
 class TSMDCPower(typing.NamedTuple):
@@ -2592,7 +3679,8 @@ class TSMDCPower(typing.NamedTuple):
     data type of the DCPower_Tsm objects
 
     Args:
-        TSM objects (tuple): 5 entities for storing them togather.
+        TSM objects (tuple): 6 entities for storing them togather, the last one is the
+            (pin, site) -> ChannelLocation index of the sessions.
     """
 
     pin_query_context: typing.Any
@@ -2600,41 +3688,41 @@ class TSMDCPower(typing.NamedTuple):
     sites: typing.List[int]
     pins_info: typing.List[common.PinInformation]
     pins_expanded: typing.List[common.ExpandedPinInformation]
+    pin_site_index: typing.Mapping[typing.Tuple[str, int], ChannelLocation] = types.MappingProxyType({})
 
 
 def filter_pins(dc_power_tsm: TSMDCPower, desired_pins):
-    """From the tsm context select only desired pins
+    """From the tsm context select only desired pins, the input tsm context is not changed
 
     Args:
         dc_power_tsm (TSMDCPower): tsm context for nidcpower
-        desired_pins (_type_): pin names list
+        desired_pins (list of str): pin names list
 
     Returns:
         TSMDCPower: tsm context with only desired pins
     """
-    dc_power_tsm.ssc.filter_pins(desired_pins)
-    all_pins = common.get_pin_names_from_expanded_pin_information(dc_power_tsm.pins_expanded)
-    i = 0
-    pins_expand_new = []
-    for d_pin in desired_pins:
-        index_d = all_pins.index(d_pin)
-        data = dc_power_tsm.pins_expanded[index_d]
-        output = common.PinInformation(data.pin, data.type, 1)
-        data.index = i
-        dc_power_tsm.pins_info.append(output)
-        if index_d >= 0:
-            pins_expand_new.append(data)
-        i += 1
-    dut_pins, system_pins = common.get_dut_pins_and_system_pins_from_expanded_pin_list(
-        pins_expand_new
+    ssc = dc_power_tsm.ssc.filter_pins(desired_pins)
+    expanded_by_pin = {data.pin: data for data in dc_power_tsm.pins_expanded}
+    pins_expanded = [
+        expanded_by_pin[pin]._replace(index=i)
+        for i, pin in enumerate(pin for pin in desired_pins if pin in expanded_by_pin)
+    ]
+    if pins_expanded:
+        pins_info = [common.PinInformation(data.pin, data.type, 1) for data in pins_expanded]
+    else:
+        pins_info = [info for info in dc_power_tsm.pins_info if info.pin in desired_pins]
+    return TSMDCPower(
+        dc_power_tsm.pin_query_context,
+        ssc,
+        dc_power_tsm.sites,
+        pins_info,
+        pins_expanded,
+        ssc.pin_site_index,
     )
-    pins_to_query_ctx = common.get_pin_names_from_expanded_pin_information(dut_pins + system_pins)
-    dc_power_tsm.pin_query_context.Pins = pins_to_query_ctx
-    return dc_power_tsm
 
 
 def filter_sites(tsm: TSMDCPower, sites):
-    """from tsm context select only desired sites
+    """from tsm context select only desired sites, the input tsm context is not changed
 
     Args:
         tsm (TSMDCPower): pin query context
@@ -2643,9 +3731,15 @@ def filter_sites(tsm: TSMDCPower, sites):
     Returns:
         dc power tsm: same as input but with desired sites only
     """
-    tsm.ssc = tsm.ssc.filter_sites(sites)
-    tsm.site_numbers = sites
-    return tsm
+    ssc = tsm.ssc.filter_sites(sites)
+    return TSMDCPower(
+        tsm.pin_query_context,
+        ssc,
+        list(sites),
+        tsm.pins_info,
+        tsm.pins_expanded,
+        ssc.pin_site_index,
+    )
 
 
 @nitsm.codemoduleapi.code_module
@@ -2687,7 +3781,14 @@ def pins_to_sessions(
         for session, channel, pin_list in zip(sessions, channels, pin_lists)
     ]
     dc_power_tsm = _NIDCPowerTSM(sscs)
-    return TSMDCPower(pin_query_context, dc_power_tsm, sites, pins_info, pins_expanded)
+    return TSMDCPower(
+        pin_query_context,
+        dc_power_tsm,
+        sites,
+        pins_info,
+        pins_expanded,
+        dc_power_tsm.pin_site_index,
+    )
 
 
 @nitsm.codemoduleapi.code_module
@@ -2706,6 +3807,7 @@ def initialize_sessions(tsm: SMContext, power_line_frequency=60.0, **kwargs):
     options = kwargs["options"] if "options" in kwargs.keys() else {}
 
     # initialize and reset sessions
+    clear_instrument_info_cache()
     resource_strings = tsm.get_all_nidcpower_resource_strings()
     for resource_string in resource_strings:
         session = nidcpower.Session(resource_string, reset=reset, options=options)
@@ -2720,11 +3822,10 @@ def initialize_sessions(tsm: SMContext, power_line_frequency=60.0, **kwargs):
         # set start up state on each channel
         for i in range(session.channel_count):
             channel_name = session.get_channel_name(i + 1)
-            resource_name = channel_name.split("/")[0]
-            instrument_model = session.instruments[resource_name].instrument_model
-            if instrument_model in _ModelSupport.POWER_LINE_FREQUENCY:
+            capabilities = _get_channel_capabilities(session, channel_name)
+            if capabilities.power_line_frequency_supported:
                 session.channels[channel_name].power_line_frequency = power_line_frequency
-            if instrument_model not in _ModelSupport.DEFAULT_OUTPUT_STATE_0V:
+            if not capabilities.default_output_state_0v:
                 session.channels[channel_name].initiate()
 
         # set session in the tsm context
@@ -2747,6 +3848,7 @@ def close_sessions(tsm: SMContext):
         except nidcpower.errors.DriverError:
             session.reset_device()
         session.close()
+    clear_instrument_info_cache()
     return
 
 
@@ -0,0 +1,179 @@
+"""
+This is background analysis of fetched waveforms in worker processes used by devtool apis
+"""
+
+import concurrent.futures
+import threading
+import typing
+from multiprocessing import shared_memory
+
+import numpy
+
+
+def _close_block(block: shared_memory.SharedMemory, unlink=False):
+    """closes the shared memory block, it is closed when collected if a view of it is still alive"""
+    try:
+        block.close()
+    except BufferError:
+        pass
+    if unlink:
+        block.unlink()
+
+
+def _call_with_shared_waveforms(
+    function: typing.Callable,
+    name: str,
+    shape: typing.Tuple[int, ...],
+    dtype: str,
+    args: tuple,
+    kwargs: dict,
+):
+    """runs the analysis in the worker process on a view of the shared memory block"""
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        waveforms = numpy.ndarray(shape, numpy.dtype(dtype), buffer=block.buf)
+        waveforms.flags.writeable = False
+        return function(waveforms, *args, **kwargs)
+    finally:
+        waveforms = None
+        _close_block(block)
+
+
+class AnalysisExecutor:
+    """
+    Runs the analysis of fetched waveforms in a pool of worker processes, so the next acquisition
+    can start while the previous one is analyzed. The waveforms are handed to the workers in
+    shared memory: the workers map the same pages instead of receiving a pickled copy.
+
+    Buffers from allocate are shared without any copy, fetch into them with
+    fetch_waveform_into(buffers=...). Other waveforms are copied once into a temporary shared
+    block which is freed when the analysis is done.
+    """
+
+    def __init__(self, max_workers: typing.Optional[int] = None):
+        """
+        analysis executor initialisation
+
+        Args:
+            max_workers (int, optional): number of worker processes. Defaults to None, the number
+                of processors.
+        """
+        self._executor = concurrent.futures.ProcessPoolExecutor(max_workers)
+        self._lock = threading.Lock()
+        self._blocks: typing.Dict[int, shared_memory.SharedMemory] = {}  # address -> block
+        self._pending: typing.Dict[int, int] = {}  # address -> number of running analyses
+        self._released: typing.Set[int] = set()  # addresses to free when their analyses end
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    def allocate(self, shape: typing.Tuple[int, ...], dtype=numpy.float64):
+        """
+        allocates a waveform buffer in shared memory. It stays allocated until release or
+        shutdown is called.
+
+        Args:
+            shape (typing.Tuple[int, ...]): shape of the buffer
+            dtype (numpy.dtype, optional): data type of the buffer. Defaults to numpy.float64.
+
+        Returns:
+            numpy.ndarray: buffer backed by shared memory
+        """
+        size = int(numpy.prod(shape)) * numpy.dtype(dtype).itemsize
+        block = shared_memory.SharedMemory(create=True, size=max(1, size))
+        buffer = numpy.ndarray(shape, dtype, buffer=block.buf)
+        with self._lock:
+            self._blocks[buffer.ctypes.data] = block
+        return buffer
+
+    def release(self, buffer: numpy.ndarray):
+        """
+        frees a buffer from allocate once the analyses submitted on it are done. The buffer must
+        not be used after it is released.
+
+        Args:
+            buffer (numpy.ndarray): buffer from allocate, or a view starting at its first element
+        """
+        address = buffer.ctypes.data
+        with self._lock:
+            if address not in self._blocks:
+                raise ValueError("The buffer was not allocated by this executor")
+            if self._pending.get(address, 0):
+                self._released.add(address)
+                return
+            block = self._blocks.pop(address)
+        _close_block(block, unlink=True)
+
+    def submit(self, function: typing.Callable, waveforms, *args, **kwargs):
+        """
+        schedules function(waveforms, *args, **kwargs) in a worker process. The function and its
+        arguments are pickled, so the function must be defined at module level. The waveforms
+        are read only in the worker and must not be modified until the future is done.
+
+        Args:
+            function (typing.Callable): analysis, for example spectral.analyze_spectrum or
+                analysis.measure_waveforms
+            waveforms (array like): waveforms to analyze, a C contiguous buffer from allocate or a
+                view starting at its first element is shared without any copy
+
+        Returns:
+            concurrent.futures.Future: result of the function
+        """
+        waveforms = numpy.asarray(waveforms)
+        address = waveforms.ctypes.data
+        with self._lock:
+            block = self._blocks.get(address) if waveforms.flags.c_contiguous else None
+            if block is not None:
+                self._pending[address] = self._pending.get(address, 0) + 1
+        if block is None:
+            address = None
+            block = shared_memory.SharedMemory(create=True, size=max(1, waveforms.nbytes))
+            numpy.ndarray(waveforms.shape, waveforms.dtype, buffer=block.buf)[...] = waveforms
+        try:
+            future = self._executor.submit(
+                _call_with_shared_waveforms,
+                function,
+                block.name,
+                waveforms.shape,
+                waveforms.dtype.str,
+                args,
+                kwargs,
+            )
+        except Exception:
+            self._analysis_done(address, block)
+            raise
+        future.add_done_callback(lambda _: self._analysis_done(address, block))
+        return future
+
+    def _analysis_done(self, address: typing.Optional[int], block: shared_memory.SharedMemory):
+        """frees the temporary block, or the released buffer after its last analysis"""
+        if address is None:
+            _close_block(block, unlink=True)
+            return
+        with self._lock:
+            self._pending[address] -= 1
+            if self._pending[address] or address not in self._released:
+                return
+            del self._pending[address]
+            self._released.discard(address)
+            del self._blocks[address]
+        _close_block(block, unlink=True)
+
+    def shutdown(self, wait=True):
+        """
+        stops the worker processes and frees all the buffers from allocate
+
+        Args:
+            wait (bool, optional): waits for the submitted analyses to finish. Defaults to True.
+        """
+        self._executor.shutdown(wait)
+        with self._lock:
+            blocks = list(self._blocks.values())
+            self._blocks.clear()
+            self._pending.clear()
+            self._released.clear()
+        for block in blocks:
+            _close_block(block, unlink=True)
@@ -0,0 +1,328 @@
+"""
+This is power rail sequencing on top of the nidcpower wrapper for use with STS test codes
+"""
+
+import concurrent.futures
+import time
+import typing
+
+import nidcpower
+import nitsm.codemoduleapi
+from nitsm.codemoduleapi import SemiconductorModuleContext as SMContext
+
+from . import dcpower
+
+
+class RailStep(typing.NamedTuple):
+    """
+    one rail of a power-up or power-down plan. A rail without dependency starts with the sequence,
+    a dependent rail starts when the rail it depends on has finished its ramp.
+    """
+
+    rail: str
+    voltage_level: float
+    current_limit: float
+    ramp_time: float = 0.0
+    ramp_steps: int = 10
+    start_level: float = 0.0
+    depends_on: typing.Optional[str] = None
+    settle_tolerance: typing.Optional[float] = None
+    timeout: float = 1.0
+
+
+class RailTiming(typing.NamedTuple):
+    """
+    timing of one rail in the power sequence report, times are in seconds from the sequence start.
+    With hardware triggers the start time of a dependent rail is not measured, it is inferred as
+    the done time of the rail whose Sequence Engine Done event triggers it
+    """
+
+    rail: str
+    start_time: float
+    done_time: float
+    voltages: typing.List[float]
+    settled: bool
+
+
+class PowerSequenceReport(typing.NamedTuple):
+    """
+    timing report of a power sequence, rails are in the order of the plan
+    """
+
+    rails: typing.List[RailTiming]
+    total_time: float
+
+
+def _order_plan(plan: typing.Sequence[RailStep]):
+    """
+    validates the plan and orders the rails so that every rail comes after the rail it depends on
+
+    Args:
+        plan (typing.Sequence[RailStep]): rails of the power sequence
+
+    Raises:
+        ValueError: for duplicate rails, unknown dependencies or circular dependencies
+
+    Returns:
+        list of RailStep: rails in dependency order
+    """
+    steps = {}
+    for step in plan:
+        if step.rail in steps:
+            raise ValueError("Rail %s is used more than once in the power sequence" % step.rail)
+        steps[step.rail] = step
+    ordered = []
+    placed = set()
+    while len(ordered) < len(steps):
+        ready = [
+            step for step in plan if step.rail not in placed and (step.depends_on is None or step.depends_on in placed)
+        ]
+        if not ready:
+            pending = [step for step in plan if step.rail not in placed]
+            for step in pending:
+                if step.depends_on not in steps:
+                    raise ValueError("Rail %s depends on unknown rail %s" % (step.rail, step.depends_on))
+            raise ValueError("Circular dependency between rails %s" % [s.rail for s in pending])
+        for step in ready:
+            ordered.append(step)
+            placed.add(step.rail)
+    return ordered
+
+
+def _check_settled(rail_tsm: dcpower.TSMDCPower, step: RailStep):
+    """
+    measures the rail and checks it against the settle tolerance of the step
+
+    Args:
+        rail_tsm (dcpower.TSMDCPower): sessions of the rail
+        step (RailStep): rail settings
+
+    Returns:
+        tuple: measured voltages and settled flag
+    """
+    if step.settle_tolerance is None:
+        return [], True
+    voltages, _ = rail_tsm.ssc.measure(dcpower.MeasurementMode.MEASURE_MULTIPLE)
+    settled = all(abs(voltage - step.voltage_level) <= step.settle_tolerance for voltage in voltages)
+    return voltages, settled
+
+
+@nitsm.codemoduleapi.code_module
+def run_power_sequence(
+    tsm: SMContext,
+    plan: typing.Sequence[RailStep],
+    hardware_triggers=True,
+    trigger_lines: typing.Sequence[str] = tuple("PXI_Trig%d" % line for line in range(8)),
+):
+    """
+    Runs a power-up or power-down plan. Rails without dependency ramp concurrently, dependent rails
+    start when the rail they depend on is done. With hardware triggers the dependent rails are
+    armed before the sequence starts and are started by the exported Sequence Engine Done event of
+    the rail they depend on, otherwise they are started from software as soon as that rail is done.
+
+    Args:
+        tsm (SMContext): TestStand semiconductor module context
+        plan (typing.Sequence[RailStep]): rails of the power sequence
+        hardware_triggers (bool, optional): chains the rails with exported triggers. Defaults to
+            True.
+        trigger_lines (typing.Sequence[str], optional): trigger lines available for the sequence,
+            one is needed for the start and one for each session of each rail with dependents.
+            Defaults to PXI_Trig0 to PXI_Trig7.
+
+    Returns:
+        PowerSequenceReport: start, done time and settle result of each rail. The rails are left
+        aborted in single point mode at their voltage level, without any trigger or exported
+        event
+    """
+    ordered = _order_plan(plan)
+    rail_tsms = {step.rail: dcpower.pins_to_sessions(tsm, [step.rail]) for step in ordered}
+    try:
+        for step in ordered:
+            rail_tsms[step.rail].ssc.configure_voltage_ramp(
+                step.voltage_level,
+                step.current_limit,
+                step.ramp_time,
+                step.ramp_steps,
+                step.start_level,
+            )
+        if hardware_triggers:
+            timings = _run_with_hardware_triggers(ordered, rail_tsms, list(trigger_lines))
+        else:
+            timings = _run_with_software_triggers(ordered, rail_tsms)
+    except BaseException:
+        _release_rails(ordered, rail_tsms)  # the sequence error is the one to report
+        raise
+    errors = _release_rails(ordered, rail_tsms)
+    if errors:
+        raise errors[0]
+    report = [timings[step.rail] for step in plan]
+    total_time = max([timing.done_time for timing in report], default=0.0)
+    return PowerSequenceReport(report, total_time)
+
+
+def _release_rails(ordered, rail_tsms):
+    """
+    releases every rail of the sequence, also the ones after a rail that fails to release
+
+    Args:
+        ordered (list of RailStep): rails in dependency order
+        rail_tsms (dict): sessions of each rail
+
+    Returns:
+        list of Exception: errors raised while releasing the rails
+    """
+    errors = []
+    for step in ordered:
+        try:
+            _release_rail(rail_tsms[step.rail], step)
+        except Exception as error:
+            errors.append(error)
+    return errors
+
+
+def _release_rail(rail_tsm: dcpower.TSMDCPower, step: RailStep):
+    """
+    aborts the rail and removes everything the sequence configured on it: the start trigger, the
+    exported start trigger and Sequence Engine Done event which reserve the trigger lines, and the
+    sequence source mode. The rail keeps sourcing its voltage level.
+
+    Args:
+        rail_tsm (dcpower.TSMDCPower): sessions of the rail
+        step (RailStep): rail settings
+    """
+    rail_tsm.ssc.abort()
+    rail_tsm.ssc.configure_start_trigger(nidcpower.TriggerType.NONE)
+    rail_tsm.ssc.configure_export_signal(nidcpower.SendSoftwareEdgeTriggerType.START, "")
+    rail_tsm.ssc.configure_export_event(nidcpower.Event.SEQUENCE_ENGINE_DONE, "")
+    rail_tsm.ssc.configure_source_mode(nidcpower.SourceMode.SINGLE_POINT)
+    rail_tsm.ssc.configure_voltage_level(step.voltage_level)
+
+
+def _start_terminals(rail_tsm: dcpower.TSMDCPower, parent_sites, parent_terminals):
+    """
+    selects the start trigger of each channel of a dependent rail: the exported done event of the
+    session of the parent rail on the same site. Channels without such a session, like system
+    pins, use the last session of the parent rail, all its sessions run the same ramp from the
+    same start trigger.
+
+    Args:
+        rail_tsm (dcpower.TSMDCPower): sessions of the dependent rail
+        parent_sites (list of set): sites of each session of the parent rail
+        parent_terminals (list of str): exported done event terminal of each session of the
+            parent rail
+
+    Returns:
+        list of str: input terminal of each channel of the dependent rail
+    """
+    terminals = []
+    for ssc_sites in rail_tsm.ssc.get_channel_sites():
+        for sites in ssc_sites:
+            matches = [terminal for parent, terminal in zip(parent_sites, parent_terminals) if parent & sites]
+            terminals.append(matches[0] if matches else parent_terminals[-1])
+    return terminals
+
+
+def _run_with_hardware_triggers(ordered, rail_tsms, trigger_lines):
+    """
+    arms all the rails with start triggers and starts the sequence with one software trigger
+
+    Args:
+        ordered (list of RailStep): rails in dependency order
+        rail_tsms (dict): sessions of each rail
+        trigger_lines (list of str): trigger lines available for the sequence
+
+    Returns:
+        dict: rail name to RailTiming
+    """
+    if not ordered:
+        return {}
+    roots = [step for step in ordered if step.depends_on is None]
+    parents = sorted({step.depends_on for step in ordered if step.depends_on is not None})
+    parent_sites = {
+        parent: [set().union(*ssc_sites) for ssc_sites in rail_tsms[parent].ssc.get_channel_sites()]
+        for parent in parents
+    }
+    needed_lines = 1 + sum(len(sites) for sites in parent_sites.values())
+    if needed_lines > len(trigger_lines):
+        raise ValueError("Power sequence needs %d trigger lines" % needed_lines)
+    master_tsm = rail_tsms[roots[0].rail]
+    start_terminal = master_tsm.ssc.configure_export_signal(
+        nidcpower.SendSoftwareEdgeTriggerType.START, trigger_lines[0]
+    )
+    done_terminals = {}
+    next_line = 1
+    for parent in parents:  # one line per session of the parent rail
+        lines = trigger_lines[next_line : next_line + len(parent_sites[parent])]
+        next_line += len(lines)
+        done_terminals[parent] = rail_tsms[parent].ssc.configure_export_event(
+            nidcpower.Event.SEQUENCE_ENGINE_DONE, lines
+        )
+    for step in ordered:
+        if step is roots[0]:
+            trigger_type, terminal = nidcpower.TriggerType.SOFTWARE_EDGE, ""
+        elif step.depends_on is None:
+            trigger_type, terminal = nidcpower.TriggerType.DIGITAL_EDGE, start_terminal
+        else:
+            trigger_type = nidcpower.TriggerType.DIGITAL_EDGE
+            terminal = _start_terminals(
+                rail_tsms[step.rail],
+                parent_sites[step.depends_on],
+                done_terminals[step.depends_on],
+            )
+        rail_tsms[step.rail].ssc.configure_start_trigger(trigger_type, terminal)
+    for step in reversed(ordered):  # arm the dependent rails before the rails they wait on
+        rail_tsms[step.rail].ssc.initiate()
+    deadline = sum(step.timeout for step in ordered)
+    start = time.perf_counter()
+    master_tsm.ssc.send_software_edge_trigger(nidcpower.SendSoftwareEdgeTriggerType.START)
+
+    def wait(step):
+        wait_start = time.perf_counter() - start
+        result = rail_tsms[step.rail].ssc.wait_for_event_with_deadline(
+            nidcpower.Event.SEQUENCE_ENGINE_DONE, deadline - wait_start
+        )
+        return wait_start + max(result.completion_times, default=0.0)
+
+    with concurrent.futures.ThreadPoolExecutor(len(ordered)) as executor:
+        done_futures = {step.rail: executor.submit(wait, step) for step in ordered}
+        done_times = {rail: future.result() for rail, future in done_futures.items()}
+    timings = {}
+    for step in ordered:
+        start_time = 0.0 if step.depends_on is None else done_times[step.depends_on]
+        voltages, settled = _check_settled(rail_tsms[step.rail], step)
+        timings[step.rail] = RailTiming(step.rail, start_time, done_times[step.rail], voltages, settled)
+    return timings
+
+
+def _run_with_software_triggers(ordered, rail_tsms):
+    """
+    starts each rail from its own thread as soon as the rail it depends on is done
+
+    Args:
+        ordered (list of RailStep): rails in dependency order
+        rail_tsms (dict): sessions of each rail
+
+    Returns:
+        dict: rail name to RailTiming
+    """
+    if not ordered:
+        return {}
+    start = time.perf_counter()
+
+    def run_rail(step, parent_future):
+        if parent_future is not None:
+            parent_future.result()
+        start_time = time.perf_counter() - start
+        rail_tsm = rail_tsms[step.rail]
+        rail_tsm.ssc.initiate()
+        rail_tsm.ssc.wait_for_event_with_deadline(nidcpower.Event.SEQUENCE_ENGINE_DONE, step.timeout)
+        done_time = time.perf_counter() - start
+        voltages, settled = _check_settled(rail_tsm, step)
+        return RailTiming(step.rail, start_time, done_time, voltages, settled)
+
+    with concurrent.futures.ThreadPoolExecutor(len(ordered)) as executor:
+        futures = {}
+        for step in ordered:
+            parent_future = futures.get(step.depends_on)
+            futures[step.rail] = executor.submit(run_rail, step, parent_future)
+        return {rail: future.result() for rail, future in futures.items()}
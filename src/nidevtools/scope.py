@@ -1,8 +1,10 @@
 """
 This is niscope wrapper for use with STS test codes
 """
+import concurrent.futures
 import re
 import typing
+import weakref
 from enum import Enum
 
 import niscope
@@ -11,8 +13,10 @@ import numpy
 from nitsm.codemoduleapi import SemiconductorModuleContext as SMContext
 from nitsm.pinquerycontexts import PinQueryContext
 
+import nidevtools._tclk as ni_dt_tclk
+import nidevtools.analysis as ni_dt_analysis
 import nidevtools.common as ni_dt_common
-
+import nidevtools.spectral as ni_dt_spectral
 
 class OutputTerminal(typing.NamedTuple):
     NONE: str
@@ -224,13 +228,181 @@ def _configure_vertical_per_channel_arrays(
         offsets (typing.List[float]): vertical offset list - one for each session
         probes_drop (typing.List[float]): probe attenuation drop list - one for each session
         enabled_s (typing.List[bool]): channel enabled list - one for each session
+
+    Returns:
+        list: session, channels and vertical properties to write for each channel
     """
-    for (ssc, v_range, coupling, offset, drop, enabled) in zip(
-        ssc_s, ranges, couplings, offsets, probes_drop, enabled_s
-    ):
-        ssc.session.channels[ssc.channels].configure_vertical(
-            v_range, coupling, offset, drop, enabled
+    return [
+        (
+            ssc.session,
+            [ssc.channels],
+            "configure_vertical",
+            _vertical_properties(v_range, coupling, offset, drop, enabled),
+        )
+        for (ssc, v_range, coupling, offset, drop, enabled) in zip(
+            ssc_s, ranges, couplings, offsets, probes_drop, enabled_s
         )
+    ]
+
+
+# Shadow configuration sub routines
+# session -> (channel, property name) -> value last committed by the configure methods, the session
+# properties use the "" channel. The entry goes away with the session, so a new session never
+# inherits the shadow of a closed one.
+_shadow_configurations: typing.MutableMapping[niscope.Session, typing.Dict[typing.Tuple[str, str], typing.Any]] = (
+    weakref.WeakKeyDictionary()
+)
+_MISSING = object()  # shadow value of the properties that were never written
+_CHARACTERISTICS_PROPERTIES = ("input_impedance", "max_input_frequency")
+_TRIGGER_PROPERTIES = (
+    "trigger_type",
+    "trigger_source",
+    "trigger_level",
+    "trigger_coupling",
+    "trigger_slope",
+    "trigger_holdoff",
+    "trigger_delay_time",
+)
+
+
+def _vertical_properties(v_range, coupling, offset, probe_attenuation, enabled):
+    """private function which maps the configure_vertical arguments to the channel properties"""
+    return {
+        "vertical_range": v_range,
+        "vertical_coupling": coupling,
+        "vertical_offset": offset,
+        "probe_attenuation": probe_attenuation,
+        "channel_enabled": enabled,
+    }
+
+
+def _characteristics_properties(input_impedance, max_input_frequency):
+    """private function which maps the configure_chan_characteristics arguments to the channel
+    properties"""
+    return {"input_impedance": input_impedance, "max_input_frequency": max_input_frequency}
+
+
+def _timing_properties(min_sample_rate, min_num_pts, ref_position, num_records, enforce_realtime):
+    """private function which maps the configure_horizontal_timing arguments to the session
+    properties"""
+    return {
+        "min_sample_rate": min_sample_rate,
+        "horz_min_num_pts": min_num_pts,
+        "horz_record_ref_position": ref_position,
+        "horz_num_records": num_records,
+        "horz_enforce_realtime": enforce_realtime,
+    }
+
+
+def _edge_trigger_properties(trigger_source, level, trigger_coupling, slope, holdoff, delay):
+    """private function which maps the configure_trigger_edge arguments to the session
+    properties. The trigger methods that do not use the shadow drop all the trigger properties, so
+    the trigger type does not need to be tracked."""
+    return {
+        "trigger_source": trigger_source,
+        "trigger_level": level,
+        "trigger_coupling": trigger_coupling,
+        "trigger_slope": slope,
+        "trigger_holdoff": holdoff,
+        "trigger_delay_time": delay,
+    }
+
+
+def _write_changed_properties(
+    session: niscope.Session,
+    channels: typing.List[str],
+    method: str,
+    properties: typing.Dict[str, typing.Any],
+):
+    """private function which calls the driver method once for the channels on which any of the
+    properties differs from the shadow configuration of the session, so the driver still validates
+    the properties together, like the vertical range with the probe attenuation.
+
+    Args:
+        session (niscope.Session): session of the channels
+        channels (typing.List[str]): channel lists of the session, [""] for session properties
+        method (str): driver method writing the properties, like "configure_vertical"
+        properties (typing.Dict[str, typing.Any]): property name -> value, in the order of the
+            arguments of the method
+
+    Returns:
+        tuple: number of properties written and the (channel, name, value) shadow updates
+    """
+    shadow = _shadow_configurations.get(session, {})
+    changed = [
+        channel
+        for channel in channels
+        if any(shadow.get((channel, name), _MISSING) != value for name, value in properties.items())
+    ]
+    if not changed:
+        return 0, []
+    target = session.channels[",".join(changed)] if changed[0] else session
+    getattr(target, method)(*properties.values())
+    written = sum(
+        any(shadow.get((channel, name), _MISSING) != value for channel in changed) for name, value in properties.items()
+    )
+    updates = [(channel, name, value) for channel in changed for name, value in properties.items()]
+    return written, updates
+
+
+def _write_and_commit(
+    writes: typing.Iterable[typing.Tuple[niscope.Session, typing.List[str], str, typing.Dict[str, typing.Any]]],
+):
+    """private function which writes the changed properties and commits each session that
+    changed once. The session properties written by several SSCs of the same session with the
+    same method are merged first, the last value wins as if they were written one after the other.
+    The shadow configuration is updated only once the sessions are committed, the properties of a
+    failed write or commit are dropped from it.
+
+    Args:
+        writes: session, channels, driver method and properties of each write
+
+    Returns:
+        int: number of properties written, 0 when the hardware was already configured
+    """
+    merged_writes = []
+    session_properties: typing.Dict[typing.Tuple[niscope.Session, str], typing.Dict[str, typing.Any]] = {}
+    for session, channels, method, properties in writes:
+        if channels == [""]:
+            key = (session, method)
+            if key not in session_properties:
+                session_properties[key] = {}
+                merged_writes.append((session, channels, method, session_properties[key]))
+            session_properties[key].update(properties)
+        else:
+            merged_writes.append((session, channels, method, properties))
+    changed_sessions = {}  # session -> its shadow updates
+    written = 0
+    try:
+        for session, channels, method, properties in merged_writes:
+            count, updates = _write_changed_properties(session, channels, method, properties)
+            if count:
+                changed_sessions.setdefault(session, []).extend(updates)
+                written += count
+        for session in changed_sessions:
+            session.commit()
+    except Exception:
+        for session, _, _, properties in merged_writes:
+            _forget_properties(session, properties)
+        raise
+    for session, updates in changed_sessions.items():
+        shadow = _shadow_configurations.setdefault(session, {})
+        for channel, name, value in updates:
+            shadow[(channel, name)] = value
+    return written
+
+
+def _forget_properties(session: niscope.Session, names: typing.Optional[typing.Iterable[str]] = None):
+    """private function which drops properties from the shadow configuration of the session, for
+    the methods that write them without the shadow. All of them are dropped when names is None.
+    """
+    if names is None:
+        _shadow_configurations.pop(session, None)
+        return
+    names = set(names)
+    shadow = _shadow_configurations.get(session, {})
+    for key in [key for key in shadow if key[1] in names]:
+        del shadow[key]
 
 
 # Digital Sub routines
@@ -355,6 +527,91 @@ def _fetch_measurement_stats_arrays(
     return stats
 
 
+class FetchBufferPool:
+    """
+    Bounded pool of NumPy fetch buffers. Buffers released to the pool are reused by the next
+    fetch of the same shape and data type instead of allocating new memory.
+    """
+
+    def __init__(self, max_buffers=8):
+        """
+        constructor of the pool
+
+        Args:
+            max_buffers (int, optional): maximum number of free buffers kept in the pool.
+                Defaults to 8.
+        """
+        self._max_buffers = max_buffers
+        self._free: typing.Dict[typing.Tuple[typing.Tuple[int, ...], str], typing.List] = {}
+        self._free_count = 0
+
+    def acquire(self, shape: typing.Tuple[int, ...], dtype=numpy.float64):
+        """
+        returns a free buffer of the shape and data type, a new one if none is free
+
+        Args:
+            shape (tuple of int): shape of the buffer
+            dtype (numpy.dtype, optional): data type. Defaults to numpy.float64.
+
+        Returns:
+            numpy.ndarray: uninitialised buffer
+        """
+        key = (tuple(shape), numpy.dtype(dtype).str)
+        free = self._free.get(key)
+        if free:
+            self._free_count -= 1
+            return free.pop()
+        return numpy.empty(shape, dtype)
+
+    def release(self, buffer: numpy.ndarray):
+        """
+        gives a buffer back to the pool, it is dropped if the pool is full
+
+        Args:
+            buffer (numpy.ndarray): buffer acquired from this pool
+        """
+        if self._free_count < self._max_buffers:
+            self._free.setdefault((buffer.shape, buffer.dtype.str), []).append(buffer)
+            self._free_count += 1
+
+
+def _fetch_buffer(buffer: numpy.ndarray, shape: typing.Tuple[int, int, int], dtype):
+    """
+    private function which checks a caller buffer of fetch_waveform_into and returns the view of
+    the shape on its first elements. fetch_into writes into the buffer itself, so a copy would
+    leave the caller buffer unchanged.
+    """
+    size = int(numpy.prod(shape))
+    if buffer.dtype != numpy.dtype(dtype) or not buffer.flags.c_contiguous or buffer.size < size:
+        raise ValueError(
+            "buffer must be a C contiguous {} array of at least {} elements".format(numpy.dtype(dtype), size)
+        )
+    return buffer.reshape(-1)[:size].reshape(shape)
+
+
+def _waveform_info_to_arrays(waveform_info: typing.List[niscope.WaveformInfo], num_channels: int, num_records: int):
+    """
+    private function which packs the waveform information into one array per attribute
+
+    Args:
+        waveform_info (typing.List[niscope.WaveformInfo]): channel major waveform information
+        num_channels (int): number of channels fetched
+        num_records (int): number of records fetched per channel
+
+    Returns:
+        WaveformInfoArrays: arrays of shape channels x records
+    """
+    shape = (num_channels, num_records)
+    return WaveformInfoArrays(
+        numpy.array([info.absolute_initial_x for info in waveform_info]).reshape(shape),
+        numpy.array([info.relative_initial_x for info in waveform_info]).reshape(shape),
+        numpy.array([info.x_increment for info in waveform_info]).reshape(shape),
+        numpy.array([info.gain for info in waveform_info]).reshape(shape),
+        numpy.array([info.offset for info in waveform_info]).reshape(shape),
+        numpy.array([info.actual_samples for info in waveform_info]).reshape(shape),
+    )
+
+
 class _NIScopeTSM:
     """
     This is private class exposed via an object with different name. mostly all operations in this
@@ -369,6 +626,7 @@ class _NIScopeTSM:
             sessions_sites_channels (typing.Iterable[_NIScopeSSC]): list of sessions
         """
         self._sscs = sessions_sites_channels
+        self._tclk_sessions = []  # sessions synchronized with TClk
 
     def _obtain_trigger_path(self, trigger_source: str, setup_type: str):
         """
@@ -405,6 +663,7 @@ class _NIScopeTSM:
         """
         for ssc in self._sscs:
             ssc.session.channels[ssc.channels].configure_chan_characteristics(input_impedance, -1.0)
+            _forget_properties(ssc.session, _CHARACTERISTICS_PROPERTIES)
         return
 
     def configure_reference_level(self, channel_based_mid_ref_level=50.0):
@@ -431,7 +690,10 @@ class _NIScopeTSM:
         enabled: bool = True,
     ):
         """
-        Configures the vertical scale settings for the channels in the current TSMScope object
+        Configures the vertical scale settings for the channels in the current TSMScope object.
+        Only the settings that differ from the last committed configuration are written, and the
+        sessions that changed are committed before returning, where this method used to leave the
+        commit to the next initiate.
 
         Args:
             v_range (float): vertical range
@@ -442,12 +704,14 @@ class _NIScopeTSM:
                 Defaults to 1.0.
             enabled (bool, optional): Channels enabled or disabled for data capture. Defaults to
                 True.
+
+        Returns:
+            int: number of properties written, 0 when the channels were already configured
         """
-        for ssc in self._sscs:
-            ssc.session.channels[ssc.channels].configure_vertical(
-                v_range, coupling, offset, probe_attenuation, enabled
-            )
-        return
+        properties = _vertical_properties(v_range, coupling, offset, probe_attenuation, enabled)
+        return _write_and_commit(
+            (ssc.session, re.split(r"\s*,\s*", ssc.channels), "configure_vertical", properties) for ssc in self._sscs
+        )
 
     def configure(
         self,
@@ -479,15 +743,20 @@ class _NIScopeTSM:
             input_impedance (float, optional): _description_. Defaults to 1e6.
             num_records (int, optional): _description_. Defaults to 1.
             enforce_realtime (bool, optional): _description_. Defaults to True.
+
+        Returns:
+            int: number of properties written, 0 when the channels were already configured
         """
+        vertical = _vertical_properties(vertical_range, coupling, offset, probe_attenuation, True)
+        characteristics = _characteristics_properties(input_impedance, max_input_frequency)
+        timing = _timing_properties(min_sample_rate, min_record_length, ref_position, num_records, enforce_realtime)
+        writes = []
         for ssc in self._sscs:
-            channels = ssc.session.channels[ssc.channels]
-            channels.configure_vertical(vertical_range, coupling, offset, probe_attenuation)
-            channels.configure_chan_characteristics(input_impedance, max_input_frequency)
-            ssc.session.configure_horizontal_timing(
-                min_sample_rate, min_record_length, ref_position, num_records, enforce_realtime
-            )
-        return
+            channels = re.split(r"\s*,\s*", ssc.channels)
+            writes.append((ssc.session, channels, "configure_vertical", vertical))
+            writes.append((ssc.session, channels, "configure_chan_characteristics", characteristics))
+            writes.append((ssc.session, [""], "configure_horizontal_timing", timing))
+        return _write_and_commit(writes)
 
     def configure_vertical_per_channel(
         self,
@@ -506,6 +775,9 @@ class _NIScopeTSM:
             probe_attenuation (float): vertical probe attenuation
             coupling (niscope.VerticalCoupling): vertical coupling
             channel_enabled (bool): channel enabled
+
+        Returns:
+            int: number of properties written, 0 when the channels were already configured
         """
         ssc_per_channel = _expand_ssc_to_ssc_per_channel(list(self._sscs))
         size = len(ssc_per_channel)
@@ -514,10 +786,11 @@ class _NIScopeTSM:
         ranges = _expand_to_requested_array_size(vertical_range, size)
         offsets = _expand_to_requested_array_size(offset, size)
         enabled_out = _expand_to_requested_array_size(channel_enabled, size)
-        _configure_vertical_per_channel_arrays(
-            ssc_per_channel, ranges, couplings, offsets, probe_drops, enabled_out
+        return _write_and_commit(
+            _configure_vertical_per_channel_arrays(
+                ssc_per_channel, ranges, couplings, offsets, probe_drops, enabled_out
+            )
         )
-        return
 
     # Configure Timing
     def configure_timing(
@@ -529,7 +802,9 @@ class _NIScopeTSM:
         enforce_realtime: bool = True,
     ):
         """
-        Configures the timescale settings for the channels in the current TSMScope object
+        Configures the timescale settings for the channels in the current TSMScope object. The
+        timing is written only when it differs from the last committed one, and the changed
+        sessions are committed before returning instead of at the next initiate.
 
         Args:
             min_sample_rate (float, optional): minimum samples per second. Defaults to 20e6.
@@ -537,16 +812,69 @@ class _NIScopeTSM:
             ref_position (float, optional): reference position. Defaults to 50.0.
             num_records (int, optional): number of records. Defaults to 1.
             enforce_realtime (bool, optional): enforcing real time acquisition. Defaults to True.
+
+        Returns:
+            int: number of properties written, 0 when the sessions were already configured
+        """
+        timing = _timing_properties(min_sample_rate, min_num_pts, ref_position, num_records, enforce_realtime)
+        return _write_and_commit((ssc.session, [""], "configure_horizontal_timing", timing) for ssc in self._sscs)
+
+    def apply(self, configuration: "ScopeConfiguration"):
+        """
+        Applies a declarative configuration to the channels in the current TSMScope object. The
+        driver configure methods are called only for the channels whose properties differ from the
+        configuration last committed to each session, and each session is committed once when
+        something changed, so applying the same configuration again costs no driver call.
+
+        Args:
+            configuration (ScopeConfiguration): channel configuration of all the pins or per pin
+                name, and the optional timing and edge trigger configuration of the sessions
+
+        Returns:
+            int: number of properties written, 0 when the sessions were already configured
         """
+        per_pin = isinstance(configuration.channels, dict)
+        writes = []
         for ssc in self._sscs:
-            ssc.session.configure_horizontal_timing(
-                min_sample_rate,
-                min_num_pts,
-                ref_position,
-                num_records,
-                enforce_realtime,
-            )
-        return
+            channels_per_configuration: typing.Dict[ScopeChannelConfiguration, typing.List[str]]
+            channels_per_configuration = {}
+            names, pins, _ = _channel_list_to_pins(ssc.channel_list)
+            for channel, name, pin in zip(re.split(r"\s*,\s*", ssc.channels), names, pins):
+                if per_pin:
+                    channel_configuration = configuration.channels.get(name, configuration.channels.get(pin))
+                else:
+                    channel_configuration = configuration.channels
+                if channel_configuration is not None:
+                    channels_per_configuration.setdefault(channel_configuration, []).append(channel)
+            for channel_configuration, channels in channels_per_configuration.items():
+                vertical = _vertical_properties(
+                    channel_configuration.vertical_range,
+                    channel_configuration.coupling,
+                    channel_configuration.offset,
+                    channel_configuration.probe_attenuation,
+                    channel_configuration.enabled,
+                )
+                characteristics = _characteristics_properties(
+                    channel_configuration.input_impedance,
+                    channel_configuration.max_input_frequency,
+                )
+                writes.append((ssc.session, channels, "configure_vertical", vertical))
+                writes.append((ssc.session, channels, "configure_chan_characteristics", characteristics))
+            if configuration.timing is not None:
+                timing = _timing_properties(*configuration.timing)
+                writes.append((ssc.session, [""], "configure_horizontal_timing", timing))
+            if configuration.trigger is not None:
+                trigger = configuration.trigger
+                properties = _edge_trigger_properties(
+                    trigger.source or ssc.channels,
+                    trigger.level,
+                    trigger.coupling,
+                    trigger.slope,
+                    trigger.holdoff,
+                    trigger.delay,
+                )
+                writes.append((ssc.session, [""], "configure_trigger_edge", properties))
+        return _write_and_commit(writes)
 
     # Session Properties
     def get_session_properties(self):
@@ -632,6 +960,7 @@ class _NIScopeTSM:
                 delay,
             )
             ssc.session.trigger_modifier = niscope.TriggerModifier.NO_TRIGGER_MOD
+            _forget_properties(ssc.session, _TRIGGER_PROPERTIES)
         return
 
     def configure_trigger(
@@ -643,7 +972,9 @@ class _NIScopeTSM:
         delay: float = 0.0,
     ):
         """
-        configures trigger for all channels in the current TSMScope object
+        configures trigger for all channels in the current TSMScope object. The edge trigger is
+        written only to the sessions where it changed, and those sessions are committed before
+        returning instead of at the next initiate.
 
         Args:
             level (float): The voltage threshold for the trigger. Refer to
@@ -657,17 +988,19 @@ class _NIScopeTSM:
             delay (float, optional): How long the digitizer waits after receiving the trigger to
                 start acquiring data. Refer to trigger_delay_time for more information. Defaults to
                 0.0.
+
+        Returns:
+            int: number of properties written, 0 when the sessions were already configured
         """
-        for ssc in self._sscs:
-            ssc.session.configure_trigger_edge(
-                ssc.channels,
-                level,
-                trigger_coupling,
-                slope,
-                holdoff,
-                delay,
+        return _write_and_commit(
+            (
+                ssc.session,
+                [""],
+                "configure_trigger_edge",
+                _edge_trigger_properties(ssc.channels, level, trigger_coupling, slope, holdoff, delay),
             )
-        return
+            for ssc in self._sscs
+        )
 
     def configure_trigger_immediate(self):
         """
@@ -681,6 +1014,7 @@ class _NIScopeTSM:
         """
         for ssc in self._sscs:
             ssc.session.configure_trigger_immediate()
+            _forget_properties(ssc.session, _TRIGGER_PROPERTIES)
         return
 
     def clear_triggers(self):
@@ -692,6 +1026,7 @@ class _NIScopeTSM:
             ssc.session.configure_trigger_immediate()
             ssc.session.exported_start_trigger_output_terminal = OUTPUT_TERMINAL.NONE
             ssc.session.commit()
+            _forget_properties(ssc.session, _TRIGGER_PROPERTIES)
         return
 
     def export_start_triggers(self, output_terminal: str):
@@ -706,6 +1041,7 @@ class _NIScopeTSM:
         """
         start_trigger: str = ""
         for ssc in self._sscs:
+            _forget_properties(ssc.session, _TRIGGER_PROPERTIES)
             if self._sscs.index(ssc) == 0:
                 ssc.session.configure_trigger_immediate()
                 ssc.session.exported_start_trigger_output_terminal = output_terminal
@@ -751,6 +1087,7 @@ class _NIScopeTSM:
         data = self._sscs.pop(i)
         self._sscs.insert(0, data)
         for ssc in self._sscs:
+            _forget_properties(ssc.session, _TRIGGER_PROPERTIES)
             if self._sscs.index(ssc) == 0:
                 ssc.session.configure_trigger_edge(
                     trigger_source, trigger_level, niscope.TriggerCoupling.DC, trigger_slope
@@ -812,6 +1149,65 @@ class _NIScopeTSM:
             ssc.session.initiate()
         return
 
+    def synchronize(self, fgen_tsm: typing.Optional[typing.Any] = None, min_tclk_period=0.0):
+        """
+        Synchronizes all the sessions in the current TSMScope object, and optionally the sessions
+        of a TSMFGen object, with TClk. The sessions share the triggers of the first session, so
+        all the sites acquire on the same trigger event. Use initiate_synchronized to start them.
+
+        Args:
+            fgen_tsm (_NIFGenTSM, optional): ssc of a TSMFGen object to start with the digitizers.
+                Defaults to None.
+            min_tclk_period (float, optional): minimum TClk period in seconds. Defaults to 0.0.
+        """
+        ssc_s = list(self._sscs)
+        if fgen_tsm is not None:
+            ssc_s += list(fgen_tsm._sscs)
+        sessions = ni_dt_tclk.unique_sessions(ssc_s)
+        for session in sessions:
+            session.abort()
+            _forget_properties(session, _TRIGGER_PROPERTIES)
+        ni_dt_tclk.synchronize(sessions, min_tclk_period)
+        self._tclk_sessions = sessions
+
+    def initiate_synchronized(self):
+        """
+        Initiates all the sessions synchronized by synchronize with a single call.
+        """
+        if not self._tclk_sessions:
+            raise RuntimeError("Sessions are not synchronized, call synchronize first")
+        ni_dt_tclk.initiate(self._tclk_sessions)
+
+    def synchronized_acquisition(
+        self,
+        num_samples: int,
+        num_records=1,
+        fgen_tsm: typing.Optional[typing.Any] = None,
+        pool: typing.Optional[FetchBufferPool] = None,
+        min_tclk_period=0.0,
+        timeout=5.0,
+    ):
+        """
+        Acquires on all the sessions in the current TSMScope object from one shared trigger event:
+        synchronizes the sessions with TClk, initiates them with a single call and fetches them
+        concurrently.
+
+        Args:
+            num_samples (int): number of samples to fetch per record
+            num_records (int, optional): number of records to fetch per channel. Defaults to 1.
+            fgen_tsm (_NIFGenTSM, optional): ssc of a TSMFGen object to start with the digitizers.
+                Defaults to None.
+            pool (FetchBufferPool, optional): pool of the buffers. Defaults to None, new buffers.
+            min_tclk_period (float, optional): minimum TClk period in seconds. Defaults to 0.0.
+            timeout (float, optional): fetch timeout in seconds. Defaults to 5.0.
+
+        Returns:
+            list of ScopeFetchResult: one per session
+        """
+        self.synchronize(fgen_tsm, min_tclk_period)
+        self.initiate_synchronized()
+        return self.fetch_waveform_into(num_samples, num_records, pool=pool, timeout=timeout, concurrent_fetch=True)
+
     # Measure
     def fetch_measurement(self, scalar_meas_function: niscope.ScalarMeasurement):
         """
@@ -833,15 +1229,130 @@ class _NIScopeTSM:
                 measurements.append(measurement_stat.result)
         return measurements
 
-    def fetch_waveform(self, meas_num_samples: int):
+    def measure_waveforms(self, num_samples: int, timeout=5.0):
+        """
+        fetch one record from all channels in the current TSMScope object and computes the scalar
+        measurements on the host, with the reference levels configured on each session
+
+        Args:
+            num_samples (int): number of samples to fetch
+            timeout (float, optional): fetch timeout in seconds. Defaults to 5.0.
+
+        Returns:
+            ni_dt_analysis.WaveformMeasurements: one value per channel in each measurement
+        """
+        results = self.fetch_waveform_into(num_samples, timeout=timeout)
+        measurements = []
+        for ssc, result in zip(self._sscs, results):
+            channels = ssc.session.channels[ssc.channels]
+            reference_levels = ni_dt_analysis.ReferenceLevels(
+                channels.meas_chan_low_ref_level,
+                channels.meas_chan_mid_ref_level,
+                channels.meas_chan_high_ref_level,
+                channels.meas_ref_level_units == niscope.RefLevelUnits.PERCENTAGE,
+            )
+            measurements.append(
+                ni_dt_analysis.measure_waveforms(
+                    result.waveforms.reshape(-1, num_samples),
+                    result.info.x_increment.reshape(-1),
+                    reference_levels,
+                )
+            )
+        if not measurements:
+            return ni_dt_analysis.measure_waveforms(numpy.empty((0, num_samples)))
+        return ni_dt_analysis.WaveformMeasurements(*[numpy.concatenate(values) for values in zip(*measurements)])
+
+    def analyze_spectrum(
+        self,
+        num_samples: int,
+        window="hann",
+        fundamental_frequency=None,
+        num_harmonics=5,
+        num_spurs=5,
+        max_workers=0,
+        timeout=5.0,
+    ):
+        """
+        fetch one record from all channels in the current TSMScope object and computes their
+        spectral measurements in one batched call
+
+        Args:
+            num_samples (int): number of samples to fetch
+            window (str, optional): name of the window in ni_dt_spectral.WINDOWS. Defaults to
+                "hann".
+            fundamental_frequency (float or list of float, optional): frequency of the tone in
+                hertz. Defaults to None, the largest bin above DC.
+            num_harmonics (int, optional): harmonics included in the THD. Defaults to 5.
+            num_spurs (int, optional): number of spurs in the spur table. Defaults to 5.
+            max_workers (int, optional): worker processes for very long records. Defaults to 0,
+                in the calling process.
+            timeout (float, optional): fetch timeout in seconds. Defaults to 5.0.
+
+        Returns:
+            ni_dt_spectral.SpectralMetrics: one value or row per channel
+        """
+        results = self.fetch_waveform_into(num_samples, timeout=timeout)
+        waveforms = numpy.concatenate(
+            [result.waveforms.reshape(-1, num_samples) for result in results] or [numpy.empty((0, num_samples))]
+        )
+        x_increments = numpy.concatenate(
+            [result.info.x_increment.reshape(-1) for result in results] or [numpy.empty(0)]
+        )
+        return ni_dt_spectral.analyze_spectrum(
+            waveforms,
+            x_increments,
+            window,
+            fundamental_frequency,
+            num_harmonics,
+            num_spurs,
+            max_workers,
+        )
+
+    def accumulate_statistics(
+        self,
+        accumulator: ni_dt_analysis.StatisticsAccumulator,
+        num_samples: int,
+        measurements: typing.Sequence[str] = ni_dt_analysis.WaveformMeasurements._fields,
+        timeout=5.0,
+    ):
+        """
+        measures the waveforms of all channels in the current TSMScope object on the host and adds
+        the results to the statistics of each (pin, site, measurement), without clearing or
+        fetching the statistics of the driver. Measurements that are not found, like the rise time
+        of a flat waveform, are not added.
+
+        Args:
+            accumulator (ni_dt_analysis.StatisticsAccumulator): statistics to update
+            num_samples (int): number of samples to fetch
+            measurements (typing.Sequence[str], optional): names of the WaveformMeasurements
+                fields to accumulate. Defaults to all.
+            timeout (float, optional): fetch timeout in seconds. Defaults to 5.0.
+
+        Returns:
+            ni_dt_analysis.WaveformMeasurements: measurements of this acquisition
+        """
+        pins_sites = []
+        for ssc in self._sscs:
+            _, pins, sites = _channel_list_to_pins(ssc.channel_list)
+            pins_sites += zip(pins, sites)
+        results = self.measure_waveforms(num_samples, timeout)
+        keys = [(pin, site, name) for name in measurements for pin, site in pins_sites]
+        values = numpy.concatenate([getattr(results, name) for name in measurements])
+        measured = numpy.isfinite(values)  # timing measurements are nan without edges
+        accumulator.update([key for key, ok in zip(keys, measured) if ok], values[measured])
+        return results
+
+    def fetch_waveform(self, meas_num_samples: int, envelope_points=0):
         """
         fetch waveforms from all channels in the current TSMScope object
 
         Args:
             meas_num_samples (int): number of samples to fetch
+            envelope_points (int, optional): when not 0 each waveform is reduced to a
+                min/max/mean envelope of at most this many points. Defaults to 0, full waveform.
 
         Returns:
-            list: list of fetched data samples
+            list: list of fetched data samples, or of ni_dt_analysis.Envelope
         """
         waveforms: typing.Any = []
         waveform_info: typing.List[niscope.WaveformInfo] = []
@@ -853,8 +1364,13 @@ class _NIScopeTSM:
                 meas_num_samples, relative_to=niscope.FetchRelativeTo.PRETRIGGER
             )
             waveform_info.append(waveform)
-            for wfm in waveform:
-                waveforms.append(list(wfm.samples))  # waveform in memory view
+            for wfm in waveform:  # one waveform per channel and record, decimated on its own
+                if envelope_points:
+                    waveforms.append(
+                        ni_dt_analysis.decimate_envelope(wfm.samples, envelope_points, wfm.x_increment)
+                    )  # reads the samples in place from the memory view
+                else:
+                    waveforms.append(list(wfm.samples))  # waveform in memory view
         return waveform_info, waveforms
 
     def fetch_multirecord_waveform(self, num_records=-1):
@@ -884,6 +1400,138 @@ class _NIScopeTSM:
                 waveforms.append(list(wfm.samples))  # waveform in memory view
         return waveform_info, waveforms
 
+    def fetch_waveform_into(
+        self,
+        num_samples: int,
+        num_records=1,
+        buffers: typing.Optional[typing.List[numpy.ndarray]] = None,
+        pool: typing.Optional[FetchBufferPool] = None,
+        dtype=numpy.float64,
+        relative_to=niscope.FetchRelativeTo.PRETRIGGER,
+        record_number=0,
+        offset=0,
+        timeout=5.0,
+        concurrent_fetch=False,
+    ):
+        """
+        fetch waveforms from all channels in the current TSMScope object directly into NumPy
+        buffers, without converting the samples to Python objects
+
+        Args:
+            num_samples (int): number of samples to fetch per record
+            num_records (int, optional): number of records to fetch per channel. Defaults to 1.
+            buffers (list of numpy.ndarray, optional): one C contiguous buffer per session with
+                at least channels x records x samples elements of the data type, ValueError is
+                raised otherwise. Defaults to None, buffers from the pool.
+            pool (FetchBufferPool, optional): pool of the buffers, the caller releases the
+                waveforms to it when they are processed. Defaults to None, new buffers.
+            dtype (numpy.dtype, optional): float64 for scaled samples, int8, int16 or int32 for
+                raw samples to scale with the gain and offset. Defaults to numpy.float64.
+            relative_to (niscope.FetchRelativeTo, optional): position to fetch from. Defaults to
+                niscope.FetchRelativeTo.PRETRIGGER.
+            record_number (int, optional): first record to fetch. Defaults to 0.
+            offset (int, optional): offset in samples from relative_to. Defaults to 0.
+            timeout (float, optional): fetch timeout in seconds. Defaults to 5.0.
+            concurrent_fetch (bool, optional): fetches the sessions concurrently, one thread per
+                session. Defaults to False.
+
+        Returns:
+            list of ScopeFetchResult: one per session with the channels x records x samples
+            waveforms and the waveform information arrays
+        """
+        channels_s = []
+        waveforms_s = []
+        for index, ssc in enumerate(self._sscs):
+            channels = [channel.strip() for channel in ssc.channels.split(",")]
+            shape = (len(channels), num_records, num_samples)
+            if buffers is not None:
+                waveforms = _fetch_buffer(buffers[index], shape, dtype)
+            elif pool is not None:
+                waveforms = pool.acquire(shape, dtype)
+            else:
+                waveforms = numpy.empty(shape, dtype)
+            channels_s.append(channels)
+            waveforms_s.append(waveforms)
+
+        def fetch(ssc, channels, waveforms):
+            waveform_info = ssc.session.channels[ssc.channels].fetch_into(
+                waveforms.reshape(-1),
+                relative_to=relative_to,
+                offset=offset,
+                record_number=record_number,
+                num_records=num_records,
+                timeout=timeout,
+            )
+            info = _waveform_info_to_arrays(waveform_info, len(channels), num_records)
+            return ScopeFetchResult(channels, waveforms, info)
+
+        if concurrent_fetch and len(self._sscs) > 1:
+            with concurrent.futures.ThreadPoolExecutor(len(self._sscs)) as executor:
+                return list(executor.map(fetch, self._sscs, channels_s, waveforms_s))
+        return [fetch(*args) for args in zip(self._sscs, channels_s, waveforms_s)]
+
+    def iter_multirecord_waveform(
+        self,
+        records_per_batch=16,
+        num_records: typing.Optional[int] = None,
+        num_samples: typing.Optional[int] = None,
+        pool: typing.Optional[FetchBufferPool] = None,
+        dtype=numpy.float64,
+        relative_to=niscope.FetchRelativeTo.PRETRIGGER,
+        offset=0,
+        timeout=5.0,
+    ):
+        """
+        fetch a multi-record acquisition from all channels in the current TSMScope object in
+        batches of records. Each batch is fetched as soon as its records are acquired, so the
+        records can be processed while the acquisition continues. The buffers of a batch are given
+        back to the pool when the next batch is requested, copy the waveforms to keep them.
+
+        Args:
+            records_per_batch (int, optional): records fetched per batch. Defaults to 16.
+            num_records (int, optional): records to fetch. Defaults to None, the configured
+                number of records.
+            num_samples (int, optional): samples per record. Defaults to None, the configured
+                record length.
+            pool (FetchBufferPool, optional): pool of the batch buffers. Defaults to None, a pool
+                with one buffer per session.
+            dtype (numpy.dtype, optional): data type of the samples. Defaults to numpy.float64.
+            relative_to (niscope.FetchRelativeTo, optional): position to fetch from. Defaults to
+                niscope.FetchRelativeTo.PRETRIGGER.
+            offset (int, optional): offset in samples from relative_to. Defaults to 0.
+            timeout (float, optional): fetch timeout of each batch in seconds. Defaults to 5.0.
+
+        Yields:
+            tuple: first record number of the batch and the list of ScopeFetchResult, one per
+            session
+        """
+        if not self._sscs:
+            return
+        first_session = self._sscs[0].session
+        if num_records is None:
+            num_records = first_session.horz_num_records
+        if num_samples is None:
+            num_samples = first_session.horz_record_length
+        if pool is None:
+            pool = FetchBufferPool(max_buffers=2 * len(self._sscs))
+        for record_number in range(0, num_records, records_per_batch):
+            batch_records = min(records_per_batch, num_records - record_number)
+            results = self.fetch_waveform_into(
+                num_samples,
+                batch_records,
+                pool=pool,
+                dtype=dtype,
+                relative_to=relative_to,
+                record_number=record_number,
+                offset=offset,
+                timeout=timeout,
+            )
+            try:
+                yield record_number, results
+            finally:
+                for result in results:
+                    pool.release(result.waveforms)
+
     def fetch_clear_stats(self):
         """clear all measurements stats on all channels in the current TSMScope object"""
         for ssc in self._sscs:
@@ -976,6 +1624,84 @@ class TSMScope(typing.NamedTuple):
     sites: typing.List[int]
 
 
+class ScopeChannelConfiguration(typing.NamedTuple):
+    """
+    vertical settings and characteristics of scope channels, the arguments of configure
+    """
+
+    vertical_range: float = 5.0
+    coupling: niscope.VerticalCoupling = niscope.VerticalCoupling.DC
+    offset: float = 0.0
+    probe_attenuation: float = 1.0
+    enabled: bool = True
+    input_impedance: float = 1e6
+    max_input_frequency: float = 0.0
+
+
+class ScopeTimingConfiguration(typing.NamedTuple):
+    """
+    horizontal timing of scope sessions, the arguments of configure_timing
+    """
+
+    min_sample_rate: float = 20e6
+    min_num_pts: int = 1000
+    ref_position: float = 50.0
+    num_records: int = 1
+    enforce_realtime: bool = True
+
+
+class ScopeTriggerConfiguration(typing.NamedTuple):
+    """
+    edge trigger of scope sessions, the arguments of configure_trigger
+    """
+
+    level: float = 0.0
+    coupling: niscope.TriggerCoupling = niscope.TriggerCoupling.DC
+    slope: niscope.TriggerSlope = niscope.TriggerSlope.POSITIVE
+    holdoff: float = 0.0
+    delay: float = 0.0
+    source: str = ""  # "" triggers on the channels of each session like configure_trigger
+
+
+class ScopeConfiguration(typing.NamedTuple):
+    """
+    declarative configuration of the channels, timing and trigger of scope sessions, see apply
+    """
+
+    # one configuration for all the channels or pin name -> configuration, "SiteN/pin" names take
+    # precedence over pin names and the channels of the pins not in the dict are left unchanged
+    channels: typing.Union[ScopeChannelConfiguration, typing.Dict[str, ScopeChannelConfiguration]] = (
+        ScopeChannelConfiguration()
+    )
+    timing: typing.Optional[ScopeTimingConfiguration] = None
+    trigger: typing.Optional[ScopeTriggerConfiguration] = None
+
+
+class WaveformInfoArrays(typing.NamedTuple):
+    """
+    waveform information of a fetch, one array of channels x records per attribute of
+    niscope.WaveformInfo
+    """
+
+    absolute_initial_x: numpy.ndarray
+    relative_initial_x: numpy.ndarray
+    x_increment: numpy.ndarray
+    gain: numpy.ndarray
+    offset: numpy.ndarray
+    actual_samples: numpy.ndarray
+
+
+class ScopeFetchResult(typing.NamedTuple):
+    """
+    waveforms fetched from the channels of one session by fetch_waveform_into, with their
+    waveform information
+    """
+
+    channels: typing.List[str]
+    waveforms: numpy.ndarray  # channels x records x samples
+    info: WaveformInfoArrays
+
+
 class PinType(Enum):
     DUT_Pin = 0
     System_Pin = 1
@@ -1007,6 +1733,23 @@ class ScopeSessionProperties(typing.NamedTuple):
 
 
 # TSMContext Pin Abstraction Sub routines
+# (pin map file, pins, sites) -> (sites, SSCs) cache of pins_to_sessions
+_pins_to_sessions_cache: typing.Dict[typing.Tuple, typing.Tuple[list, list]] = {}
+
+
+def _same_sessions(ssc_s: typing.List[_NIScopeSSC], sessions: typing.Sequence[niscope.Session]):
+    """private function which checks that the cached SSCs use the sessions returned by TSM"""
+    return len(ssc_s) == len(sessions) and all(ssc.session is session for ssc, session in zip(ssc_s, sessions))
+
+
+def clear_pins_to_sessions_cache():
+    """
+    clears the cached channel lists of pins_to_sessions. Needs to be called whenever the sessions
+    are re-initialized.
+    """
+    _pins_to_sessions_cache.clear()
+
+
 def _pin_query_context_to_channel_list(
     pin_query_context: PinQueryContext,
     expanded_pins_information: typing.List[ExpandedPinInformation],
@@ -1101,15 +1844,23 @@ def pins_to_sessions(tsm: SMContext, pins: typing.List[str], sites: typing.List[
     if len(sites) == 0:
         sites = list(tsm.site_numbers)  # This is tested and works
     pin_query_context, sessions, channels = tsm.pins_to_niscope_sessions(pins)
-    sites, pin_lists = _pin_query_context_to_channel_list(pin_query_context, [], sites)
-    # sites, pin_lists = ni_dt_common.pin_query_context_to_channel_list(
-    # pin_query_context, [], sites)
-    sscs = [
-        _NIScopeSSC(session, channel, pin_list)
-        for session, channel, pin_list in zip(sessions, channels, pin_lists)
-    ]
-    scope_tsm = _NIScopeTSM(sscs)
-    return TSMScope(pin_query_context, scope_tsm, sites)
+    key = (
+        tsm.pin_map_file_path,
+        (pins,) if isinstance(pins, str) else tuple(pins),
+        tuple(sites),
+    )
+    cached = _pins_to_sessions_cache.get(key)
+    if cached is None or not _same_sessions(cached[1], sessions):
+        sites, pin_lists = _pin_query_context_to_channel_list(pin_query_context, [], sites)
+        # sites, pin_lists = ni_dt_common.pin_query_context_to_channel_list(
+        # pin_query_context, [], sites)
+        sscs = [
+            _NIScopeSSC(session, channel, pin_list) for session, channel, pin_list in zip(sessions, channels, pin_lists)
+        ]
+        cached = (list(sites), sscs)
+        _pins_to_sessions_cache[key] = cached
+    scope_tsm = _NIScopeTSM(list(cached[1]))
+    return TSMScope(pin_query_context, scope_tsm, list(cached[0]))
 
 
 @nitsm.codemoduleapi.code_module
@@ -1122,6 +1873,7 @@ def initialize_sessions(tsm: SMContext, options: dict = {}):
         tsm (SMContext): TestStand semiconductor module context
         options: Dictionary containing options for driver initialisation.
     """
+    clear_pins_to_sessions_cache()
     instrument_names = tsm.get_all_niscope_instrument_names()
     for instrument_name in instrument_names:
         session = niscope.Session(instrument_name, reset_device=True, options=options)
@@ -1131,6 +1883,7 @@ def initialize_sessions(tsm: SMContext, options: dict = {}):
             session.reset_device()
         session.configure_chan_characteristics(1e6, -1)
         session.commit()
+        _forget_properties(session)
         tsm.set_niscope_session(instrument_name, session)
 
 
@@ -1147,6 +1900,8 @@ def close_sessions(tsm: SMContext):
     for session in sessions:
         session.reset()
         session.close()
+        _forget_properties(session)
+    clear_pins_to_sessions_cache()
 
 
 if __name__ == "__main__":
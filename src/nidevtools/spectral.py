@@ -0,0 +1,207 @@
+"""
+This is spectral analysis of waveforms used by devtool apis
+"""
+
+import concurrent.futures
+import typing
+
+import numpy
+
+
+def _blackman_harris(length: int):
+    """4 term Blackman-Harris window"""
+    phase = 2.0 * numpy.pi * numpy.arange(length) / max(1, length - 1)
+    return 0.35875 - 0.48829 * numpy.cos(phase) + 0.14128 * numpy.cos(2 * phase) - 0.01168 * numpy.cos(3 * phase)
+
+
+# window name -> window function and half width of its main lobe in bins
+WINDOWS = {
+    "rectangular": (numpy.ones, 1),
+    "hann": (numpy.hanning, 2),
+    "hamming": (numpy.hamming, 2),
+    "blackman": (numpy.blackman, 3),
+    "blackman_harris": (_blackman_harris, 4),
+}
+
+
+class Spectrum(typing.NamedTuple):
+    """
+    single sided power spectrum, one row per waveform. The power is in Vrms^2 for the peak bin of
+    a tone, sums of bins are divided by the equivalent noise bandwidth of the window.
+    """
+
+    frequencies: numpy.ndarray
+    power: numpy.ndarray
+    enbw: float  # equivalent noise bandwidth of the window in bins
+
+
+class SpectralMetrics(typing.NamedTuple):
+    """
+    spectral measurements, one value or one row per waveform. Ratios are in dB, spurs are sorted by
+    decreasing power and padded with nan.
+    """
+
+    fundamental_frequency: numpy.ndarray
+    fundamental_power: numpy.ndarray  # Vrms^2
+    thd: numpy.ndarray
+    snr: numpy.ndarray
+    sinad: numpy.ndarray
+    enob: numpy.ndarray
+    sfdr: numpy.ndarray
+    spur_frequencies: numpy.ndarray
+    spur_levels: numpy.ndarray  # dBc
+
+
+def power_spectrum(samples, x_increment=1.0, window="hann"):
+    """
+    windowed FFT power spectrum of all the waveforms at once
+
+    Args:
+        samples (array like): waveforms, one per row, or a single 1D waveform
+        x_increment (float or array like, optional): time between two samples, one for all or one
+            per waveform. Defaults to 1.0.
+        window (str, optional): name of the window in WINDOWS. Defaults to "hann".
+
+    Returns:
+        Spectrum: frequencies and power of each waveform
+    """
+    samples = numpy.atleast_2d(numpy.asarray(samples, dtype=numpy.float64))
+    rows, length = samples.shape
+    window_function, _ = WINDOWS[window]
+    weights = window_function(length)
+    spectrum = numpy.fft.rfft(samples * weights, axis=1)
+    power = numpy.square(numpy.abs(spectrum)) * (2.0 / numpy.square(weights.sum()))
+    power[:, 0] /= 2.0
+    if length % 2 == 0:
+        power[:, -1] /= 2.0
+    x_increment = numpy.broadcast_to(numpy.asarray(x_increment, dtype=numpy.float64), (rows,))
+    frequencies = numpy.fft.rfftfreq(length)[None, :] / x_increment[:, None]
+    enbw = length * numpy.square(weights).sum() / numpy.square(weights.sum())
+    return Spectrum(frequencies, power, float(enbw))
+
+
+def _lobe_mask(centers, bins, half_width):
+    """mask of the bins within the main lobe of the center bin of each row"""
+    return numpy.abs(numpy.arange(bins)[None, :] - centers[:, None]) <= half_width
+
+
+def _aliased_bin(bin_index, length):
+    """bin of a frequency above the Nyquist frequency after aliasing"""
+    bin_index = bin_index % length
+    return numpy.where(bin_index > length // 2, length - bin_index, bin_index)
+
+
+def _analyze(samples, x_increment, window, fundamental_frequency, num_harmonics, num_spurs):
+    """spectral metrics of a block of waveforms, in the calling process"""
+    samples = numpy.atleast_2d(numpy.asarray(samples, dtype=numpy.float64))
+    rows, length = samples.shape
+    x_increment = numpy.broadcast_to(numpy.asarray(x_increment, dtype=numpy.float64), (rows,))
+    spectrum = power_spectrum(samples, x_increment, window)
+    power = spectrum.power
+    bins = power.shape[1]
+    half_width = WINDOWS[window][1]
+    dc_mask = numpy.arange(bins)[None, :] <= half_width
+    if fundamental_frequency is None:
+        fundamental_bin = numpy.argmax(numpy.where(dc_mask, -numpy.inf, power), axis=1)
+    else:
+        fundamental_bin = numpy.rint(numpy.asarray(fundamental_frequency) * length * x_increment).astype(numpy.int64)
+        fundamental_bin = numpy.broadcast_to(fundamental_bin, (rows,))
+    fundamental_mask = _lobe_mask(fundamental_bin, bins, half_width)
+    harmonic_mask = numpy.zeros_like(fundamental_mask)
+    for harmonic in range(2, num_harmonics + 2):
+        harmonic_bin = _aliased_bin(fundamental_bin * harmonic, length)
+        harmonic_mask |= _lobe_mask(harmonic_bin, bins, half_width)
+    harmonic_mask &= ~fundamental_mask & ~dc_mask
+    noise_mask = ~(fundamental_mask | harmonic_mask | dc_mask)
+    band_power = power / spectrum.enbw
+    fundamental_power = numpy.sum(band_power * fundamental_mask, axis=1)
+    harmonic_power = numpy.sum(band_power * harmonic_mask, axis=1)
+    noise_bins = noise_mask.sum(axis=1)
+    spectrum_bins = (~dc_mask).sum()
+    noise_power = numpy.sum(band_power * noise_mask, axis=1) * spectrum_bins / noise_bins
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        thd = 10.0 * numpy.log10(harmonic_power / fundamental_power)
+        snr = 10.0 * numpy.log10(fundamental_power / noise_power)
+        sinad = 10.0 * numpy.log10(fundamental_power / (noise_power + harmonic_power))
+    enob = (sinad - 1.76) / 6.02
+    row_index = numpy.arange(rows)
+    peak_power = power[row_index, fundamental_bin]
+    interior = numpy.zeros_like(power, dtype=bool)
+    interior[:, 1:-1] = (power[:, 1:-1] >= power[:, :-2]) & (power[:, 1:-1] >= power[:, 2:])
+    candidates = numpy.where(interior & ~fundamental_mask & ~dc_mask, power, -numpy.inf)
+    spur_bins = numpy.argsort(-candidates, axis=1)[:, :num_spurs]
+    spur_power = numpy.take_along_axis(candidates, spur_bins, axis=1)
+    found = numpy.isfinite(spur_power)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        spur_levels = numpy.where(found, 10.0 * numpy.log10(spur_power / peak_power[:, None]), numpy.nan)
+    spur_frequencies = numpy.where(found, numpy.take_along_axis(spectrum.frequencies, spur_bins, axis=1), numpy.nan)
+    if num_spurs:
+        sfdr = numpy.where(found[:, 0], -spur_levels[:, 0], numpy.nan)
+    else:
+        sfdr = numpy.full(rows, numpy.nan)
+    return SpectralMetrics(
+        fundamental_bin / (length * x_increment),
+        fundamental_power,
+        thd,
+        snr,
+        sinad,
+        enob,
+        sfdr,
+        spur_frequencies,
+        spur_levels,
+    )
+
+
+def analyze_spectrum(
+    samples,
+    x_increment=1.0,
+    window="hann",
+    fundamental_frequency=None,
+    num_harmonics=5,
+    num_spurs=5,
+    max_workers=0,
+):
+    """
+    computes the windowed FFT of all the waveforms and their THD, SNR, SINAD, ENOB, SFDR and spur
+    table in one batched call. The waveforms can be split between worker processes for very long
+    records.
+
+    Args:
+        samples (array like): waveforms, channels x samples, or a single 1D waveform
+        x_increment (float or array like, optional): time between two samples, one for all or one
+            per waveform. Defaults to 1.0.
+        window (str, optional): name of the window in WINDOWS. Defaults to "hann".
+        fundamental_frequency (float or array like, optional): frequency of the tone in hertz.
+            Defaults to None, the largest bin above DC.
+        num_harmonics (int, optional): harmonics included in the THD, from the second one.
+            Defaults to 5.
+        num_spurs (int, optional): number of spurs in the spur table. Defaults to 5.
+        max_workers (int, optional): number of worker processes. Defaults to 0, in the calling
+            process.
+
+    Returns:
+        SpectralMetrics: one value or row per waveform
+    """
+    samples = numpy.atleast_2d(numpy.asarray(samples, dtype=numpy.float64))
+    rows = samples.shape[0]
+    if max_workers <= 1 or rows < 2:
+        return _analyze(samples, x_increment, window, fundamental_frequency, num_harmonics, num_spurs)
+    x_increment = numpy.broadcast_to(numpy.asarray(x_increment, dtype=numpy.float64), (rows,))
+    if fundamental_frequency is not None:
+        fundamental_frequency = numpy.broadcast_to(numpy.asarray(fundamental_frequency, dtype=numpy.float64), (rows,))
+    blocks = numpy.array_split(numpy.arange(rows), min(max_workers, rows))
+    with concurrent.futures.ProcessPoolExecutor(len(blocks)) as executor:
+        futures = [
+            executor.submit(
+                _analyze,
+                samples[block],
+                x_increment[block],
+                window,
+                None if fundamental_frequency is None else fundamental_frequency[block],
+                num_harmonics,
+                num_spurs,
+            )
+            for block in blocks
+        ]
+        results = [future.result() for future in futures]
+    return SpectralMetrics(*[numpy.concatenate(values) for values in zip(*results)])
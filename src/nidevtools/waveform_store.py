@@ -0,0 +1,302 @@
+"""
+This is memory-mapped archive of captured waveforms used by devtool apis
+"""
+
+import json
+import numbers
+import os
+import typing
+import zlib
+
+import numpy
+
+_INDEX_FILE = "index.jsonl"
+_ALIGNMENT = 64  # bytes, every record starts on a multiple of it in its segment
+
+
+class WaveformRecord(typing.NamedTuple):
+    channel: str
+    pin: str
+    site: int
+    x_increment: float
+    t0: float
+    segment: int
+    offset: int  # bytes from the start of the segment
+    nbytes: int  # stored bytes, compressed size for compressed records
+    dtype: str
+    shape: typing.Tuple[int, ...]
+    compression: str  # "" or "zlib"
+
+
+def _to_seconds(t0):
+    """converts a waveform start time to seconds, time stamps are converted to POSIX time"""
+    if isinstance(t0, numbers.Real):
+        return float(t0)
+    return t0.timestamp()
+
+
+class WaveformStore:
+    """
+    Appends waveforms and their channel, pin, site, x_increment and t0 to segment files in a
+    directory, with one index line per waveform. Uncompressed waveforms are read back as read
+    only views of the memory-mapped segments, so archives larger than the memory can be analyzed
+    one waveform at a time.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode="a",
+        segment_size=1 << 30,
+        compression: typing.Optional[str] = None,
+        compression_level=6,
+    ):
+        """
+        opens the store in the directory, the directory is created if needed
+
+        Args:
+            path (str): directory of the store
+            mode (str, optional): "a" to read and append, "r" to read only. Defaults to "a".
+            segment_size (int, optional): size in bytes after which a new segment file is started.
+                Defaults to 1 GiB.
+            compression (str, optional): "zlib" to compress the appended waveforms, compressed
+                waveforms are decompressed into memory when read. Defaults to None.
+            compression_level (int, optional): zlib compression level. Defaults to 6.
+        """
+        if mode not in ("a", "r"):
+            raise ValueError("mode must be 'a' or 'r'")
+        if compression not in (None, "zlib"):
+            raise ValueError("Unsupported compression %r" % compression)
+        self._path = path
+        self._segment_size = segment_size
+        self._compression = compression or ""
+        self._compression_level = compression_level
+        self._records: typing.List[WaveformRecord] = []
+        self._maps: typing.Dict[int, numpy.memmap] = {}  # segment -> read only map
+        self._segment_file = None
+        self._index_file = None
+        if mode == "a":
+            os.makedirs(path, exist_ok=True)
+        index_path = os.path.join(path, _INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, "r") as index_file:
+                for line in index_file:
+                    if line.strip():
+                        values = json.loads(line)
+                        values["shape"] = tuple(values["shape"])
+                        self._records.append(WaveformRecord(**values))
+        if mode == "a":
+            self._index_file = open(index_path, "a")
+            self._segment = self._records[-1].segment if self._records else 0
+            self._segment_file = open(self._segment_path(self._segment), "ab")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self._records)
+
+    @property
+    def records(self):
+        """
+        returns the index of the store
+
+        Returns:
+            list of WaveformRecord: one per waveform in the order they were appended
+        """
+        return list(self._records)
+
+    def _segment_path(self, segment: int):
+        return os.path.join(self._path, "segment_%05d.bin" % segment)
+
+    def append(self, samples, channel: str, pin="", site=-1, x_increment=1.0, t0: typing.Any = 0.0):
+        """
+        appends one waveform to the store
+
+        Args:
+            samples (array like): samples of the waveform, any shape, like records x samples
+            channel (str): channel of the waveform
+            pin (str, optional): pin of the channel. Defaults to "".
+            site (int, optional): site of the pin, -1 for system pins. Defaults to -1.
+            x_increment (float, optional): time between two samples. Defaults to 1.0.
+            t0 (float or time stamp, optional): time of the first sample. Defaults to 0.0.
+
+        Returns:
+            int: index of the waveform in the store
+        """
+        index = self._write(samples, channel, pin, site, x_increment, t0)
+        self.flush()
+        return index
+
+    def _write(self, samples, channel: str, pin, site, x_increment, t0):
+        """writes one waveform and its index line without flushing them, see append"""
+        if self._segment_file is None:
+            raise ValueError("The store is not open for appending")
+        samples = numpy.ascontiguousarray(samples)
+        if samples.dtype.hasobject:
+            raise ValueError("Only numeric waveforms can be stored")
+        data = samples.reshape(-1).view(numpy.uint8)
+        if self._compression:
+            data = zlib.compress(data, self._compression_level)
+        offset = self._segment_file.tell()
+        offset += -offset % _ALIGNMENT
+        if offset and offset + len(data) > self._segment_size:
+            self._segment_file.close()
+            self._segment += 1
+            self._segment_file = open(self._segment_path(self._segment), "ab")
+            offset = 0
+        self._segment_file.write(b"\0" * (offset - self._segment_file.tell()))
+        self._segment_file.write(data)
+        record = WaveformRecord(
+            channel,
+            pin,
+            int(site),
+            float(x_increment),
+            _to_seconds(t0),
+            self._segment,
+            offset,
+            len(data),
+            samples.dtype.str,
+            samples.shape,
+            self._compression,
+        )
+        self._index_file.write(json.dumps(record._asdict()) + "\n")
+        self._records.append(record)
+        return len(self._records) - 1
+
+    def append_fetch_result(
+        self,
+        result: typing.Any,
+        pins: typing.Optional[typing.Sequence[str]] = None,
+        sites: typing.Optional[typing.Sequence[int]] = None,
+    ):
+        """
+        appends the waveforms of a scope ScopeFetchResult, one waveform of records x samples per
+        channel
+
+        Args:
+            result (ScopeFetchResult): result of fetch_waveform_into
+            pins (typing.Sequence[str], optional): pin of each channel. Defaults to None, "".
+            sites (typing.Sequence[int], optional): site of each channel. Defaults to None, -1.
+
+        Returns:
+            list of int: index of each waveform in the store
+        """
+        indices = []
+        for row, channel in enumerate(result.channels):
+            indices.append(
+                self._write(
+                    result.waveforms[row],
+                    channel,
+                    "" if pins is None else pins[row],
+                    -1 if sites is None else sites[row],
+                    result.info.x_increment[row, 0],
+                    result.info.absolute_initial_x[row, 0],
+                )
+            )
+        self.flush()
+        return indices
+
+    def append_waveform_dicts(
+        self,
+        waveforms: typing.Sequence[typing.Dict[str, typing.Any]],
+        pins: typing.Optional[typing.Sequence[str]] = None,
+        sites: typing.Optional[typing.Sequence[int]] = None,
+    ):
+        """
+        appends waveforms in the dictionary format of the fetch_waveform methods, with the
+        "samples", "channel", "x_increment" and "absolute_initial_x" keys
+
+        Args:
+            waveforms (typing.Sequence[typing.Dict[str, typing.Any]]): waveform dictionaries
+            pins (typing.Sequence[str], optional): pin of each waveform. Defaults to None, "".
+            sites (typing.Sequence[int], optional): site of each waveform. Defaults to None, -1.
+
+        Returns:
+            list of int: index of each waveform in the store
+        """
+        indices = [
+            self._write(
+                waveform["samples"],
+                waveform["channel"],
+                "" if pins is None else pins[index],
+                -1 if sites is None else sites[index],
+                waveform.get("x_increment", 1.0),
+                waveform.get("absolute_initial_x", 0.0),
+            )
+            for index, waveform in enumerate(waveforms)
+        ]
+        self.flush()
+        return indices
+
+    def read(self, index: int):
+        """
+        reads one waveform. Uncompressed waveforms are read only views of the memory-mapped
+        segment, nothing is copied until the samples are used.
+
+        Args:
+            index (int): index of the waveform in the store
+
+        Returns:
+            numpy.ndarray: samples of the waveform with their original shape and data type
+        """
+        record = self._records[index]
+        if record.nbytes == 0:
+            return numpy.empty(record.shape, numpy.dtype(record.dtype))
+        segment_map = self._maps.get(record.segment)
+        if segment_map is None or len(segment_map) < record.offset + record.nbytes:
+            segment_map = numpy.memmap(self._segment_path(record.segment), numpy.uint8, "r")
+            self._maps[record.segment] = segment_map
+        data = segment_map[record.offset : record.offset + record.nbytes]
+        if record.compression:
+            data = numpy.frombuffer(zlib.decompress(data), numpy.uint8)
+        return data.view(numpy.dtype(record.dtype)).reshape(record.shape)
+
+    def select(
+        self,
+        channel: typing.Optional[str] = None,
+        pin: typing.Optional[str] = None,
+        site: typing.Optional[int] = None,
+    ):
+        """
+        finds the waveforms of a channel, pin or site
+
+        Args:
+            channel (str, optional): channel to match. Defaults to None, any channel.
+            pin (str, optional): pin to match. Defaults to None, any pin.
+            site (int, optional): site to match. Defaults to None, any site.
+
+        Returns:
+            list of int: indices of the matching waveforms
+        """
+        return [
+            index
+            for index, record in enumerate(self._records)
+            if (channel is None or record.channel == channel)
+            and (pin is None or record.pin == pin)
+            and (site is None or record.site == site)
+        ]
+
+    def flush(self):
+        """
+        writes the appended waveforms and then their index lines to the files, the append methods
+        flush once per call so the index on disk always matches the waveforms
+        """
+        if self._segment_file is not None:
+            self._segment_file.flush()
+            self._index_file.flush()
+
+    def close(self):
+        """
+        closes the files of the store, the arrays returned by read stay valid
+        """
+        self.flush()
+        if self._segment_file is not None:
+            self._segment_file.close()
+            self._index_file.close()
+            self._segment_file = None
+            self._index_file = None
+        self._maps.clear()
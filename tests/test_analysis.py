@@ -0,0 +1,95 @@
+import numpy
+import pytest
+import nidevtools.analysis as ni_dt_analysis
+
+
+class TestAnalysis:
+    def test_decimate_envelope(self):
+        samples = numpy.arange(10.0)
+        envelope = ni_dt_analysis.decimate_envelope(samples, 3, 0.5)
+        assert envelope.samples_per_bin == 4
+        assert envelope.x_increment == 2.0
+        assert list(envelope.minimum) == [0.0, 4.0, 8.0]
+        assert list(envelope.maximum) == [3.0, 7.0, 9.0]
+        assert list(envelope.mean) == [1.5, 5.5, 8.5]
+        empty = ni_dt_analysis.decimate_envelope(numpy.empty((2, 0)), 3)
+        assert (empty.samples_per_bin, empty.sample_count) == (0, 0)
+        assert empty.mean.shape == (2, 0)
+
+    def test_envelope_decimator_chunks(self):
+        samples = numpy.random.default_rng(0).normal(size=(2, 10007))
+        expected = ni_dt_analysis.decimate_envelope(samples, 100)
+        decimator = ni_dt_analysis.EnvelopeDecimator(expected.samples_per_bin)
+        for start in range(0, samples.shape[-1], 333):
+            decimator.update(samples[:, start : start + 333])
+        envelope = decimator.envelope()
+        assert envelope.sample_count == samples.shape[-1]
+        assert numpy.array_equal(envelope.minimum, expected.minimum)
+        assert numpy.array_equal(envelope.maximum, expected.maximum)
+        assert numpy.allclose(envelope.mean, expected.mean)
+
+    def test_measure_waveforms(self):
+        time = numpy.arange(10000) * 1e-6
+        sine = numpy.sin(2 * numpy.pi * 2000 * time)
+        square = numpy.convolve(numpy.where((time * 1000) % 1 < 0.5, 1.0, 0.0), numpy.ones(20) / 20, "same")
+        measurements = ni_dt_analysis.measure_waveforms(numpy.stack([sine, square]), 1e-6)
+        assert numpy.allclose(measurements.vpp, [2.0, 1.0])
+        assert numpy.allclose(measurements.frequency, [2000.0, 1000.0])
+        assert numpy.isclose(measurements.rms[0], 1 / numpy.sqrt(2))
+        assert numpy.isclose(measurements.rise_time[1], 16e-6)
+        levels = ni_dt_analysis.ReferenceLevels(-0.5, 0.0, 0.5, in_percent=False)
+        rise_time = ni_dt_analysis.measure_waveforms(sine, 1e-6, levels).rise_time[0]
+        assert numpy.isclose(rise_time, 1 / 12000, rtol=1e-3)
+
+    def test_measure_waveforms_levels(self):
+        step = numpy.concatenate([numpy.zeros(400), [1.2], numpy.ones(599)])
+        measurements = ni_dt_analysis.measure_waveforms(step)
+        assert (measurements.base[0], measurements.top[0]) == (0.0, 1.0)
+        assert numpy.isclose(measurements.overshoot[0], 20.0)
+        single = ni_dt_analysis.measure_waveforms(numpy.ones((2, 1)))
+        assert numpy.array_equal(single.mean, [1.0, 1.0])
+        for values in (single.rise_time, single.fall_time, single.period, single.frequency):
+            assert numpy.isnan(values).all()
+
+    def test_statistics_accumulator(self):
+        values = 1e6 + numpy.random.default_rng(1).normal(size=(2, 1000))
+        keys = [("PinA", 0, "vpp"), ("PinA", 1, "vpp")]
+        accumulator = ni_dt_analysis.StatisticsAccumulator()
+        windowed = ni_dt_analysis.StatisticsAccumulator(window=100)
+        for start in range(0, 1000, 7):
+            accumulator.update(keys, values[:, start : start + 7])
+            windowed.update(keys, values[:, start : start + 7])
+        statistics = accumulator.export()[keys[0]]
+        assert statistics.num_in_stats == 1000
+        assert numpy.isclose(statistics.mean, values[0].mean())
+        assert numpy.isclose(statistics.stdev, values[0].std(ddof=1))
+        assert statistics.max_val == values[0].max()
+        statistics = windowed.statistics(keys[1])
+        assert statistics.num_in_stats == 100
+        assert numpy.isclose(statistics.stdev, values[1, -100:].std(ddof=1))
+
+    def test_decaying_statistics(self):
+        values = numpy.random.default_rng(2).normal(size=200)
+        key = ("PinA", 0, "mean")
+        per_value = ni_dt_analysis.StatisticsAccumulator(decay=0.05)
+        for value in values:
+            per_value.update([key], [value])
+        batch = ni_dt_analysis.StatisticsAccumulator(decay=0.05)
+        batch.update([key], [values])
+        assert numpy.isclose(per_value.statistics(key).mean, batch.statistics(key).mean)
+        assert numpy.isclose(per_value.statistics(key).stdev, batch.statistics(key).stdev)
+
+    def test_ring_buffer(self):
+        samples = numpy.sin(numpy.arange(2000) / 20.0) * numpy.array([[1.0], [2.0]])
+        ring_buffer = ni_dt_analysis.RingBuffer(2, 500)
+        for start in range(0, 1000, 125):
+            ring_buffer.write(samples[:, start : start + 125])
+        assert ring_buffer.total == 1000
+        assert numpy.array_equal(ring_buffer.latest(500), samples[:, 500:1000])
+        with pytest.raises(ValueError):
+            ring_buffer.read(400, 10)
+        index, window = ring_buffer.trigger_window(0, 0.0, 10, 20)
+        assert samples[0, index - 1] < 0.0 <= samples[0, index]
+        assert index >= 500
+        assert numpy.array_equal(window, samples[:, index - 10 : index + 20])
+        assert ring_buffer.find_trigger(1, 0.0, rising=False, start=index) > index
@@ -1,8 +1,10 @@
 import os
+import time
 import typing
 
 import nidaqmx
 import nidaqmx.constants as constant
+import nidevtools.analysis as ni_dt_analysis
 import nidevtools.daqmx as ni_daqmx
 import nitsm
 import pytest
@@ -65,6 +67,25 @@ class TestDaqmx:
             assert len(queried_tasks) != 0  # not void
             assert len(queried_tasks) == 2  # Matching quantity
 
+    def test_set_task_reuses_tasks(self, tsm):
+        tasks = tsm.get_all_nidaqmx_tasks("")
+        ni_daqmx.set_task(tsm)
+        reused_tasks = tsm.get_all_nidaqmx_tasks("")
+        assert len(reused_tasks) == len(tasks)
+        for task, reused_task in zip(tasks, reused_tasks):
+            assert reused_task is task
+
+    def test_set_task_resets_reused_tasks(self, tsm):
+        task = tsm.get_all_nidaqmx_tasks("AnalogInput")[0]
+        task.timing.cfg_samp_clk_timing(1000.0, sample_mode=nidaqmx.constants.AcquisitionType.CONTINUOUS)
+        task.timing.ref_clk_src = "PXI_Clk10"
+        task.triggers.start_trigger.cfg_dig_edge_start_trig("PXI_Trig0")
+        ni_daqmx.set_task(tsm)
+        assert tsm.get_all_nidaqmx_tasks("AnalogInput")[0] is task
+        assert task.triggers.start_trigger.trig_type == nidaqmx.constants.TriggerType.NONE
+        assert task.timing.samp_quant_samp_mode == nidaqmx.constants.AcquisitionType.FINITE
+        assert task.timing.ref_clk_src != "PXI_Clk10"
+
     def test_pin_to_sessions_info(self, tsm, daqmx_tsm_s):
         print(daqmx_tsm_s)
         for daqmx_tsm in daqmx_tsm_s:
@@ -75,6 +96,16 @@ class TestDaqmx:
             assert isinstance(daqmx_tsm.sessions, typing.List)
             assert len(daqmx_tsm.sessions) == len(tsm.site_numbers)
 
+    def test_pin_to_sessions_info_cache(self, tsm, tests_pins):
+        first = ni_daqmx.pins_to_session_sessions_info(tsm, tests_pins[0])
+        second = ni_daqmx.pins_to_session_sessions_info(tsm, tests_pins[0])
+        assert second.sessions == first.sessions
+        assert isinstance(second.pin_query_context, ni_daqmx.PinQuery)
+        ni_daqmx.clear_task(tsm)
+        ni_daqmx.set_task(tsm)
+        third = ni_daqmx.pins_to_session_sessions_info(tsm, tests_pins[0])
+        assert len(third.sessions) == len(tsm.site_numbers)
+
     def test_get_all_instrument_names(self, tsm):
         data = ni_daqmx.get_all_instrument_names(tsm)
         print("\nTest Instrument Names: \n", data)
@@ -140,6 +171,48 @@ class TestDaqmx:
                 assert isinstance(task_property, ni_daqmx.TaskProperties)
                 assert task_property.SamplingRate == samp_rate
 
+    def test_read_waveform_into(self, daqmx_tsm_s):
+        for daqmx_tsm in daqmx_tsm_s:
+            daqmx_tsm.timing(100, 1000)
+            daqmx_tsm.start_task()
+            data = daqmx_tsm.read_waveform_into(8)
+            daqmx_tsm.stop_task()
+            tasks = {id(session.Task): session.Task for session in daqmx_tsm.sessions}
+            channels = sum(task.number_of_channels for task in tasks.values())
+            assert data.shape == (channels, 8)
+            daqmx_tsm.start_task()
+            assert daqmx_tsm.read_waveform_into(8, data) is data
+            daqmx_tsm.stop_task()
+
+    def test_synchronized_acquisition(self, daqmx_tsm_s):
+        for daqmx_tsm in daqmx_tsm_s:
+            daqmx_tsm.timing(100, 1000)
+            daqmx_tsm.configure_synchronization("")
+            daqmx_tsm.start_synchronized()
+            data = daqmx_tsm.read_synchronized(8)
+            daqmx_tsm.stop_task()
+            tasks = {id(session.Task): session.Task for session in daqmx_tsm.sessions}
+            channels = sum(task.number_of_channels for task in tasks.values())
+            assert data.shape == (channels, 8)
+        empty = ni_daqmx.MultipleSessions(None, [])
+        for method in (empty.configure_synchronization, empty.start_synchronized):
+            with pytest.raises(ValueError):
+                method()
+        with pytest.raises(ValueError):
+            empty.read_synchronized(8)
+
+    def test_continuous_acquisition(self, daqmx_tsm_s):
+        for daqmx_tsm in daqmx_tsm_s:
+            daqmx_tsm.timing(10000, 10000, continuous=True)
+            accumulator = ni_dt_analysis.StatisticsAccumulator()
+            acquisition = daqmx_tsm.start_continuous(100, 5000, accumulator)
+            time.sleep(0.2)
+            data = acquisition.latest_window(500)
+            acquisition.stop()
+            assert data.shape == (len(acquisition.channel_names), 500)
+            assert all(ring_buffer.total >= 500 for ring_buffer in acquisition.ring_buffers)
+            assert len(acquisition.statistics()) == len(acquisition.channel_names)
+
     def test_baku_power_sequence(self, tsm):
         daq_pins1 = ["DAQ_Pins1"]
         daq_pins2 = ["DAQ_Pins2"]
@@ -4,6 +4,7 @@ import os.path
 import nidcpower
 from nitsm.codemoduleapi import SemiconductorModuleContext as SMContext
 import nidevtools.dcpower as dcpower
+import nidevtools.power_sequence as power_sequence
 import time
 import os
 import ctypes
@@ -74,6 +75,16 @@ class TestDCPower:
             # print("\nTest_dcpower_tsm\n", dcpower_tsm)
             assert isinstance(dcpower_tsm, dcpower.TSMDCPower)
 
+    def test_filter_pins_and_sites(self, dcpower_tsm_s):
+        for dcpower_tsm in dcpower_tsm_s:
+            pins = [pin_info.pin for pin_info in dcpower_tsm.pins_expanded]
+            index_size = len(dcpower_tsm.pin_site_index)
+            filtered = dcpower.filter_pins(dcpower_tsm, pins[:1])
+            assert all(pin == pins[0] for pin, _ in filtered.pin_site_index)
+            assert len(dcpower_tsm.pin_site_index) == index_size
+            filtered = dcpower.filter_sites(filtered, dcpower_tsm.sites[:1])
+            assert all(site == dcpower_tsm.sites[0] for _, site in filtered.pin_site_index)
+
     def test_get_max_current(self, dcpower_tsm_s):
         """TSM DC Power Get Max Current.vi"""
         expected_currents = [3.0, 0.1, 0.1, 0.1, 0.1]
@@ -86,6 +97,64 @@ class TestDCPower:
             assert max_current == expected_currents[index]
             index += 1
 
+    def test_get_model_capabilities(self):
+        capabilities = dcpower.get_model_capabilities(4163)
+        assert capabilities.current_ranges[-1] == 0.05
+        assert capabilities.aperture_time_supported
+        assert dcpower.get_model_capabilities(4110, 2).voltage_ranges == (-20,)
+        assert dcpower.get_model_capabilities(4130, 1).sense_supported
+        assert not dcpower.get_model_capabilities(4130, 0).sense_supported
+        assert not dcpower.get_model_capabilities(4154, 1).transient_response_supported
+        assert dcpower.get_model_capabilities(9999).transient_response_supported
+        assert dcpower.get_model_capabilities(9999).model_number == 9999
+        assert not dcpower.get_model_capabilities(9999).power_line_frequency_supported
+        assert not dcpower.get_model_capabilities(9999).default_output_state_0v
+
+    def test_instrument_info_cache(self):
+        class Session:
+            instrument_model = "NI PXIe-4163"
+            instrument_manufacturer = "National Instruments"
+            reads = 0
+
+            def __init__(self):
+                self.instruments = {"SMU1": self}
+
+            def get_channel_name(self, index):
+                Session.reads += 1
+                return "SMU1/%d" % (index - 1)
+
+        dcpower.clear_instrument_info_cache()
+        session = Session()
+        info = dcpower._get_instrument_info(session, "")
+        assert info.instrument_name == "SMU1"
+        assert dcpower._get_instrument_info(session, "SMU1") is info
+        assert dcpower._get_instrument_info(session, "") is info
+        assert dcpower._get_channel_capabilities(session, "1") == dcpower.get_model_capabilities(4163, 1)
+        assert Session.reads == 1
+        dcpower.clear_instrument_info_cache()
+
+    def test_session_channel_map(self):
+        class Session:
+            channels = {"0": "0", "1": "1", "2": "2", "0,2": "0,2", "0,1": "0,1"}
+
+        first, second = Session(), Session()
+        sscs = [
+            dcpower._NIDCPowerSSC(first, "0", "Site0/A"),
+            dcpower._NIDCPowerSSC(second, "0", "Site0/B"),
+            dcpower._NIDCPowerSSC(first, "2", "Site1/A"),
+            dcpower._NIDCPowerSSC(second, "1", "Site1/B"),
+        ]
+        for ssc in sscs:
+            ssc.power_line_frequency = 50.0
+            ssc._capabilities = [dcpower.get_model_capabilities(4163)]
+        session_map = dcpower._SessionChannelMap(sscs)
+        assert [ssc.cs_channels for ssc in session_map.sscs] == ["0,2", "0,1"]
+        assert list(session_map.index_map) == [0, 2, 1, 3]
+        assert session_map.split(["A0", "A1", "B0", "B1"]) == ["A0", "B0", "A1", "B1"]
+        for ssc in session_map.sscs:
+            assert ssc.power_line_frequency == 50.0
+            assert len(ssc._capabilities) == 2
+
     # model = dcpower_tsm_s.get_smu_model() #not sure what object to call to get this property
     # if model == 4110 or model == 4112:
     #     current_ranges = [1]
@@ -156,6 +225,29 @@ class TestDCPower:
             for voltage in voltages:
                 assert voltage_set_point - 0.1 <= voltage <= voltage_set_point + 0.1
 
+    def test_source_voltage_array(self, dcpower_tsm_s):
+        for dcpower_tsm in dcpower_tsm_s:
+            num_sessions = len(dcpower_tsm.ssc.sessions_sites_channels)
+            voltage_set_points = [1.0 + 0.1 * i for i in range(num_sessions)]
+            dcpower_tsm.ssc.force_voltage_symmetric_limits(voltage_set_points, 2.0, 0.1, 0.1)
+            voltages, currents = dcpower_tsm.ssc.measure()
+            print("voltages\n", voltages)
+            dcpower_tsm.ssc.abort()
+            num_channels = len(dcpower_tsm.ssc.get_properties_snapshot().channel)
+            with pytest.raises(ValueError):
+                dcpower_tsm.ssc.configure_voltage_level_array([1.0] * (num_channels + 1))
+
+    def test_source_voltage_per_channel(self, tsm):
+        dcpower_tsm = dcpower.pins_to_sessions(tsm, ["SMU_PG_Logic"])
+        num_sessions = len(dcpower_tsm.ssc.sessions_sites_channels)
+        num_channels = len(dcpower_tsm.ssc.get_properties_snapshot().channel)
+        assert num_channels > num_sessions
+        voltage_set_points = [0.5 + 0.1 * i for i in range(num_channels)]
+        dcpower_tsm.ssc.force_voltage_symmetric_limits(voltage_set_points, 2.0, 0.1, 0.1)
+        levels = dcpower_tsm.ssc.get_properties_snapshot().level
+        dcpower_tsm.ssc.abort()
+        assert levels == pytest.approx(voltage_set_points)
+
     def test_source_current(self, dcpower_tsm_s):
         """
         # TSM SSC DCPower Source Current vim
@@ -223,6 +315,86 @@ class TestDCPower:
             print(all_props)
             i += 1
 
+    def test_get_properties_snapshot(self, dcpower_tsm_s):
+        for dcpower_tsm in dcpower_tsm_s:
+            all_props = [prop for props in dcpower_tsm.ssc.get_properties() for prop in props]
+            snapshot = dcpower_tsm.ssc.get_properties_snapshot()
+            assert isinstance(snapshot, dcpower.ChannelPropertiesTable)
+            assert snapshot.channel == [prop.channel for prop in all_props]
+            assert snapshot.model == [prop.model for prop in all_props]
+
+    def test_wait_for_event_with_deadline(self, dcpower_tsm_s):
+        for dcpower_tsm in dcpower_tsm_s:
+            dcpower_tsm.ssc.force_voltage_symmetric_limits(1.0, 1.0, 0.1, 0.1)
+            result = dcpower_tsm.ssc.wait_for_event_with_deadline(timeout=5.0)
+            print("completion_times\n", result.completion_times)
+            dcpower_tsm.ssc.abort()
+            assert len(result.completion_times) == len(result.channels)
+            for completion_time in result.completion_times:
+                assert 0.0 <= completion_time <= 5.0
+
+    def test_force_voltage_and_detect_settling(self, dcpower_tsm_s):
+        for dcpower_tsm in dcpower_tsm_s:
+            results = dcpower_tsm.ssc.force_voltage_and_detect_settling(1.0, 0.1, 1.0, 0.1)
+            print(results)
+            dcpower_tsm.ssc.abort()
+            for result in results:
+                assert isinstance(result, dcpower.SettleResult)
+                if result.settled:
+                    assert result.recommended_source_delay >= result.settle_time
+
+    def test_measure_current_auto_ranged(self, dcpower_tsm_s):
+        for dcpower_tsm in dcpower_tsm_s:
+            dcpower_tsm.ssc.force_voltage_symmetric_limits(1.0, 1.0, 0.1, 0.1)
+            coarse = dcpower_tsm.ssc.measure_current_auto_ranged()
+            fine = dcpower_tsm.ssc.measure_current_auto_ranged(coarse.currents)
+            print(coarse, fine)
+            dcpower_tsm.ssc.abort()
+            for current, current_range in zip(fine.currents, fine.current_ranges):
+                assert abs(current) <= current_range
+
+    def test_measure_current_auto_ranged_restores_limit(self, dcpower_tsm_s):
+        for dcpower_tsm in dcpower_tsm_s:
+            dcpower_tsm.ssc.force_voltage_symmetric_limits(1.0, 1.0, 1e-3, 0.1)
+            before = dcpower_tsm.ssc.get_properties_snapshot()
+            result = dcpower_tsm.ssc.measure_current_auto_ranged(1e-5)
+            after = dcpower_tsm.ssc.get_properties_snapshot()
+            dcpower_tsm.ssc.abort()
+            assert after.limit == before.limit
+            assert after.current_range == before.current_range
+            for current in result.currents:
+                assert abs(current) <= 1e-3 * 1.01
+
+    def test_power_sequence(self, tsm):
+        plan = [
+            power_sequence.RailStep("SMU_VI_VCC", 1.0, 0.1, ramp_time=1e-3),
+            power_sequence.RailStep("SMU_VI_V_In", 1.0, 0.1, depends_on="SMU_VI_VCC"),
+        ]
+        report = power_sequence.run_power_sequence(tsm, plan, hardware_triggers=False)
+        print(report)
+        assert [timing.rail for timing in report.rails] == ["SMU_VI_VCC", "SMU_VI_V_In"]
+        assert report.rails[1].start_time >= report.rails[0].done_time
+        with pytest.raises(ValueError):
+            power_sequence.run_power_sequence(
+                tsm, [power_sequence.RailStep("SMU_VI_VCC", 1.0, 0.1, depends_on="SMU_VI_VCC")]
+            )
+
+    def test_power_sequence_hardware_triggers(self, tsm):
+        plan = [
+            power_sequence.RailStep("SMU_VI_VCC", 1.0, 0.1, ramp_time=1e-3, settle_tolerance=0.05),
+            power_sequence.RailStep("SMU_VI_V_In", 1.0, 0.1, depends_on="SMU_VI_VCC", settle_tolerance=0.05),
+        ]
+        # the second run reserves the same trigger lines as the first one
+        for _ in range(2):
+            report = power_sequence.run_power_sequence(tsm, plan)
+            assert all(timing.settled for timing in report.rails)
+            # the dependent rail is triggered by the done event, it cannot finish before its parent
+            assert report.rails[1].done_time >= report.rails[0].done_time
+        vcc = dcpower.pins_to_sessions(tsm, ["SMU_VI_VCC"])
+        for ssc in vcc.sessions_sites_channels:
+            assert ssc.session.source_mode == nidcpower.SourceMode.SINGLE_POINT
+            assert ssc.session.exported_start_trigger_output_terminal == ""
+
     def test_configure_settings(self, dcpower_tsm_s):
         """
         TSM SSC DCPower Configure Settings vim
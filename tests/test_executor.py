@@ -0,0 +1,29 @@
+import numpy
+import nidevtools.analysis as ni_dt_analysis
+import nidevtools.executor as ni_dt_executor
+import nidevtools.spectral as ni_dt_spectral
+
+
+class TestExecutor:
+    def test_submit_shared_buffer(self):
+        time = numpy.arange(4096) * 1e-6
+        with ni_dt_executor.AnalysisExecutor(2) as executor:
+            buffer = executor.allocate((2, 4096))
+            buffer[0] = numpy.sin(2 * numpy.pi * 10e3 * time)
+            buffer[1] = 0.5 * numpy.sin(2 * numpy.pi * 20e3 * time)
+            expected = ni_dt_analysis.measure_waveforms(buffer, 1e-6)
+            future = executor.submit(ni_dt_analysis.measure_waveforms, buffer, 1e-6)
+            executor.release(buffer)
+            measurements = future.result()
+        assert numpy.allclose(measurements.vpp, expected.vpp)
+        assert numpy.allclose(measurements.frequency, [10e3, 20e3])
+
+    def test_submit_copied_waveforms(self):
+        samples = numpy.sin(2 * numpy.pi * 37 * numpy.arange(1024) / 1024)
+        expected = ni_dt_spectral.analyze_spectrum(samples)
+        with ni_dt_executor.AnalysisExecutor(1) as executor:
+            futures = [executor.submit(ni_dt_spectral.analyze_spectrum, samples) for _ in range(3)]
+            results = [future.result() for future in futures]
+        for result in results:
+            assert numpy.allclose(result.fundamental_frequency, expected.fundamental_frequency)
+            assert numpy.allclose(result.thd, expected.thd)
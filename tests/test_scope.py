@@ -135,6 +135,17 @@ class TestNIScope:
         for scope_tsm in scope_tsm_s:
             assert isinstance(scope_tsm, scope.TSMScope)
 
+    def test_pins_to_sessions_cache(self, tsm, tests_pins):
+        for test_pin in tests_pins:
+            first = scope.pins_to_sessions(tsm, test_pin, [])
+            second = scope.pins_to_sessions(tsm, test_pin, [])
+            assert first.ssc._sscs == second.ssc._sscs
+            assert first.ssc._sscs is not second.ssc._sscs
+            scope.clear_pins_to_sessions_cache()
+            third = scope.pins_to_sessions(tsm, test_pin, [])
+            assert third.ssc._sscs[0] is not first.ssc._sscs[0]
+            assert third.sites == first.sites
+
     def test_configure_functions(self, scope_tsm_s):
         for scope_tsm in scope_tsm_s:
             scope_tsm.ssc.configure_impedance(0.5)
@@ -268,6 +279,71 @@ class TestNIScope:
             print(data1, data2, "\n")
             scope_tsm.ssc.abort()
 
+    def test_fetch_waveform_into(self, scope_tsm_s):
+        pool = scope.FetchBufferPool()
+        for scope_tsm in scope_tsm_s:
+            scope_tsm.ssc.configure_vertical(5.0, niscope.VerticalCoupling.DC, 0.0, 1.0, True)
+            scope_tsm.ssc.configure_timing(20e6, 1000, 50, 1, True)
+            scope_tsm.ssc.initiate()
+            results = scope_tsm.ssc.fetch_waveform_into(1000, pool=pool)
+            for result in results:
+                assert result.waveforms.shape == (len(result.channels), 1, 1000)
+                assert result.info.x_increment.shape == (len(result.channels), 1)
+                pool.release(result.waveforms)
+            strided = [np.empty((16, 2000))[:, ::2] for _ in results]  # not contiguous
+            with pytest.raises(ValueError):
+                scope_tsm.ssc.fetch_waveform_into(1000, buffers=strided)
+            scope_tsm.ssc.abort()
+
+    def test_iter_multirecord_waveform(self, scope_tsm_s):
+        for scope_tsm in scope_tsm_s:
+            scope_tsm.ssc.configure_vertical(5.0, niscope.VerticalCoupling.DC, 0.0, 1.0, True)
+            scope_tsm.ssc.configure_timing(20e6, 1000, 50, 10, True)
+            scope_tsm.ssc.configure_trigger_immediate()
+            scope_tsm.ssc.initiate()
+            record_numbers = []
+            for record_number, results in scope_tsm.ssc.iter_multirecord_waveform(4):
+                record_numbers.append(record_number)
+                for result in results:
+                    assert result.waveforms.shape[2] == 1000
+            assert record_numbers == [0, 4, 8]
+            scope_tsm.ssc.abort()
+
+    def test_synchronized_acquisition(self, scope_tsm_s):
+        for scope_tsm in scope_tsm_s:
+            scope_tsm.ssc.configure_vertical(5.0, niscope.VerticalCoupling.DC, 0.0, 1.0, True)
+            scope_tsm.ssc.configure_timing(20e6, 1000, 50, 1, True)
+            scope_tsm.ssc.configure_trigger_immediate()
+            results = scope_tsm.ssc.synchronized_acquisition(1000)
+            for result in results:
+                assert result.waveforms.shape == (len(result.channels), 1, 1000)
+            scope_tsm.ssc.abort()
+
+    def test_measure_waveforms(self, scope_tsm_s):
+        for scope_tsm in scope_tsm_s:
+            scope_tsm.ssc.configure_reference_level()
+            scope_tsm.ssc.configure_vertical(5.0, niscope.VerticalCoupling.DC, 0.0, 1.0, True)
+            scope_tsm.ssc.configure_timing(20e6, 1000, 50, 1, True)
+            scope_tsm.ssc.configure_trigger_immediate()
+            scope_tsm.ssc.initiate()
+            measurements = scope_tsm.ssc.measure_waveforms(1000)
+            assert len(measurements.vpp) == len(
+                scope_tsm.ssc.fetch_measurement(niscope.ScalarMeasurement.VOLTAGE_PEAK_TO_PEAK)
+            )
+            scope_tsm.ssc.abort()
+
+    def test_apply_configuration(self, scope_tsm_s):
+        configuration = scope.ScopeConfiguration(
+            scope.ScopeChannelConfiguration(5.0, niscope.VerticalCoupling.DC),
+            scope.ScopeTimingConfiguration(20e6, 1000, 50.0, 1, True),
+            scope.ScopeTriggerConfiguration(0.0, niscope.TriggerCoupling.DC),
+        )
+        for scope_tsm in scope_tsm_s:
+            assert scope_tsm.ssc.apply(configuration) > 0
+            assert scope_tsm.ssc.apply(configuration) == 0
+            assert scope_tsm.ssc.configure_timing(20e6, 1000, 50.0, 1, True) == 0
+            assert scope_tsm.ssc.configure_timing(20e6, 2000, 50.0, 1, True) == 1
+
 
 # @pytest.mark.sequence_file("scope.seq")
 # def test_niscope(system_test_runner):
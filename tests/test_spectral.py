@@ -0,0 +1,27 @@
+import numpy
+import nidevtools.spectral as ni_dt_spectral
+
+
+class TestSpectral:
+    def test_analyze_spectrum(self):
+        sample_rate = 1e6
+        time = numpy.arange(4096) / sample_rate
+        frequency = sample_rate * 101 / 4096 + 123.0
+        tone = numpy.sin(2 * numpy.pi * frequency * time)
+        distorted = tone + 0.01 * numpy.sin(2 * numpy.pi * 3 * frequency * time)
+        quantized = numpy.round(tone * 2047) / 2047
+        metrics = ni_dt_spectral.analyze_spectrum(
+            numpy.stack([distorted, quantized]), 1 / sample_rate, "blackman_harris"
+        )
+        assert numpy.allclose(metrics.fundamental_power, 0.5, rtol=1e-3)
+        assert abs(metrics.thd[0] + 40.0) < 0.1
+        assert abs(metrics.spur_frequencies[0, 0] - 3 * frequency) < sample_rate / 4096
+        assert abs(metrics.enob[1] - 12.0) < 0.2
+
+    def test_analyze_spectrum_process_pool(self):
+        samples = numpy.random.default_rng(0).normal(size=(3, 1024))
+        samples += numpy.sin(2 * numpy.pi * 0.1 * numpy.arange(1024))
+        metrics = ni_dt_spectral.analyze_spectrum(samples)
+        pooled = ni_dt_spectral.analyze_spectrum(samples, max_workers=2)
+        assert numpy.allclose(metrics.snr, pooled.snr)
+        assert numpy.allclose(metrics.spur_levels, pooled.spur_levels)
@@ -0,0 +1,44 @@
+import numpy
+import nidevtools.waveform_store as ni_dt_waveform_store
+
+
+class TestWaveformStore:
+    def test_append_and_read(self, tmp_path):
+        waveforms = numpy.random.default_rng(0).normal(size=(3, 2, 500))
+        with ni_dt_waveform_store.WaveformStore(str(tmp_path), segment_size=10000) as store:
+            for site, samples in enumerate(waveforms):
+                store.append(samples, "0", "PinA", site, 1e-6, 1.5)
+            store.append_waveform_dicts([{"samples": [1, 2, 3], "channel": "SMU1/0(V)", "x_increment": 1e-3}])
+            assert numpy.array_equal(store.read(1), waveforms[1])
+        store = ni_dt_waveform_store.WaveformStore(str(tmp_path), "r")
+        assert len(store) == 4
+        assert [record.segment for record in store.records] == [0, 1, 2, 2]
+        assert store.select(pin="PinA", site=2) == [2]
+        samples = store.read(2)
+        assert isinstance(samples, numpy.memmap)
+        assert not samples.flags.writeable
+        assert numpy.array_equal(samples, waveforms[2])
+        assert list(store.read(3)) == [1, 2, 3]
+        record = store.records[0]
+        assert (record.x_increment, record.t0, record.shape) == (1e-6, 1.5, (2, 500))
+        store.close()
+
+    def test_compression(self, tmp_path):
+        samples = numpy.repeat(numpy.arange(100, dtype=numpy.int16), 100)
+        with ni_dt_waveform_store.WaveformStore(str(tmp_path), compression="zlib") as store:
+            index = store.append(samples, "ai0")
+            assert store.records[index].nbytes < samples.nbytes
+        with ni_dt_waveform_store.WaveformStore(str(tmp_path)) as store:
+            store.append(samples[:10], "ai1")
+            assert numpy.array_equal(store.read(0), samples)
+            assert numpy.array_equal(store.read(1), samples[:10])
+            assert store.records[1].compression == ""
+
+    def test_index_written_on_append(self, tmp_path):
+        with ni_dt_waveform_store.WaveformStore(str(tmp_path)) as store:
+            store.append(numpy.arange(10.0), "ai0")
+            store.append_waveform_dicts([{"samples": [1, 2], "channel": "ai1"}, {"samples": [3], "channel": "ai2"}])
+            reader = ni_dt_waveform_store.WaveformStore(str(tmp_path), "r")
+            assert [record.channel for record in reader.records] == ["ai0", "ai1", "ai2"]
+            assert list(reader.read(2)) == [3]
+            reader.close()